@@ -0,0 +1,83 @@
+# ruff: noqa: E402
+"""
+Measures checkpoint garbage collection throughput: how many threads per second
+collect_garbage scans and deletes, and how many S3 requests it makes, with
+different concurrency settings.
+
+Each run saves --threads threads of a few checkpoints and writes each, then
+collects them all as if --max-age-days had passed.
+
+Usage (from the chat directory):
+    python benchmarks/checkpoint_gc.py --latency-ms 20 --threads 200
+"""
+
+import sys
+
+sys.path.append("./src")
+
+import argparse
+import time
+from langgraph.checkpoint.base import Checkpoint
+from persistence.checkpoint_gc import DAY_MS, collect_garbage
+from persistence.s3_checkpointer import S3Checkpointer
+from s3_stand_in import BUCKET_NAME, REGION, S3StandIn
+
+CONCURRENCY = [1, 4, 8, 16]
+
+
+def populate(saver, threads, checkpoints):
+    for t in range(threads):
+        config = {"configurable": {"thread_id": f"gc-{t:06}", "checkpoint_ns": ""}}
+        for c in range(checkpoints):
+            config = saver.put(config, Checkpoint(id=f"checkpoint{c:03}"), {}, {})
+            saver.put_writes(config, [("messages", c)], "task")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--threads", type=int, default=200)
+    parser.add_argument("--checkpoints", type=int, default=3)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=CONCURRENCY)
+    parser.add_argument("--max-age-days", type=float, default=30)
+    parser.add_argument("--endpoint-url", default=None)
+    args = parser.parse_args()
+
+    stand_in = S3StandIn(latency=args.latency_ms / 1000, endpoint_url=args.endpoint_url)
+    with stand_in.running():
+        print(f"Simulated S3 latency: {args.latency_ms:.0f}ms per request")
+        print(
+            f"{'concurrency':>11} {'threads':>7} {'objects':>7} {'seconds':>8} "
+            f"{'threads/s':>9}  requests"
+        )
+        for concurrency in args.concurrency:
+            saver = S3Checkpointer(
+                bucket_name=BUCKET_NAME,
+                region_name=REGION,
+                endpoint_url=args.endpoint_url,
+                delete_concurrency=concurrency,
+            )
+            stand_in.latency = 0
+            populate(saver, args.threads, args.checkpoints)
+            stand_in.latency = args.latency_ms / 1000
+            stand_in.reset()
+
+            later = int(time.time() * 1000) + int((args.max_age_days + 1) * DAY_MS)
+            report = collect_garbage(
+                saver,
+                max_age_days=args.max_age_days,
+                concurrency=concurrency,
+                now=later,
+            )
+            requests = " ".join(
+                f"{name}={count}" for name, count in sorted(stand_in.requests.items())
+            )
+            print(
+                f"{concurrency:>11} {report.threads_deleted:>7} "
+                f"{report.objects_deleted:>7} {report.seconds:>8.2f} "
+                f"{report.threads_per_second:>9.1f}  {requests}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+# ruff: noqa: E402
+"""
+Measures the latency and S3 request counts of each checkpointer operation (put,
+put_writes, get_tuple, list, and delete_checkpoints) while replaying synthetic
+agent conversations of several lengths with each compression setting.
+
+Each graph step of a conversation is saved the way the agent saves it: a put
+of the checkpoint with every message so far, then a put_writes of the new
+message. Background work the checkpointer defers after a put (e.g., pruning) is
+waited for before the put_writes and reported as "flush".
+
+Usage (from the chat directory):
+    python benchmarks/checkpoint_storage.py --latency-ms 20 --turns 1 5 20
+"""
+
+import sys
+
+sys.path.append("./src")
+
+import argparse
+import time
+from collections import Counter, defaultdict
+from conversation import checkpoint, conversation
+from persistence.s3_checkpointer import S3Checkpointer
+from persistence.selective_checkpointer import SelectiveCheckpointer
+from s3_stand_in import BUCKET_NAME, REGION, S3StandIn, percentile
+
+CHECKPOINTERS = {
+    "s3": lambda **kwargs: S3Checkpointer(**kwargs),
+    "selective": lambda **kwargs: SelectiveCheckpointer(retain_history=False, **kwargs),
+}
+COMPRESSIONS = ["none", "gzip", "zstd"]
+OPERATIONS = ["put", "flush", "put_writes", "get_tuple", "list", "delete"]
+
+
+class Recorder:
+    """Times operations and counts the S3 requests each one makes"""
+
+    def __init__(self, stand_in):
+        self.stand_in = stand_in
+        self.samples = defaultdict(list)
+        self.requests = defaultdict(Counter)
+
+    def measure(self, operation, fn, *args, **kwargs):
+        self.stand_in.reset()
+        start = time.perf_counter()
+        result = fn(*args, **kwargs)
+        self.samples[operation].append((time.perf_counter() - start) * 1000)
+        self.requests[operation].update(self.stand_in.requests)
+        return result
+
+
+def run(stand_in, kind, compression, turns, repeat, endpoint_url):
+    saver = CHECKPOINTERS[kind](
+        bucket_name=BUCKET_NAME,
+        region_name=REGION,
+        endpoint_url=endpoint_url,
+        compression=None if compression == "none" else compression,
+    )
+    thread_id = f"storage-{kind}-{compression}-{turns}"
+    config = {"configurable": {"thread_id": thread_id, "checkpoint_ns": ""}}
+    recorder = Recorder(stand_in)
+
+    messages = []
+    for step, message in enumerate(conversation(turns, documents=20)):
+        messages.append(message)
+        config = recorder.measure(
+            "put",
+            saver.put,
+            config,
+            checkpoint(messages, checkpoint_id=f"{step:06}"),
+            {"step": step},
+            {"messages": step},
+        )
+        recorder.measure("flush", saver.flush)
+        recorder.measure(
+            "put_writes", saver.put_writes, config, [("messages", message)], "task"
+        )
+
+    latest = {"configurable": {"thread_id": thread_id, "checkpoint_ns": ""}}
+    for _ in range(repeat):
+        recorder.measure("get_tuple", saver.get_tuple, latest)
+        recorder.measure("list", lambda: list(saver.list(latest)))
+    recorder.measure("delete", saver.delete_checkpoints, thread_id)
+    return recorder
+
+
+def format_requests(requests, calls):
+    return " ".join(
+        f"{name}={count / calls:.1f}" for name, count in sorted(requests.items())
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--turns", type=int, nargs="+", default=[1, 5, 20])
+    parser.add_argument(
+        "--checkpointers",
+        nargs="+",
+        default=list(CHECKPOINTERS),
+        choices=list(CHECKPOINTERS),
+    )
+    parser.add_argument(
+        "--compressions", nargs="+", default=COMPRESSIONS, choices=COMPRESSIONS
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--endpoint-url", default=None)
+    args = parser.parse_args()
+
+    stand_in = S3StandIn(latency=args.latency_ms / 1000, endpoint_url=args.endpoint_url)
+    with stand_in.running():
+        print(f"Simulated S3 latency: {args.latency_ms:.0f}ms per request")
+        print(
+            f"{'checkpointer':<12} {'compression':<11} {'turns':>5} "
+            f"{'operation':<10} {'calls':>5} {'p50 ms':>8} {'p95 ms':>8}  "
+            "requests per call"
+        )
+        for kind in args.checkpointers:
+            for compression in args.compressions:
+                for turns in args.turns:
+                    recorder = run(
+                        stand_in,
+                        kind,
+                        compression,
+                        turns,
+                        args.repeat,
+                        args.endpoint_url,
+                    )
+                    for operation in OPERATIONS:
+                        samples = recorder.samples[operation]
+                        print(
+                            f"{kind:<12} {compression:<11} {turns:>5} "
+                            f"{operation:<10} {len(samples):>5} "
+                            f"{percentile(samples, 50):>8.1f} "
+                            f"{percentile(samples, 95):>8.1f}  "
+                            + format_requests(
+                                recorder.requests[operation], len(samples)
+                            )
+                        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+# ruff: noqa: E402
+"""
+Compares compression ratio and CPU time of the checkpoint compression options,
+including zstd at several levels and with a dictionary trained on sample
+checkpoints, on synthetic agent checkpoints and single messages (the size of a
+typical pending write).
+
+Usage (from the chat directory):
+    python benchmarks/compression.py --turns 1 5 20
+"""
+
+import sys
+
+sys.path.append("./src")
+
+import argparse
+import time
+from conversation import checkpoint, conversation
+from persistence.compressible_json_serializer import (
+    CompressibleJsonSerializer,
+    train_zstd_dictionary,
+)
+
+SETTINGS = [
+    ("gzip", 6, False),
+    ("gzip", 9, False),
+    ("bz2", 9, False),
+    ("zstd", 1, False),
+    ("zstd", 3, False),
+    ("zstd", 9, False),
+    ("zstd", 19, False),
+    ("zstd", 3, True),
+]
+
+
+def cpu_ms(fn, repeat):
+    start = time.process_time()
+    for _ in range(repeat):
+        result = fn()
+    return (time.process_time() - start) * 1000 / repeat, result
+
+
+def samples(count):
+    """Checkpoints and messages from conversations other than the measured one"""
+    result = []
+    for seed in range(1, count + 1):
+        messages = conversation(1 + seed % 5, seed=seed)
+        result.append(checkpoint(messages))
+        result.extend({"messages": [message]} for message in messages)
+    return result
+
+
+def run(state, serialization, compression, level, dictionary, repeat):
+    serde = CompressibleJsonSerializer(
+        compression=compression,
+        serialization=serialization,
+        compression_level=level,
+        zstd_dictionary=dictionary,
+    )
+    raw = CompressibleJsonSerializer(serialization=serialization).dumps_typed(state)[1]
+    compress_ms, data = cpu_ms(lambda: serde.dumps_typed(state), repeat)
+    decompress_ms, _ = cpu_ms(lambda: serde.loads_typed(data), repeat)
+    return len(raw) / len(data[1]), compress_ms, decompress_ms, len(data[1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--turns", type=int, nargs="+", default=[1, 5, 20])
+    parser.add_argument("--serialization", default="json", choices=["json", "msgpack"])
+    parser.add_argument("--samples", type=int, default=50)
+    parser.add_argument("--dict-size", type=int, default=64 * 1024)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    dictionary = train_zstd_dictionary(
+        samples(args.samples), args.dict_size, args.serialization
+    )
+    print(f"Trained a {len(dictionary)} byte zstd dictionary\n")
+
+    messages = conversation(max(args.turns))
+    payloads = [("message", {"messages": [messages[-1]]})]
+    payloads.extend(
+        (f"{turns} turns", checkpoint(messages[: turns * 4])) for turns in args.turns
+    )
+
+    print(
+        f"{'payload':<10} {'compression':<14} {'ratio':>6} "
+        f"{'compress ms':>11} {'decompress ms':>13} {'bytes':>10}"
+    )
+    for name, state in payloads:
+        for compression, level, use_dictionary in SETTINGS:
+            ratio, compress_ms, decompress_ms, size = run(
+                state,
+                args.serialization,
+                compression,
+                level,
+                dictionary if use_dictionary else None,
+                args.repeat,
+            )
+            label = f"{compression}-{level}" + ("+dict" if use_dictionary else "")
+            print(
+                f"{name:<10} {label:<14} {ratio:>6.2f} "
+                f"{compress_ms:>11.3f} {decompress_ms:>13.3f} {size:>10}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Synthetic agent conversations and checkpoints shaped like the ones the chat
+agent produces: each turn is a question, a search tool call, a search result
+with 20 minimized documents, and an answer.
+"""
+
+import json
+import random
+import uuid
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+WORDS = (
+    "football northwestern campus photograph archive letter map poster student "
+    "evanston lake michigan library collection portrait music band parade game "
+    "university chicago illinois history architecture building"
+).split()
+
+
+def _sentence(rng, length):
+    return " ".join(rng.choice(WORDS) for _ in range(length)).capitalize() + "."
+
+
+def search_result(rng, i):
+    return {
+        "id": str(uuid.UUID(int=rng.getrandbits(128))),
+        "title": _sentence(rng, 6),
+        "alternate_title": None,
+        "description": [_sentence(rng, 40)],
+        "abstract": None,
+        "subject": [_sentence(rng, 3) for _ in range(6)],
+        "date_created": [f"{1900 + i}"],
+        "provenance": None,
+        "collection": _sentence(rng, 4),
+        "creator": [_sentence(rng, 2)],
+        "contributor": [_sentence(rng, 2) for _ in range(2)],
+        "work_type": rng.choice(["Image", "Audio", "Video"]),
+        "genre": [_sentence(rng, 2)],
+        "scope_and_contents": None,
+        "table_of_contents": None,
+        "cultural_context": None,
+        "notes": [_sentence(rng, 20)],
+        "keywords": None,
+        "visibility": "Public",
+        "canonical_link": f"https://dc.library.northwestern.edu/items/{i}",
+        "rights_statement": "In Copyright",
+    }
+
+
+def interaction(rng, turn, documents=20):
+    tool_call_id = f"tooluse_{turn}"
+    results = [search_result(rng, i) for i in range(documents)]
+    return [
+        HumanMessage(content=f"Question {turn}: {_sentence(rng, 12)}"),
+        AIMessage(
+            content="",
+            tool_calls=[
+                {
+                    "name": "search",
+                    "args": {"query": _sentence(rng, 3)},
+                    "id": tool_call_id,
+                }
+            ],
+            response_metadata={"stop_reason": "tool_use"},
+        ),
+        ToolMessage(
+            content=json.dumps(results, separators=(",", ":")),
+            name="search",
+            tool_call_id=tool_call_id,
+        ),
+        AIMessage(
+            content=" ".join(_sentence(rng, 15) for _ in range(8)),
+            response_metadata={"stop_reason": "end_turn"},
+        ),
+    ]
+
+
+def conversation(turns, seed=0, documents=20):
+    rng = random.Random(seed)
+    messages = []
+    for turn in range(turns):
+        messages.extend(interaction(rng, turn, documents))
+    return messages
+
+
+def checkpoint(messages, checkpoint_id=None):
+    return {
+        "v": 4,
+        "id": checkpoint_id or str(uuid.uuid4()),
+        "ts": "2025-01-01T00:00:00+00:00",
+        "channel_values": {"messages": messages, "facets": None},
+        "channel_versions": {"messages": len(messages), "facets": 1},
+        "versions_seen": {"agent": {"messages": len(messages)}},
+        "pending_sends": [],
+    }
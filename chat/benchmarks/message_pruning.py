@@ -0,0 +1,73 @@
+# ruff: noqa: E402
+"""
+Compares the time SelectiveCheckpointer spends pruning tool messages on each
+graph step, pruning the whole history versus only the messages appended since
+the parent checkpoint, on long synthetic conversations.
+
+Usage (from the chat directory):
+    python benchmarks/message_pruning.py --turns 50 500
+"""
+
+import sys
+
+sys.path.append("./src")
+
+import argparse
+import random
+import time
+from conversation import conversation, interaction
+from persistence.selective_checkpointer import (
+    _interaction_start,
+    _prune_messages,
+    _prune_new_messages,
+    _prune_state,
+)
+
+
+def prune_full(messages, state):
+    pruned = _prune_messages(messages)
+    start = _interaction_start(pruned)
+    return pruned, _prune_state("next", messages, start, pruned, pruned[:start])
+
+
+def prune_incremental(messages, state):
+    pruned, start, prefix = _prune_new_messages(messages, state)
+    return pruned, _prune_state("next", messages, start, pruned, prefix)
+
+
+def run(turns, prune, repeat):
+    # The history as loaded from the latest checkpoint, pruned up to its last
+    # interaction, then the graph steps of one more turn
+    stored = _prune_messages(conversation(turns - 1, documents=1))
+    start = _interaction_start(stored)
+    new_messages = interaction(random.Random(turns), turns, documents=1)
+
+    samples = []
+    for _ in range(repeat):
+        messages = list(stored)
+        state = _prune_state("loaded", messages, start, messages, messages[:start])
+        for message in new_messages:
+            messages.append(message)
+            begin = time.perf_counter()
+            _, state = prune(messages, state)
+            samples.append((time.perf_counter() - begin) * 1_000_000)
+    return sum(samples) / len(samples), len(stored) + len(new_messages)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--turns", type=int, nargs="+", default=[50, 500])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    print(
+        f"{'turns':>5} {'messages':>8} {'full us/step':>12} {'incremental us/step':>19}"
+    )
+    for turns in args.turns:
+        full_us, count = run(turns, prune_full, args.repeat)
+        incremental_us, _ = run(turns, prune_incremental, args.repeat)
+        print(f"{turns:>5} {count:>8} {full_us:>12.1f} {incremental_us:>19.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+# ruff: noqa: E402
+"""
+Measures the per-call latency saved by sharing one OpenSearch client across
+tool calls instead of building a new one for each call.
+
+Two costs are measured separately:
+- setup: building the vector store (boto3 session, credential resolution,
+  AWS4Auth, and the client) with opensearch_vector_store, fresh each call
+  versus shared
+- request: a search against a local HTTP stand-in that delays each new
+  connection by --connect-ms to approximate a TLS handshake, with a new client
+  (and connection) per call versus a shared client with a keep-alive
+  connection
+
+Usage (from the chat directory):
+    python benchmarks/opensearch_client.py --connect-ms 30 --calls 50
+"""
+
+import sys
+
+sys.path.append("./src")
+
+import argparse
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+import boto3
+from core.setup import opensearch_vector_store, reset_opensearch_clients
+from opensearchpy import OpenSearch, RequestsHttpConnection
+from requests_aws4auth import AWS4Auth
+from s3_stand_in import REGION, percentile
+
+SEARCH_RESPONSE = json.dumps({"hits": {"hits": []}}).encode("utf-8")
+
+
+def stand_in_handler(connect_delay):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def setup(self):
+            # Runs once per connection, so keep-alive requests skip it
+            time.sleep(connect_delay)
+            super().setup()
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(SEARCH_RESPONSE)))
+            self.end_headers()
+            self.wfile.write(SEARCH_RESPONSE)
+
+        do_GET = do_POST
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+@contextmanager
+def opensearch_stand_in(connect_delay):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), stand_in_handler(connect_delay))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server.server_address[1]
+    finally:
+        server.shutdown()
+
+
+def stand_in_client(port):
+    # Built the way opensearch_client builds the real one
+    session = boto3.Session(region_name=REGION)
+    return OpenSearch(
+        hosts=[{"host": "127.0.0.1", "port": port}],
+        connection_class=RequestsHttpConnection,
+        http_auth=AWS4Auth(
+            region=REGION,
+            service="es",
+            refreshable_credentials=session.get_credentials(),
+        ),
+        pool_maxsize=10,
+    )
+
+
+def measure(fn, calls):
+    samples = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def report(name, samples):
+    print(f"{name:<16} {percentile(samples, 50):>8.2f} {percentile(samples, 95):>8.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--connect-ms", type=float, default=30.0)
+    parser.add_argument("--calls", type=int, default=50)
+    args = parser.parse_args()
+
+    env = {
+        "AWS_REGION": REGION,
+        "AWS_ACCESS_KEY_ID": os.getenv("AWS_ACCESS_KEY_ID", "benchmark"),
+        "AWS_SECRET_ACCESS_KEY": os.getenv("AWS_SECRET_ACCESS_KEY", "benchmark"),
+        "OPENSEARCH_ENDPOINT": "search.example.com",
+        "OPENSEARCH_MODEL_ID": "benchmark-model",
+    }
+    with patch.dict(os.environ, env):
+        print(f"Simulated connection setup: {args.connect_ms:.0f}ms")
+        print(f"{'call':<16} {'p50 ms':>8} {'p95 ms':>8}")
+
+        def fresh_vector_store():
+            reset_opensearch_clients()
+            opensearch_vector_store()
+
+        report("setup new", measure(fresh_vector_store, args.calls))
+        reset_opensearch_clients()
+        opensearch_vector_store()
+        report("setup shared", measure(opensearch_vector_store, args.calls))
+
+        with opensearch_stand_in(args.connect_ms / 1000) as port:
+            report(
+                "request new",
+                measure(lambda: stand_in_client(port).search(body={}), args.calls),
+            )
+            client = stand_in_client(port)
+            client.search(body={})
+            report(
+                "request shared", measure(lambda: client.search(body={}), args.calls)
+            )
+
+
+if __name__ == "__main__":
+    main()
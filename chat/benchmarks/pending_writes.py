@@ -0,0 +1,84 @@
+# ruff: noqa: E402
+"""
+Measures how long S3Checkpointer.get_tuple takes to load a checkpoint as the
+number of pending writes grows, with sequential and concurrent write fetching.
+
+Usage (from the chat directory):
+    python benchmarks/pending_writes.py --latency-ms 20
+"""
+
+import sys
+
+sys.path.append("./src")
+
+import argparse
+import time
+from langgraph.checkpoint.base import Checkpoint
+from persistence.s3_checkpointer import S3Checkpointer
+from s3_stand_in import BUCKET_NAME, REGION, S3StandIn, percentile
+
+WRITE_COUNTS = [1, 5, 10, 20, 40]
+CONCURRENCY = [1, 4, 8, 16]
+
+
+def search_result(i):
+    return {
+        "id": f"work-{i}",
+        "title": f"Search result {i}",
+        "description": "Lorem ipsum dolor sit amet. " * 40,
+        "subject": [{"label": f"Subject {n}"} for n in range(10)],
+    }
+
+
+def run(stand_in, write_count, concurrency, repeat, endpoint_url):
+    saver = S3Checkpointer(
+        bucket_name=BUCKET_NAME,
+        region_name=REGION,
+        endpoint_url=endpoint_url,
+        write_concurrency=concurrency,
+    )
+    thread_id = f"pending-writes-{write_count}-{concurrency}"
+    config = {"configurable": {"thread_id": thread_id, "checkpoint_ns": ""}}
+    config = saver.put(config, Checkpoint(id="checkpoint"), {}, {})
+    writes = [("messages", search_result(i)) for i in range(write_count)]
+    for task in range(0, write_count, 5):
+        saver.put_writes(config, writes[task : task + 5], f"task-{task}")
+
+    samples = []
+    stand_in.reset()
+    for _ in range(repeat):
+        start = time.perf_counter()
+        saver.get_tuple(config)
+        samples.append((time.perf_counter() - start) * 1000)
+    requests = sum(stand_in.requests.values()) // repeat
+
+    saver.delete_checkpoints(thread_id)
+    return samples, requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--endpoint-url", default=None)
+    args = parser.parse_args()
+
+    stand_in = S3StandIn(latency=args.latency_ms / 1000, endpoint_url=args.endpoint_url)
+    with stand_in.running():
+        print(f"Simulated S3 latency: {args.latency_ms:.0f}ms per request")
+        print(
+            f"{'writes':>6} {'workers':>7} {'requests':>8} {'p50 ms':>8} {'p95 ms':>8}"
+        )
+        for write_count in WRITE_COUNTS:
+            for concurrency in CONCURRENCY:
+                samples, requests = run(
+                    stand_in, write_count, concurrency, args.repeat, args.endpoint_url
+                )
+                print(
+                    f"{write_count:>6} {concurrency:>7} {requests:>8} "
+                    f"{percentile(samples, 50):>8.1f} {percentile(samples, 95):>8.1f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+import boto3
+import time
+from collections import Counter
+from contextlib import contextmanager
+from moto import mock_aws
+from typing import Optional
+
+BUCKET_NAME = "benchmark-checkpoints"
+REGION = "us-east-1"
+
+
+class S3StandIn:
+    """
+    A local S3 stand-in for benchmarking checkpointers.
+
+    By default, requests are served in-process by moto. Pass an endpoint_url to
+    run against an external emulator (e.g., `moto_server` or MinIO) instead.
+    Every S3 request made by clients created while the stand-in is active is
+    delayed by `latency` seconds and counted by operation name.
+    """
+
+    def __init__(self, latency: float = 0.0, endpoint_url: Optional[str] = None):
+        self.latency = latency
+        self.endpoint_url = endpoint_url
+        self.requests = Counter()
+
+    def _on_request(self, operation_name, **kwargs):
+        self.requests[operation_name] += 1
+        if self.latency > 0:
+            time.sleep(self.latency)
+
+    def reset(self):
+        self.requests.clear()
+
+    @contextmanager
+    def running(self, bucket_name: str = BUCKET_NAME):
+        mock = mock_aws() if self.endpoint_url is None else None
+        if mock:
+            mock.start()
+        # moto resets the default session when it starts, so the hook must be
+        # registered afterwards
+        boto3.setup_default_session(region_name=REGION)
+        boto3.DEFAULT_SESSION.events.register("before-sign.s3", self._on_request)
+        try:
+            s3 = boto3.client("s3", endpoint_url=self.endpoint_url)
+            s3.create_bucket(Bucket=bucket_name)
+            self.reset()
+            yield self
+        finally:
+            if mock:
+                mock.stop()
+            boto3.DEFAULT_SESSION = None
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
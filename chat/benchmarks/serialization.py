@@ -0,0 +1,89 @@
+# ruff: noqa: E402
+"""
+Compares encode time, decode time, and stored size of the checkpoint
+serialization types and envelope formats on synthetic agent checkpoints.
+
+Usage (from the chat directory):
+    python benchmarks/serialization.py --turns 1 5 20
+"""
+
+import sys
+
+sys.path.append("./src")
+
+import argparse
+import time
+from conversation import checkpoint, conversation
+from persistence.compressible_json_serializer import CompressibleJsonSerializer
+from persistence.s3_checkpointer import _decode_envelope, _encode_envelope
+
+SETTINGS = [
+    ("json", None, "json"),
+    ("json", "gzip", "json"),
+    ("json", "bz2", "json"),
+    ("msgpack", None, "msgpack"),
+    ("msgpack", "gzip", "msgpack"),
+    ("msgpack", "bz2", "msgpack"),
+    ("json", None, "binary"),
+    ("json", "gzip", "binary"),
+    ("msgpack", None, "binary"),
+    ("msgpack", "gzip", "binary"),
+]
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return min(samples), result
+
+
+def run(state, serialization, compression, envelope, repeat):
+    serde = CompressibleJsonSerializer(
+        compression=compression, serialization=serialization
+    )
+    dumps = serde.dumps_binary if envelope == "binary" else serde.dumps_typed
+
+    # Measure the object as it is stored in S3, including the envelope
+    def encode():
+        ck_type, ck_data = dumps(state)
+        data = {"checkpoint_type": ck_type, "checkpoint_data": ck_data}
+        return _encode_envelope(data, envelope)[0]
+
+    encode_ms, body = timed(encode, repeat)
+
+    def decode():
+        data = _decode_envelope(body)
+        return serde.loads_typed((data["checkpoint_type"], data["checkpoint_data"]))
+
+    decode_ms, _ = timed(decode, repeat)
+    return encode_ms, decode_ms, len(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--turns", type=int, nargs="+", default=[1, 5, 20])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(
+        f"{'turns':>5} {'type':<14} {'envelope':<8} "
+        f"{'encode ms':>9} {'decode ms':>9} {'bytes':>10}"
+    )
+    for turns in args.turns:
+        state = checkpoint(conversation(turns))
+        for serialization, compression, envelope in SETTINGS:
+            encode_ms, decode_ms, size = run(
+                state, serialization, compression, envelope, args.repeat
+            )
+            type_ = f"{compression}_{serialization}" if compression else serialization
+            print(
+                f"{turns:>5} {type_:<14} {envelope:<8} "
+                f"{encode_ms:>9.2f} {decode_ms:>9.2f} {size:>10}"
+            )
+
+
+if __name__ == "__main__":
+    main()
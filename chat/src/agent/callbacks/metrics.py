@@ -11,6 +11,7 @@ import os
 class MetricsCallbackHandler(BaseCallbackHandler):
     def __init__(self, log_stream=None, *args, extra_data={}, **kwargs):
         self.accumulator = {}
+        self.checkpoint_requests = {}
         self.answers = []
         self.artifacts = []
         self.log_stream = log_stream
@@ -77,6 +78,7 @@ class MetricsCallbackHandler(BaseCallbackHandler):
                 "answer": self.answers,
                 "artifacts": self.artifacts,
                 "token_counts": self.accumulator,
+                "checkpoint_requests": self.checkpoint_requests,
             }
             message.update(self.extra_data)
 
@@ -98,6 +98,16 @@ class SocketCallbackHandler(BaseCallbackHandler):
                 self.socket.send(
                     {"type": "search_result", "ref": self.ref, "message": docs}
                 )
+            case "search_many" if isinstance(content, list):
+                result_fields = ("id", "title", "visibility", "work_type", "thumbnail")
+                docs: List[Dict[str, Any]] = [
+                    {k: doc.get(k) for k in result_fields}
+                    for result in content
+                    for doc in result["documents"]
+                ]
+                self.socket.send(
+                    {"type": "search_result", "ref": self.ref, "message": docs}
+                )
             case "retrieve_documents":
                 result_fields = ("id", "title", "visibility", "work_type", "thumbnail")
                 docs: List[Dict[str, Any]] = [
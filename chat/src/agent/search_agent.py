@@ -1,7 +1,7 @@
 import json
 from typing import Literal, List
 from langchain_core.messages import HumanMessage, ToolMessage
-from agent.tools import aggregate, discover_fields, search, retrieve_documents
+from agent.tools import aggregate, discover_fields, search, search_many, retrieve_documents
 from langchain_core.messages.base import BaseMessage
 from langchain_core.language_models.chat_models import BaseModel
 from langchain_core.callbacks import BaseCallbackHandler
@@ -9,8 +9,8 @@ from langchain_core.messages.system import SystemMessage
 from langgraph.graph import END, START, StateGraph, MessagesState
 from langgraph.prebuilt import ToolNode
 from langgraph.errors import GraphRecursionError
-from core.document import minimize_documents
-from core.setup import checkpoint_saver
+from core.document import minimize_documents, minimize_search_results
+from core.setup import checkpoint_saver, wait_for_query_embeddings
 from agent.callbacks.socket import SocketCallbackHandler
 from typing import Optional
 import time
@@ -54,7 +54,7 @@ class FacetsToolNode:
         # If there are tool calls and we have facets, inject them
         if hasattr(last_message, 'tool_calls') and current_facets:
             for tool_call in last_message.tool_calls:
-                if tool_call['name'] in ['search', 'aggregate']:
+                if tool_call['name'] in ['search', 'search_many', 'aggregate']:
                     if 'facets' not in tool_call['args'] or tool_call['args']['facets'] is None:
                         tool_call['args']['facets'] = current_facets
         
@@ -63,10 +63,14 @@ class FacetsToolNode:
 
 
 class SearchWorkflow:
-    def __init__(self, model: BaseModel, system_message: str, metrics=None):
+    def __init__(
+        self, model: BaseModel, system_message: str, metrics=None, load_messages=None
+    ):
         self.metrics = metrics
         self.model = model
         self.system_message = system_message
+        # Restores message content the checkpointer stored separately
+        self.load_messages = load_messages
 
     def should_continue(self, state: SearchAgentState) -> Literal["tools", END]:
         messages = state["messages"]
@@ -81,24 +85,28 @@ class SearchWorkflow:
         messages = state["messages"]
         last_message = messages[-1]
         
-        if not hasattr(last_message, 'name') or last_message.name not in ["search", "retrieve_documents"]:
+        if not hasattr(last_message, 'name') or last_message.name not in ["search", "search_many", "retrieve_documents"]:
             return {"messages": messages}
         
         start_time = time.time()
+        minimize = minimize_search_results if last_message.name == "search_many" else minimize_documents
 
         # Handle both JSON string and already parsed content
         if isinstance(last_message.content, str):
             try:
-                content = minimize_documents(json.loads(last_message.content))
+                content = json.loads(last_message.content)
             except json.JSONDecodeError:
                 return {"messages": messages}
         elif isinstance(last_message.content, list):
-            content = minimize_documents(last_message.content)
+            content = last_message.content
         else:
             return {"messages": messages}
-    
 
-        content = minimize_documents(json.loads(last_message.content))
+        # Tool errors come back as an object rather than a list of results
+        if not isinstance(content, list):
+            return {"messages": messages}
+        content = minimize(content)
+
         content = json.dumps(content, separators=(",", ":"))
         end_time = time.time()
         elapsed_time = end_time - start_time
@@ -120,7 +128,10 @@ class SearchWorkflow:
             facets_context = self._create_facets_context(facets)
             system_content = f"{system_content}\n\n{facets_context}"
         
-        messages = [SystemMessage(content=system_content)] + state["messages"]
+        history = state["messages"]
+        if self.load_messages is not None:
+            history = self.load_messages(history)
+        messages = [SystemMessage(content=system_content)] + history
         response: BaseMessage = self.model.invoke(messages)
         # We return a list, because this will get added to the existing list
         return {"messages": [response]}
@@ -164,8 +175,9 @@ class SearchAgent:
         **kwargs,
     ):
         self.current_facets = None
+        self.metrics = metrics
 
-        tools = [discover_fields, search, aggregate, retrieve_documents]
+        tools = [discover_fields, search, search_many, aggregate, retrieve_documents]
         self.facets_tool_node = FacetsToolNode(tools)
 
         try:
@@ -173,8 +185,12 @@ class SearchAgent:
         except NotImplementedError:
             pass
 
+        self.checkpointer = checkpoint_saver()
         self.workflow_logic = SearchWorkflow(
-            model=model, system_message=system_message, metrics=metrics
+            model=model,
+            system_message=system_message,
+            metrics=metrics,
+            load_messages=getattr(self.checkpointer, "load_offloaded", None),
         )
 
         # Define a new graph with extended state
@@ -196,7 +212,6 @@ class SearchAgent:
         workflow.add_edge("tools", "summarize")
         workflow.add_edge("summarize", "agent")
 
-        self.checkpointer = checkpoint_saver()
         self.search_agent = workflow.compile(checkpointer=self.checkpointer)
 
     def invoke(
@@ -209,12 +224,59 @@ class SearchAgent:
         callbacks: List[BaseCallbackHandler] = [],
         forget: bool = False,
         **kwargs,
+    ):
+        storage_metrics = getattr(self.checkpointer, "metrics", None)
+        if storage_metrics is not None:
+            storage_metrics.reset()
+        try:
+            result = self._invoke(
+                question,
+                ref,
+                docs=docs,
+                facets=facets,
+                callbacks=callbacks,
+                forget=forget,
+                **kwargs,
+            )
+        except Exception:
+            try:
+                self._finish_invocation(storage_metrics)
+            except Exception as e:
+                # Keep the error that ended the invocation
+                print(f"Error finishing invocation: {e}")
+            raise
+        self._finish_invocation(storage_metrics)
+        return result
+
+    def _finish_invocation(self, storage_metrics) -> None:
+        try:
+            # Wait for checkpoint writes the checkpointer deferred, so they're
+            # saved before the container is frozen
+            flush = getattr(self.checkpointer, "flush", None)
+            if flush is not None:
+                flush()
+        finally:
+            wait_for_query_embeddings()
+            if storage_metrics is not None and self.metrics is not None:
+                self.metrics.checkpoint_requests = storage_metrics.snapshot()
+
+    def _invoke(
+        self,
+        question: str,
+        ref: str,
+        *,
+        docs: Optional[List[str]] = None,
+        facets: Optional[List[dict]] = None,
+        callbacks: List[BaseCallbackHandler] = [],
+        forget: bool = False,
+        **kwargs,
     ):
         self.current_facets = facets
         self.facets_tool_node.set_facets(facets)
 
         if forget:
-            self.checkpointer.delete_checkpoints(ref)
+            # Delete in the background, and wait for it when flushing below
+            self.checkpointer.delete_checkpoints(ref, wait=False)
 
         # If documents are provided, skip the search tools and use these docs directly
         if docs and len(docs) > 0:
@@ -257,6 +319,8 @@ class SearchAgent:
                 messages = (
                     state.get("channel_values", {}).get("messages", []) if state else []
                 )
+                if self.workflow_logic.load_messages is not None:
+                    messages = self.workflow_logic.load_messages(messages)
 
                 # Extract relevant responses including tool outputs
                 responses = []
@@ -1,8 +1,16 @@
 import json
+import threading
+import time
 
 from langchain_core.tools import tool
 from core.setup import opensearch_vector_store
-from typing import List
+from typing import Dict, FrozenSet, List, NamedTuple
+
+# How long an index's keyword fields are cached before the mapping is read again
+KEYWORD_FIELDS_TTL = 15 * 60
+# How soon a cached field list may be refreshed early, when asked about a field
+# it doesn't have (e.g., one added to the mapping since)
+KEYWORD_FIELDS_MIN_REFRESH = 60
 
 def get_keyword_fields(properties, prefix=""):
     """
@@ -25,6 +33,50 @@ def get_keyword_fields(properties, prefix=""):
     return keyword_fields
 
 
+class KeywordFields(NamedTuple):
+    fields: List[str]
+    field_set: FrozenSet[str]
+    loaded_at: float
+
+
+_keyword_fields: Dict[str, KeywordFields] = {}
+_keyword_fields_lock = threading.Lock()
+
+
+def keyword_fields(opensearch, max_age: float = KEYWORD_FIELDS_TTL) -> KeywordFields:
+    """
+    Returns the keyword fields of the vector store's index, reading its mapping
+    only if the cached list is older than max_age seconds
+    """
+    with _keyword_fields_lock:
+        cached = _keyword_fields.get(opensearch.index)
+    if cached is not None and time.monotonic() - cached.loaded_at < max_age:
+        return cached
+
+    mapping = opensearch.client.indices.get_mapping(index=opensearch.index)
+    fields = get_keyword_fields(list(mapping.values())[0]["mappings"]["properties"])
+    cached = KeywordFields(fields, frozenset(fields), time.monotonic())
+    with _keyword_fields_lock:
+        _keyword_fields[opensearch.index] = cached
+    return cached
+
+
+def is_keyword_field(opensearch, field: str) -> bool:
+    """
+    Checks a field against the cached keyword fields, refreshing them first if
+    the field is missing and they are old enough to be out of date
+    """
+    if field in keyword_fields(opensearch).field_set:
+        return True
+    return field in keyword_fields(opensearch, KEYWORD_FIELDS_MIN_REFRESH).field_set
+
+
+def reset_keyword_fields():
+    """Discards the cached keyword fields (e.g., in tests)"""
+    with _keyword_fields_lock:
+        _keyword_fields.clear()
+
+
 def filter_results(results):
     """
     Filters out the embeddings from the results
@@ -44,11 +96,7 @@ def discover_fields():
     Discover the fields available in the OpenSearch index. This tool is useful for understanding the structure of the index and the fields available for aggregation queries.
     """
     # filter fields that are not useful for aggregation (only include keyword fields)
-    opensearch = opensearch_vector_store()
-    fields = opensearch.client.indices.get_mapping(index=opensearch.index)
-    top_properties = list(fields.values())[0]["mappings"]["properties"]
-    result = get_keyword_fields(top_properties)
-    return result
+    return list(keyword_fields(opensearch_vector_store()).fields)
 
 
 @tool(response_format="content")
@@ -65,6 +113,42 @@ def search(query: str, facets: list = None):
     return filter_results(query_results)
 
 
+@tool(response_format="content")
+def search_many(queries: List[str], facets: list = None):
+    """Perform several semantic searches of Northwestern University Library digital collections at once. Use this instead of repeated search calls to explore different angles of a question (e.g., synonyms, related people, places, or time periods) in a single step.
+
+    Results come back per query. Each document is returned once, under the first query that found it; later queries that also found it list its id in duplicate_ids.
+
+    If facets are provided use them in every search (do not broaden).
+
+    Args:
+        queries (List[str]): The search queries
+        facets (list): Optional facet filters to apply, e.g. [{"collection.title.keyword": ["Posters from Herskovitz"]}, {"subject.label": ["Nigeria"]}]
+    """
+    try:
+        query_results = opensearch_vector_store().batch_similarity_search(
+            queries, size=20, facets=facets
+        )
+    except Exception as e:
+        return json.dumps({"error": str(e)})
+
+    seen = set()
+    results = []
+    for query, docs in zip(queries, query_results):
+        documents = []
+        duplicate_ids = []
+        for doc in json.loads(filter_results(docs)):
+            if doc.get("id") in seen:
+                duplicate_ids.append(doc.get("id"))
+            else:
+                seen.add(doc.get("id"))
+                documents.append(doc)
+        results.append(
+            {"query": query, "documents": documents, "duplicate_ids": duplicate_ids}
+        )
+    return json.dumps(results)
+
+
 @tool(response_format="content")
 def aggregate(agg_field: str, term_field: str, term: str, facets: list = None):
     """
@@ -86,7 +170,16 @@ def aggregate(agg_field: str, term_field: str, term: str, facets: list = None):
     See sum_other_doc_count to get the total count of documents, even if the aggregation is limited by size.
     """
     try:
-        response = opensearch_vector_store().aggregations_search(
+        opensearch = opensearch_vector_store()
+        if not is_keyword_field(opensearch, agg_field):
+            return json.dumps(
+                {
+                    "error": f"{agg_field} is not a keyword field. Use the "
+                    "discover_fields tool to list the fields available for "
+                    "aggregation."
+                }
+            )
+        response = opensearch.aggregations_search(
             agg_field, term_field, term, facets=facets
         )
         return response
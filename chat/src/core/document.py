@@ -2,6 +2,13 @@ def minimize_documents(docs):
     return [minimize_document(doc) for doc in docs]
 
 
+def minimize_search_results(results):
+    return [
+        {**result, "documents": minimize_documents(result.get("documents", []))}
+        for result in results
+    ]
+
+
 def minimize_document(doc):
     return {
         "id": doc.get("id"),
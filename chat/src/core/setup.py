@@ -1,12 +1,23 @@
+from persistence.checkpoint_cache import CheckpointCache
+from persistence.local_checkpoint_store import LocalCheckpointStore
 from persistence.selective_checkpointer import SelectiveCheckpointer
+from persistence.tiered_checkpointer import TieredCheckpointer
+from search.embedding_cache import EmbeddingCache
 from search.opensearch_neural_search import OpenSearchNeuralSearch
+from search.search_result_cache import (
+    DEFAULT_SEARCH_CACHE_SIZE,
+    DEFAULT_SEARCH_CACHE_TTL,
+    SearchResultCache,
+)
 from langchain_aws import ChatBedrock
 from langchain_core.language_models.base import BaseModel
 from langgraph.checkpoint.base import BaseCheckpointSaver
 from opensearchpy import OpenSearch, RequestsHttpConnection
 from requests_aws4auth import AWS4Auth
+from typing import Optional
 from urllib.parse import urlparse
 import os
+import threading
 import boto3
 
 
@@ -14,8 +25,64 @@ def chat_model(**kwargs) -> BaseModel:
     return ChatBedrock(**kwargs)
 
 
+_checkpoint_cache = None
+
+
+def checkpoint_cache() -> Optional[CheckpointCache]:
+    """
+    Returns the checkpoint cache shared by every checkpointer in this process,
+    or None if CHECKPOINT_CACHE_SIZE is unset or 0.
+    """
+    global _checkpoint_cache
+    cache_size = int(os.getenv("CHECKPOINT_CACHE_SIZE") or 0)
+    if cache_size <= 0:
+        return None
+    if _checkpoint_cache is None or _checkpoint_cache.max_size != cache_size:
+        _checkpoint_cache = CheckpointCache(max_size=cache_size)
+    return _checkpoint_cache
+
+
+_local_checkpoint_store = None
+
+
+def local_checkpoint_store() -> Optional[LocalCheckpointStore]:
+    """
+    Returns the local checkpoint store shared by every checkpointer in this
+    process, or None if CHECKPOINT_LOCAL_STORE (the SQLite file's path, e.g.,
+    /tmp/checkpoints.sqlite3) is unset.
+
+    It is unset in template.yaml: with the store, checkpoints are uploaded in
+    the background, so a conflict with another writer is only found when the
+    invocation flushes, after the answer has been streamed to the user.
+    """
+    global _local_checkpoint_store
+    path = os.getenv("CHECKPOINT_LOCAL_STORE")
+    if not path:
+        return None
+    if _local_checkpoint_store is None or _local_checkpoint_store.path != path:
+        _local_checkpoint_store = LocalCheckpointStore(path=path)
+    return _local_checkpoint_store
+
+
 def checkpoint_saver(**kwargs) -> BaseCheckpointSaver:
     checkpoint_bucket: str = os.getenv("CHECKPOINT_BUCKET_NAME")
+    cache = checkpoint_cache()
+    if cache is not None:
+        kwargs.setdefault("cache", cache)
+    max_history_bytes = int(os.getenv("CHECKPOINT_MAX_HISTORY_BYTES") or 0)
+    if max_history_bytes > 0:
+        kwargs.setdefault("max_history_bytes", max_history_bytes)
+    offload_threshold = int(os.getenv("CHECKPOINT_OFFLOAD_BYTES") or 0)
+    if offload_threshold > 0:
+        kwargs.setdefault("offload_threshold", offload_threshold)
+    local_store = local_checkpoint_store()
+    if local_store is not None:
+        return TieredCheckpointer(
+            bucket_name=checkpoint_bucket,
+            local_store=local_store,
+            retain_history=False,
+            **kwargs,
+        )
     return SelectiveCheckpointer(
         bucket_name=checkpoint_bucket, retain_history=False, **kwargs
     )
@@ -36,42 +103,113 @@ def opensearch_endpoint():
         return endpoint
 
 
+DEFAULT_OPENSEARCH_POOL_SIZE = 10
+
+_opensearch_lock = threading.Lock()
+_opensearch_clients = {}
+_opensearch_vector_stores = {}
+
+
+def opensearch_pool_size() -> int:
+    return int(os.getenv("OPENSEARCH_POOL_SIZE") or DEFAULT_OPENSEARCH_POOL_SIZE)
+
+
 def opensearch_client(region_name=None):
+    """
+    Returns the OpenSearch client shared by every caller in this process for
+    the current region, endpoint, and OPENSEARCH_POOL_SIZE, so that tool calls
+    reuse its signed credentials and keep-alive connections. A new client is
+    built if any of them change. The credentials are refreshed as they expire.
+    """
     region_name = region_name or os.getenv("AWS_REGION")  # Evaluate at runtime
-    session = boto3.Session(region_name=region_name)
-    awsauth = AWS4Auth(
-        region=region_name,
-        service="es",
-        refreshable_credentials=session.get_credentials(),
-    )
     endpoint = opensearch_endpoint()
-
-    return OpenSearch(
-        hosts=[{"host": endpoint, "port": 443}],
-        use_ssl=True,
-        connection_class=RequestsHttpConnection,
-        http_auth=awsauth,
+    pool_size = opensearch_pool_size()
+    key = (region_name, endpoint, pool_size)
+    with _opensearch_lock:
+        if key not in _opensearch_clients:
+            session = boto3.Session(region_name=region_name)
+            awsauth = AWS4Auth(
+                region=region_name,
+                service="es",
+                refreshable_credentials=session.get_credentials(),
+            )
+            _opensearch_clients[key] = OpenSearch(
+                hosts=[{"host": endpoint, "port": 443}],
+                use_ssl=True,
+                connection_class=RequestsHttpConnection,
+                http_auth=awsauth,
+                pool_maxsize=pool_size,
+            )
+        return _opensearch_clients[key]
+
+
+def search_result_cache() -> Optional[SearchResultCache]:
+    """
+    Returns a new search result cache holding SEARCH_CACHE_SIZE results for
+    SEARCH_CACHE_TTL seconds, or None if SEARCH_CACHE_SIZE is 0.
+    """
+    cache_size = int(os.getenv("SEARCH_CACHE_SIZE") or DEFAULT_SEARCH_CACHE_SIZE)
+    if cache_size <= 0:
+        return None
+    ttl = float(os.getenv("SEARCH_CACHE_TTL") or DEFAULT_SEARCH_CACHE_TTL)
+    return SearchResultCache(max_size=cache_size, ttl=ttl)
+
+
+def query_embedding_cache() -> Optional[EmbeddingCache]:
+    """
+    Returns a new query embedding cache holding QUERY_EMBEDDING_CACHE_SIZE
+    vectors in memory, and also on disk if QUERY_EMBEDDING_CACHE_PATH (an
+    SQLite file, e.g., /tmp/query_embeddings.sqlite3) is set, or None if
+    QUERY_EMBEDDING_CACHE_SIZE is unset or 0.
+    """
+    cache_size = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE") or 0)
+    if cache_size <= 0:
+        return None
+    return EmbeddingCache(
+        max_size=cache_size, path=os.getenv("QUERY_EMBEDDING_CACHE_PATH") or None
     )
 
 
 def opensearch_vector_store(region_name=None):
-    region_name = region_name or os.getenv("AWS_REGION")  # Evaluate at runtime
-    session = boto3.Session(region_name=region_name)
-    awsauth = AWS4Auth(
-        region=region_name,
-        service="es",
-        refreshable_credentials=session.get_credentials(),
-    )
-
-    docsearch = OpenSearchNeuralSearch(
-        index=prefix("dc-v2-work"),
-        model_id=os.getenv("OPENSEARCH_MODEL_ID"),
-        endpoint=opensearch_endpoint(),
-        connection_class=RequestsHttpConnection,
-        http_auth=awsauth,
-        text_field="id",
-    )
-    return docsearch
+    """
+    Returns the vector store shared by every caller in this process for the
+    current index and model, backed by the shared opensearch_client and its
+    own search_result_cache and query_embedding_cache.
+    """
+    client = opensearch_client(region_name)
+    index = prefix("dc-v2-work")
+    model_id = os.getenv("OPENSEARCH_MODEL_ID")
+    key = (id(client), index, model_id)
+    with _opensearch_lock:
+        if key not in _opensearch_vector_stores:
+            _opensearch_vector_stores[key] = OpenSearchNeuralSearch(
+                index=index,
+                model_id=model_id,
+                endpoint=opensearch_endpoint(),
+                client=client,
+                text_field="id",
+                result_cache=search_result_cache(),
+                embedding_cache=query_embedding_cache(),
+            )
+        return _opensearch_vector_stores[key]
+
+
+def wait_for_query_embeddings():
+    """
+    Waits for the shared vector stores to finish embedding queries in the
+    background, so the work isn't left frozen mid-request with the container.
+    """
+    with _opensearch_lock:
+        stores = list(_opensearch_vector_stores.values())
+    for store in stores:
+        store.wait_for_embeddings()
+
+
+def reset_opensearch_clients():
+    """Discards the shared OpenSearch clients and vector stores (e.g., in tests)."""
+    with _opensearch_lock:
+        _opensearch_clients.clear()
+        _opensearch_vector_stores.clear()
 
 
 def websocket_client(endpoint_url: str):
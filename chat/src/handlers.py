@@ -1,5 +1,6 @@
 import json
 import logging
+import os
 from core.secrets import load_secrets
 from core.event_config import EventConfig
 from honeybadger import honeybadger
@@ -8,6 +9,8 @@ from agent.callbacks.socket import SocketCallbackHandler
 from agent.callbacks.metrics import MetricsCallbackHandler
 from core.rate_limiter import RateLimiter
 from core.setup import chat_model
+from persistence.checkpoint_gc import DEFAULT_MAX_AGE_DAYS, collect_garbage
+from persistence.s3_checkpointer import CheckpointConflictError, S3Checkpointer
 
 honeybadger.configure()
 logging.getLogger("honeybadger").addHandler(logging.StreamHandler())
@@ -29,9 +32,17 @@ def chat_sync(event, context):
     model = chat_model(model=config.model, streaming=False)
     search_agent = SearchAgent(model=model)
     result = MetricsCallbackHandler()
-    search_agent.invoke(
-        config.question, config.ref, forget=config.forget, callbacks=[result]
-    )
+    saved = True
+    try:
+        search_agent.invoke(
+            config.question, config.ref, forget=config.forget, callbacks=[result]
+        )
+    except CheckpointConflictError:
+        if not result.answers:
+            return {"statusCode": 409, "body": "Conversation is busy"}
+        # Answered, but another message was saved to the conversation first,
+        # so this answer isn't part of it
+        saved = False
 
     response_body = {
         "answer": result.answers,
@@ -47,6 +58,8 @@ def chat_sync(event, context):
 
     if config.facets is not None:
         response_body["facets"] = config.facets
+    if not saved:
+        response_body["saved"] = False
 
     return {
         "statusCode": 200,
@@ -133,6 +146,30 @@ def chat(event, context):
             callbacks=callbacks,
         )
         metrics.log_metrics()
+    except CheckpointConflictError:
+        # Another message in the same conversation was answered at the same
+        # time. The client can resend this one, unless its answer was already
+        # sent, in which case it just isn't part of the conversation.
+        metrics.log_metrics()
+        if metrics.answers:
+            config.socket.send(
+                {
+                    "type": "error",
+                    "message": "This answer was not saved to the conversation "
+                    "because another message updated it at the same time.",
+                    "retryable": False,
+                }
+            )
+        else:
+            config.socket.send(
+                {
+                    "type": "error",
+                    "message": "This conversation was updated by another message. "
+                    "Please try again.",
+                    "retryable": True,
+                }
+            )
+        return {"statusCode": 409, "body": "Conversation is busy"}
     except Exception as e:
         error_response = {
             "type": "error",
@@ -143,3 +180,21 @@ def chat(event, context):
         raise e
 
     return {"statusCode": 200}
+
+
+def checkpoint_gc(event, context):
+    """
+    Deletes checkpoint threads idle for CHECKPOINT_TTL_DAYS (or the event's
+    max_age_days), e.g., on a schedule. Pass {"dry_run": true} to only count
+    them.
+    """
+    event = event or {}
+    max_age_days = event.get(
+        "max_age_days", float(os.getenv("CHECKPOINT_TTL_DAYS") or DEFAULT_MAX_AGE_DAYS)
+    )
+    saver = S3Checkpointer(bucket_name=os.getenv("CHECKPOINT_BUCKET_NAME"))
+    report = collect_garbage(
+        saver, max_age_days=max_age_days, dry_run=bool(event.get("dry_run"))
+    )
+    print(json.dumps({"checkpoint_gc": report.to_dict()}))
+    return {"statusCode": 200, "body": json.dumps(report.to_dict())}
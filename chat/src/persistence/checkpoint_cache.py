@@ -0,0 +1,87 @@
+import copy
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Sequence, Tuple
+from langgraph.checkpoint.base import CheckpointTuple
+
+DEFAULT_CACHE_SIZE = 32
+
+CacheKey = Tuple[str, str, str]
+
+
+class CheckpointCache:
+    """
+    A size-bounded, thread-safe LRU cache of checkpoint tuples keyed by
+    (thread_id, checkpoint_ns, checkpoint_id).
+
+    Entries are copied on the way in and out so that callers mutating a
+    checkpoint (or the messages inside it) can't change what the cache holds.
+    """
+
+    def __init__(self, max_size: int = DEFAULT_CACHE_SIZE):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[CacheKey, CheckpointTuple] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: CacheKey) -> Optional[CheckpointTuple]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return copy.deepcopy(entry)
+
+    def put(
+        self,
+        key: CacheKey,
+        checkpoint_tuple: CheckpointTuple,
+        keep_pending_writes: bool = False,
+    ) -> None:
+        entry = copy.deepcopy(checkpoint_tuple)
+        with self._lock:
+            existing = self._entries.get(key)
+            if keep_pending_writes and existing is not None:
+                entry = entry._replace(pending_writes=existing.pending_writes)
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def put_writes(
+        self, key: CacheKey, task_id: str, writes: Sequence[Tuple[str, Any]]
+    ) -> None:
+        """
+        Replaces a cached checkpoint's pending writes for a task, mirroring how
+        a put_writes call replaces the task's stored writes. Does nothing if the
+        checkpoint isn't cached.
+        """
+        new_writes = [
+            (task_id, channel, copy.deepcopy(value)) for channel, value in writes
+        ]
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            pending_writes = [w for w in entry.pending_writes if w[0] != task_id]
+            pending_writes.extend(new_writes)
+            pending_writes.sort(key=lambda w: w[0])
+            self._entries[key] = entry._replace(pending_writes=pending_writes)
+
+    def invalidate_thread(self, thread_id: str) -> None:
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == thread_id]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "size": len(self)}
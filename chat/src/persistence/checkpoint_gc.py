@@ -0,0 +1,168 @@
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional
+from persistence.s3_checkpointer import S3Checkpointer, _make_s3_thread_prefix
+
+DEFAULT_MAX_AGE_DAYS = 30
+DEFAULT_GC_CONCURRENCY = 8
+# Thread IDs checked per round, so that a bucket's threads aren't all queued
+# at once
+THREAD_CHUNK_SIZE = 1000
+DAY_MS = 24 * 60 * 60 * 1000
+
+
+class GarbageCollectionReport(NamedTuple):
+    threads_scanned: int
+    threads_deleted: int
+    objects_deleted: int
+    seconds: float
+    requests: Dict[str, Dict[str, Any]]
+
+    @property
+    def threads_per_second(self) -> float:
+        return self.threads_scanned / self.seconds if self.seconds else 0.0
+
+    @property
+    def objects_per_second(self) -> float:
+        return self.objects_deleted / self.seconds if self.seconds else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            **self._asdict(),
+            "seconds": round(self.seconds, 3),
+            "threads_per_second": round(self.threads_per_second, 1),
+            "objects_per_second": round(self.objects_per_second, 1),
+        }
+
+
+def collect_garbage(
+    saver: S3Checkpointer,
+    max_age_days: float = DEFAULT_MAX_AGE_DAYS,
+    concurrency: int = DEFAULT_GC_CONCURRENCY,
+    dry_run: bool = False,
+    now: Optional[int] = None,
+) -> GarbageCollectionReport:
+    """
+    Deletes the checkpoint threads that no checkpoint has been saved to for
+    max_age_days, going by the timestamps embedded in each thread's latest
+    pointers and checkpoints.
+
+    Threads are checked concurrently, up to concurrency at once, and the keys
+    of stale threads are pooled into DeleteObjects batches of up to 1000 keys
+    across threads, along with the message content they offloaded. Threads
+    without any checkpoint are left alone.
+
+    Args:
+        saver: The checkpointer whose bucket to collect
+        max_age_days: How long a thread must have been idle to be deleted
+        concurrency: The maximum number of S3 requests to run at once
+        dry_run: Only count the threads and objects that would be deleted
+        now: The current time in milliseconds since the epoch (for testing)
+    """
+    cutoff = (now or int(time.time() * 1000)) - int(max_age_days * DAY_MS)
+    saver.metrics.reset()
+    start = time.perf_counter()
+    scanned = deleted = objects = 0
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        for thread_ids in _chunks(saver.list_thread_ids(), THREAD_CHUNK_SIZE):
+            stale = [
+                keys
+                for keys in executor.map(
+                    lambda thread_id: _stale_thread_keys(saver, thread_id, cutoff),
+                    thread_ids,
+                )
+                if keys is not None
+            ]
+            scanned += len(thread_ids)
+            deleted += len(stale)
+            keys = [key for thread_keys in stale for key in thread_keys]
+            objects += len(keys)
+            if not dry_run:
+                batches = [keys[i : i + 1000] for i in range(0, len(keys), 1000)]
+                list(executor.map(lambda batch: _delete_batch(saver, batch), batches))
+
+    return GarbageCollectionReport(
+        threads_scanned=scanned,
+        threads_deleted=deleted,
+        objects_deleted=objects,
+        seconds=time.perf_counter() - start,
+        requests=saver.metrics.snapshot(),
+    )
+
+
+def _chunks(items: Iterator[str], size: int) -> Iterator[List[str]]:
+    while chunk := list(islice(items, size)):
+        yield chunk
+
+
+def _stale_thread_keys(
+    saver: S3Checkpointer, thread_id: str, cutoff: int
+) -> Optional[List[str]]:
+    """
+    Returns the keys of a thread last saved before the cutoff, or None if it
+    is still live.
+    """
+    timestamp = saver.get_thread_timestamp(thread_id)
+    if timestamp is None or timestamp >= cutoff:
+        return None
+    paginator = saver.s3.get_paginator("list_objects_v2")
+    pages = paginator.paginate(
+        Bucket=saver.bucket_name, Prefix=f"{_make_s3_thread_prefix(thread_id)}/"
+    )
+    return [c["Key"] for page in pages for c in page.get("Contents", [])]
+
+
+def _delete_batch(saver: S3Checkpointer, keys: List[str]) -> None:
+    saver.s3.delete_objects(
+        Bucket=saver.bucket_name,
+        Delete={"Objects": [{"Key": key} for key in keys]},
+    )
+
+
+def _parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Deletes checkpoint threads that have been idle for too long"
+    )
+    parser.add_argument("--bucket", default=os.getenv("CHECKPOINT_BUCKET_NAME"))
+    parser.add_argument("--region", default=os.getenv("AWS_REGION"))
+    parser.add_argument(
+        "--endpoint-url", help="An alternate S3 endpoint (e.g., a local S3 stand-in)"
+    )
+    parser.add_argument(
+        "--max-age-days",
+        type=float,
+        default=float(os.getenv("CHECKPOINT_TTL_DAYS") or DEFAULT_MAX_AGE_DAYS),
+    )
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_GC_CONCURRENCY)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args(argv)
+    if not args.bucket:
+        parser.error("--bucket or CHECKPOINT_BUCKET_NAME is required")
+    return args
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = _parse_args(argv)
+    saver = S3Checkpointer(
+        bucket_name=args.bucket,
+        region_name=args.region,
+        endpoint_url=args.endpoint_url,
+        # Sizes the client's connection pool for the collector's requests
+        delete_concurrency=args.concurrency,
+    )
+    report = collect_garbage(
+        saver,
+        max_age_days=args.max_age_days,
+        concurrency=args.concurrency,
+        dry_run=args.dry_run,
+    )
+    print(json.dumps(report.to_dict()))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,4 @@
-from typing import Any, Optional, Tuple
+from typing import Any, List, Optional, Tuple
 
 import base64
 import bz2
@@ -7,13 +7,119 @@ import json
 import langchain_core.messages as langchain_messages
 from langchain_core.messages import BaseMessage
 from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+import zstandard
+
+SERIALIZATIONS = ("json", "msgpack")
+COMPRESSIONS = ("bz2", "gzip", "zstd")
+DEFAULT_ZSTD_LEVEL = 3
+
+
+def train_zstd_dictionary(
+    samples: List[Any], dict_size: int = 16 * 1024, serialization: str = "json"
+) -> bytes:
+    """
+    Trains a zstd compression dictionary from sample checkpoint data (e.g.,
+    checkpoints or messages from real conversations). Checkpoints compressed
+    with a dictionary can only be read by serializers given the same one.
+    """
+    serde = CompressibleJsonSerializer(serialization=serialization)
+    encoded = []
+    for sample in samples:
+        _, data = serde.dumps_typed(sample)
+        encoded.append(data.encode("utf-8") if isinstance(data, str) else data)
+    return zstandard.train_dictionary(dict_size, encoded).as_bytes()
 
 
 class CompressibleJsonSerializer(JsonPlusSerializer):
-    def __init__(self, compression: Optional[str] = None):
+    """
+    Serializes checkpoint data as JSON strings or, with serialization="msgpack",
+    as raw msgpack bytes, with optional bz2, gzip, or zstd compression.
+
+    JSON types ("json", "bz2_json", "gzip_json", "zstd_json") are strings, with
+    compressed data base64-encoded. Msgpack types ("msgpack", "bz2_msgpack",
+    "gzip_msgpack", "zstd_msgpack") are bytes and must be stored in a binary
+    container. dumps_binary returns the same types with every payload as bytes.
+
+    Args:
+        compression: None, "bz2", "gzip", or "zstd"
+        serialization: "json" or "msgpack"
+        compression_level: The compression level, or None for the compressor's
+            default (9 for bz2 and gzip, 3 for zstd)
+        zstd_dictionary: An optional dictionary from train_zstd_dictionary,
+            used to compress and decompress zstd data
+    """
+
+    def __init__(
+        self,
+        compression: Optional[str] = None,
+        serialization: str = "json",
+        compression_level: Optional[int] = None,
+        zstd_dictionary: Optional[bytes] = None,
+    ):
+        super().__init__()
+        if serialization not in SERIALIZATIONS:
+            raise ValueError(f"Unsupported serialization type: {serialization}")
         self.compression = compression
+        self.serialization = serialization
+        self.compression_level = compression_level
+        self.zstd_dictionary = None
+        if zstd_dictionary:
+            self.zstd_dictionary = zstandard.ZstdCompressionDict(zstd_dictionary)
+            if compression == "zstd":
+                # Avoid re-digesting the dictionary on every compression
+                self.zstd_dictionary.precompute_compress(
+                    level=DEFAULT_ZSTD_LEVEL
+                    if compression_level is None
+                    else compression_level
+                )
+
+    def _compress(self, data: bytes) -> bytes:
+        level = self.compression_level
+        if self.compression == "bz2":
+            return bz2.compress(data, 9 if level is None else level)
+        elif self.compression == "gzip":
+            return gzip.compress(data, 9 if level is None else level)
+        elif self.compression == "zstd":
+            # Compressors aren't thread-safe, so each call gets its own
+            compressor = zstandard.ZstdCompressor(
+                level=DEFAULT_ZSTD_LEVEL if level is None else level,
+                dict_data=self.zstd_dictionary,
+            )
+            return compressor.compress(data)
+        else:
+            raise ValueError(f"Unsupported compression type: {self.compression}")
+
+    def _decompress(self, compression: str, data: bytes) -> bytes:
+        if compression == "bz2":
+            return bz2.decompress(data)
+        elif compression == "gzip":
+            return gzip.decompress(data)
+        else:
+            decompressor = zstandard.ZstdDecompressor(dict_data=self.zstd_dictionary)
+            return decompressor.decompress(data)
 
     def dumps_typed(self, obj: Any) -> Tuple[str, Any]:
+        return self._dumps_typed(obj, binary=False)
+
+    def dumps_binary(self, obj: Any) -> Tuple[str, bytes]:
+        """
+        Like dumps_typed, but always returns bytes for storage in a binary
+        container: JSON is UTF-8 encoded, and compressed JSON is not
+        base64-encoded. loads_typed reads both forms.
+        """
+        return self._dumps_typed(obj, binary=True)
+
+    def _dumps_typed(self, obj: Any, binary: bool) -> Tuple[str, Any]:
+        if self.serialization == "msgpack":
+            type_, data = super().dumps_typed(obj)
+            if type_ == "msgpack":
+                if self.compression is None:
+                    return "msgpack", data
+                return f"{self.compression}_msgpack", self._compress(data)
+            elif type_ != "json":
+                return type_, data
+            # Fall back to JSON for values msgpack can't encode
+
         def default(o):
             if isinstance(o, BaseMessage):
                 return {
@@ -27,29 +133,33 @@ class CompressibleJsonSerializer(JsonPlusSerializer):
         json_str = json.dumps(obj, default=default)
 
         if self.compression is None:
-            return "json", json_str
-        elif self.compression == "bz2":
-            compressed_str = base64.b64encode(
-                bz2.compress(json_str.encode("utf-8"))
-            ).decode("utf-8")
-            return "bz2_json", compressed_str
-        elif self.compression == "gzip":
-            compressed_str = base64.b64encode(
-                gzip.compress(json_str.encode("utf-8"))
-            ).decode("utf-8")
-            return "gzip_json", compressed_str
-        else:
-            raise ValueError(f"Unsupported compression type: {self.compression}")
+            return "json", json_str.encode("utf-8") if binary else json_str
+
+        compressed = self._compress(json_str.encode("utf-8"))
+        if binary:
+            return f"{self.compression}_json", compressed
+        return f"{self.compression}_json", base64.b64encode(compressed).decode("utf-8")
 
     def loads_typed(self, data: Tuple[str, Any]) -> Any:
         type_, payload = data
 
-        if type_ == "json":
+        if type_ in ("null", "bytes", "bytearray", "msgpack"):
+            return super().loads_typed(data)
+
+        compression, _, format_ = type_.rpartition("_")
+        if compression not in COMPRESSIONS and type_ != "json":
+            raise ValueError(f"Unknown data type: {type_}")
+
+        if format_ == "msgpack":
+            return super().loads_typed(
+                ("msgpack", self._decompress(compression, payload))
+            )
+        elif type_ == "json":
             json_str = payload
-        elif type_ == "bz2_json":
-            json_str = bz2.decompress(base64.b64decode(payload)).decode("utf-8")
-        elif type_ == "gzip_json":
-            json_str = gzip.decompress(base64.b64decode(payload)).decode("utf-8")
+        elif format_ == "json":
+            if isinstance(payload, str):
+                payload = base64.b64decode(payload)
+            json_str = self._decompress(compression, payload)
         else:
             raise ValueError(f"Unknown data type: {type_}")
 
@@ -0,0 +1,168 @@
+import json
+import sqlite3
+import threading
+from typing import Dict, List, NamedTuple, Optional
+
+DEFAULT_LOCAL_STORE_PATH = "/tmp/checkpoints.sqlite3"
+DEFAULT_LOCAL_STORE_MAX_BYTES = 64 * 1024 * 1024
+
+
+class LocalObject(NamedTuple):
+    key: str
+    body: bytes
+    content_type: Optional[str]
+    metadata: Optional[Dict[str, str]]
+    version: int
+
+
+class LocalCheckpointStore:
+    """
+    A local-disk copy of checkpoint objects, stored in an SQLite file under the
+    same keys as in S3 (checkpoints/{thread_id}/...).
+
+    Every put gives the object a new version. Objects are marked flushed once
+    that version has been uploaded, and only threads whose objects are all
+    flushed are evicted, least recently written first, to keep the store under
+    max_bytes. A thread is always evicted as a whole, so that the objects of a
+    thread in the store are either all present or all gone.
+
+    Args:
+        path: The SQLite file, which persists across warm invocations
+        max_bytes: The size of object bodies to keep, or None for no limit
+    """
+
+    def __init__(
+        self,
+        path: str = DEFAULT_LOCAL_STORE_PATH,
+        max_bytes: Optional[int] = DEFAULT_LOCAL_STORE_MAX_BYTES,
+    ):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS objects (
+                key TEXT PRIMARY KEY,
+                thread_id TEXT NOT NULL,
+                body BLOB NOT NULL,
+                content_type TEXT,
+                metadata TEXT,
+                flushed INTEGER NOT NULL DEFAULT 0
+            )
+            """
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS objects_thread ON objects (thread_id)"
+        )
+        self._db.commit()
+
+    def put(
+        self,
+        key: str,
+        body: bytes,
+        content_type: Optional[str] = None,
+        metadata: Optional[Dict[str, str]] = None,
+    ) -> int:
+        """
+        Stores an object as not yet flushed, returning its new version.
+        """
+        with self._lock, self._db:
+            # REPLACE deletes the old row, so the object gets a new rowid
+            cursor = self._db.execute(
+                "INSERT OR REPLACE INTO objects "
+                "(key, thread_id, body, content_type, metadata, flushed) "
+                "VALUES (?, ?, ?, ?, ?, 0)",
+                (
+                    key,
+                    key.split("/")[1],
+                    body,
+                    content_type,
+                    json.dumps(metadata) if metadata else None,
+                ),
+            )
+            return cursor.lastrowid
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT 1 FROM objects WHERE key = ?", (key,)
+            ).fetchone()
+        return row is not None
+
+    def get(self, key: str) -> Optional[LocalObject]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT key, body, content_type, metadata, rowid FROM objects "
+                "WHERE key = ?",
+                (key,),
+            ).fetchone()
+        if row is None:
+            return None
+        return LocalObject(
+            row[0], row[1], row[2], json.loads(row[3]) if row[3] else None, row[4]
+        )
+
+    def keys(self, prefix: str) -> List[str]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT key FROM objects WHERE substr(key, 1, ?) = ? ORDER BY key",
+                (len(prefix), prefix),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def mark_flushed(self, key: str, version: int) -> None:
+        """
+        Marks an object as flushed if it hasn't been replaced since the given
+        version was uploaded, then evicts threads to stay under max_bytes.
+        """
+        with self._lock, self._db:
+            self._db.execute(
+                "UPDATE objects SET flushed = 1 WHERE key = ? AND rowid = ?",
+                (key, version),
+            )
+            self._evict()
+
+    def unflushed(self, prefix: str = "") -> List[str]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT key FROM objects "
+                "WHERE flushed = 0 AND substr(key, 1, ?) = ? ORDER BY rowid",
+                (len(prefix), prefix),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def delete(self, keys: List[str]) -> None:
+        with self._lock, self._db:
+            self._db.executemany(
+                "DELETE FROM objects WHERE key = ?", [(key,) for key in keys]
+            )
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM objects WHERE thread_id = ?", (thread_id,))
+
+    def size(self) -> int:
+        with self._lock:
+            return self._size()
+
+    def _size(self) -> int:
+        return self._db.execute(
+            "SELECT COALESCE(SUM(length(body)), 0) FROM objects"
+        ).fetchone()[0]
+
+    def _evict(self) -> None:
+        if self.max_bytes is None:
+            return
+        size = self._size()
+        while size > self.max_bytes:
+            row = self._db.execute(
+                "SELECT thread_id, SUM(length(body)) FROM objects "
+                "GROUP BY thread_id HAVING MIN(flushed) = 1 "
+                "ORDER BY MAX(rowid) LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return
+            self._db.execute("DELETE FROM objects WHERE thread_id = ?", (row[0],))
+            size -= row[1]
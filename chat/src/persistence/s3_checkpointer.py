@@ -1,9 +1,35 @@
+import asyncio
 import boto3
+import hashlib
 import json
+import ormsgpack
 import os
+import struct
+import threading
 import time
+import weakref
+from botocore.config import Config
+from collections import OrderedDict
+from botocore.exceptions import ClientError
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from functools import partial
+from langchain_core.messages import BaseMessage, ToolMessage
+from persistence.checkpoint_cache import CheckpointCache
 from persistence.compressible_json_serializer import CompressibleJsonSerializer
-from typing import Any, Dict, Iterator, Optional, Sequence, Tuple, List
+from persistence.s3_metrics import S3Metrics
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Dict,
+    Iterator,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    List,
+)
 from langchain_core.runnables import RunnableConfig
 
 from langgraph.checkpoint.base import (
@@ -16,6 +42,24 @@ from langgraph.checkpoint.base import (
     get_checkpoint_id,
 )
 
+DEFAULT_WRITE_CONCURRENCY = 8
+DEFAULT_DELETE_CONCURRENCY = 8
+# Threads with at most this many objects (one DeleteObjects batch) are deleted
+# with one listing and one batch, instead of being split into key ranges
+MAX_UNSPLIT_THREAD_OBJECTS = 1000
+# The fewest checkpoints a namespace's key ranges are split into, about one
+# DeleteObjects batch at a few objects per checkpoint
+MIN_DELETE_RANGE_CHECKPOINTS = 250
+MAX_METADATA_HEADER_SIZE = 1536
+BINARY_ENVELOPE_MAGIC = b"LGCP\x01"
+PAYLOAD_REF = "__payload__"
+OFFLOADED_CONTENT_KEY = "offloaded_content"
+OFFLOADED_CONTENT_PLACEHOLDER = "[Tool output stored separately]"
+MAX_KNOWN_CONTENT_KEYS = 4096
+# The most characters of offloaded content kept in memory after being loaded
+# or stored, so that each model call doesn't fetch it again
+MAX_CACHED_CONTENT_CHARS = 8 * 1024 * 1024
+
 
 def _namespace(val):
     return "__default__" if val == "" else val
@@ -29,11 +73,29 @@ def _make_s3_thread_prefix(thread_id: str) -> str:
     return f"checkpoints/{thread_id}"
 
 
+def _make_s3_content_key(thread_id: str, content: str) -> str:
+    digest = hashlib.sha256(content.encode("utf-8")).hexdigest()
+    return f"{_make_s3_thread_prefix(thread_id)}/content-{digest}"
+
+
 def _make_s3_namespace_prefix(thread_id: str, checkpoint_ns: str) -> str:
     prefix = _make_s3_thread_prefix(thread_id)
     return f"{prefix}/{_namespace(checkpoint_ns)}"
 
 
+def _make_s3_latest_key(thread_id: str, checkpoint_ns: str) -> str:
+    prefix = _make_s3_namespace_prefix(thread_id, checkpoint_ns)
+    return f"{prefix}/latest.json"
+
+
+def _is_rewritable_key(key: str) -> bool:
+    """
+    Returns whether a key can be saved again under the same name, as latest
+    pointers and offloaded content are, rather than only ever created once.
+    """
+    return key.endswith("/latest.json") or "/content-" in key
+
+
 def _make_s3_checkpoint_prefix(
     thread_id: str, checkpoint_ns: str, checkpoint_id: str
 ) -> str:
@@ -55,6 +117,20 @@ def _make_s3_write_key(
     return f"{prefix}/writes/{task_id}/{idx}.json"
 
 
+def _make_s3_write_batch_key(
+    thread_id: str, checkpoint_ns: str, checkpoint_id: str, task_id: str
+) -> str:
+    prefix = _make_s3_checkpoint_prefix(thread_id, checkpoint_ns, checkpoint_id)
+    return f"{prefix}/writes/{task_id}.json"
+
+
+def _write_index(filename: str) -> int:
+    try:
+        return int(filename.split(".")[0])
+    except ValueError:
+        return 0
+
+
 def _parse_s3_checkpoint_key(key: str) -> Dict[str, str]:
     parts = key.split("/")
     if len(parts) < 5 or parts[4] != "checkpoint.json":
@@ -69,8 +145,182 @@ def _parse_s3_checkpoint_key(key: str) -> Dict[str, str]:
     }
 
 
+def _make_config(
+    thread_id: str, checkpoint_ns: str, checkpoint_id: str
+) -> RunnableConfig:
+    return {
+        "configurable": {
+            "thread_id": thread_id,
+            "checkpoint_ns": checkpoint_ns,
+            "checkpoint_id": checkpoint_id,
+        }
+    }
+
+
+def _make_checkpoint_headers(
+    metadata: CheckpointMetadata, parent_checkpoint_id: Optional[str], timestamp: int
+) -> Dict[str, str]:
+    """
+    Builds the S3 object metadata stored alongside a checkpoint so that it can be
+    listed with a HEAD request. The checkpoint metadata is left out if it can't be
+    stored as plain JSON within S3's 2KB header limit.
+    """
+    headers = {"timestamp": str(timestamp)}
+    if parent_checkpoint_id:
+        headers["parent-checkpoint-id"] = parent_checkpoint_id
+    try:
+        metadata_json = json.dumps(metadata)
+    except TypeError:
+        return headers
+    if len(metadata_json) <= MAX_METADATA_HEADER_SIZE:
+        headers["checkpoint-metadata"] = metadata_json
+    return headers
+
+
+def _metadata_matches(metadata: CheckpointMetadata, filter: Dict[str, Any]) -> bool:
+    return all(metadata.get(key) == value for key, value in filter.items())
+
+
+def _encode_binary_envelope(data: Dict[str, Any]) -> bytes:
+    """
+    Encodes an envelope as a fixed binary header followed by a small JSON header
+    and the envelope's raw payloads. Each bytes value in the envelope is stored
+    after the header and replaced in it by its offset and length.
+
+    Layout: BINARY_ENVELOPE_MAGIC, the header length (4 bytes, big-endian), the
+    JSON header, then the payloads.
+    """
+    payloads = []
+    offset = 0
+
+    def default(o):
+        nonlocal offset
+        if isinstance(o, (bytes, bytearray)):
+            payloads.append(o)
+            ref = {PAYLOAD_REF: [offset, len(o)]}
+            offset += len(o)
+            return ref
+        raise TypeError(f"Object of type {o.__class__.__name__} is not serializable")
+
+    header = json.dumps(data, default=default).encode("utf-8")
+    return b"".join(
+        [BINARY_ENVELOPE_MAGIC, struct.pack(">I", len(header)), header, *payloads]
+    )
+
+
+def _decode_binary_envelope(body: bytes) -> Dict[str, Any]:
+    start = len(BINARY_ENVELOPE_MAGIC) + 4
+    (header_length,) = struct.unpack_from(">I", body, len(BINARY_ENVELOPE_MAGIC))
+    payload_start = start + header_length
+
+    def object_hook(dct):
+        if PAYLOAD_REF in dct:
+            offset, length = dct[PAYLOAD_REF]
+            return body[payload_start + offset : payload_start + offset + length]
+        return dct
+
+    return json.loads(body[start:payload_start], object_hook=object_hook)
+
+
+def _encode_envelope(data: Dict[str, Any], envelope: str) -> Tuple[bytes, str]:
+    """
+    Encodes a checkpoint or writes object for storage, returning the body and its
+    content type. The "msgpack" envelope stores data in a msgpack map so binary
+    serialization types stay raw bytes, and the "binary" envelope stores them
+    after a fixed header.
+    """
+    if envelope == "binary":
+        return _encode_binary_envelope(data), "application/octet-stream"
+    if envelope == "msgpack":
+        return ormsgpack.packb(data), "application/msgpack"
+    return json.dumps(data).encode("utf-8"), "application/json"
+
+
+def _decode_envelope(body: bytes) -> Dict[str, Any]:
+    """
+    Decodes a stored checkpoint or writes object in any envelope format.
+    """
+    if body[: len(BINARY_ENVELOPE_MAGIC)] == BINARY_ENVELOPE_MAGIC:
+        return _decode_binary_envelope(body)
+    if body[:1] == b"{":
+        return json.loads(body.decode("utf-8"))
+    return ormsgpack.unpackb(body)
+
+
+class CheckpointConflictError(Exception):
+    """
+    Raised when saving a checkpoint loses a race with another writer: the
+    namespace's latest pointer changed since this checkpointer last read or
+    wrote it. The save can be retried after reading the thread again.
+    """
+
+    def __init__(self, thread_id: str, checkpoint_ns: str):
+        super().__init__(
+            f"Checkpoint thread {thread_id!r} (namespace {checkpoint_ns!r}) "
+            "was updated concurrently"
+        )
+        self.thread_id = thread_id
+        self.checkpoint_ns = checkpoint_ns
+
+
+class CheckpointInfo(NamedTuple):
+    """A checkpoint's identifying config, metadata, and save time, without its state."""
+
+    config: RunnableConfig
+    metadata: CheckpointMetadata
+    parent_config: Optional[RunnableConfig]
+    timestamp: Optional[int]
+
+
 class S3Checkpointer(BaseCheckpointSaver):
-    """S3-based checkpoint saver implementation."""
+    """S3-based checkpoint saver implementation.
+
+    Args:
+        bucket_name: The S3 bucket to store checkpoints in
+        region_name: The AWS region of the bucket
+        endpoint_url: An alternate S3 endpoint (e.g., a local S3 stand-in)
+        compression: The compression to apply to serialized data
+            (None, "bz2", "gzip", or "zstd")
+        compression_level: The compression level, or None for the default
+        zstd_dictionary: An optional zstd dictionary from train_zstd_dictionary.
+            Every checkpointer reading the checkpoints needs the same one.
+        binary_envelope: Store checkpoints and writes as a fixed binary header
+            followed by their raw serialized payloads, so that they are decoded
+            in a single pass without base64 or nested JSON. Checkpoints in any
+            format can be read regardless of this setting.
+        serialization: How to serialize checkpoint data: "json", or "msgpack"
+            to store raw binary payloads without base64 or nested JSON
+        write_concurrency: The maximum number of pending writes to fetch
+            from S3 at once. Set to 1 to fetch them sequentially.
+        cache: An optional in-memory cache of checkpoint tuples, kept up to date
+            by put and put_writes so that reading back a checkpoint this process
+            wrote skips S3
+        snapshot_interval: If set, only every Nth checkpoint in a chain is saved
+            in full. The checkpoints in between store only the channel values
+            that changed since their parent, and are rebuilt from the nearest
+            full snapshot when read.
+        delete_concurrency: The maximum number of S3 requests to run at once
+            when deleting a thread. Set to 1 to delete sequentially.
+        offload_threshold: If set, the content of ToolMessages at least this
+            many bytes long is stored once per thread, as a separate object in
+            the thread keyed by its SHA-256 hash, and checkpoints and writes
+            hold a reference to it instead. It is deleted with the thread. Read checkpoints return these
+            messages with placeholder content until load_offloaded is called.
+        conditional_writes: Write each namespace's latest pointer with an S3
+            conditional write against the version this checkpointer last read
+            or wrote, so that a put racing another writer (e.g., another
+            Lambda instance answering the same thread) raises
+            CheckpointConflictError instead of overwriting its checkpoint.
+            Later saves to the namespace raise it too, until the thread is
+            read again.
+
+    The checkpointer's S3 requests are counted in its metrics attribute, an
+    S3Metrics, by operation type.
+
+    The async methods run the sync ones in the event loop's default executor.
+    Calls that write or read a checkpoint thread are run one at a time, in the
+    order they were made, so concurrent writes to a thread can't be reordered.
+    """
 
     def __init__(
         self,
@@ -78,11 +328,78 @@ class S3Checkpointer(BaseCheckpointSaver):
         region_name: str = os.getenv("AWS_REGION"),
         endpoint_url: Optional[str] = None,
         compression: Optional[str] = None,
+        serialization: str = "json",
+        write_concurrency: int = DEFAULT_WRITE_CONCURRENCY,
+        cache: Optional[CheckpointCache] = None,
+        snapshot_interval: Optional[int] = None,
+        compression_level: Optional[int] = None,
+        zstd_dictionary: Optional[bytes] = None,
+        binary_envelope: bool = False,
+        delete_concurrency: int = DEFAULT_DELETE_CONCURRENCY,
+        offload_threshold: Optional[int] = None,
+        conditional_writes: bool = True,
     ) -> None:
         super().__init__()
-        self.serde = CompressibleJsonSerializer(compression=compression)
-        self.s3 = boto3.client("s3", region_name=region_name, endpoint_url=endpoint_url)
+        self.serde = CompressibleJsonSerializer(
+            compression=compression,
+            serialization=serialization,
+            compression_level=compression_level,
+            zstd_dictionary=zstd_dictionary,
+        )
+        self.s3 = boto3.client(
+            "s3",
+            region_name=region_name,
+            endpoint_url=endpoint_url,
+            config=Config(
+                max_pool_connections=max(10, write_concurrency, delete_concurrency)
+            ),
+        )
+        self.metrics = S3Metrics()
+        self.metrics.register(self.s3)
         self.bucket_name = bucket_name
+        self.write_concurrency = max(1, write_concurrency)
+        self.delete_concurrency = max(1, delete_concurrency)
+        self.offload_threshold = offload_threshold
+        # Content objects known to exist, so they aren't stored again
+        self._known_content: Set[str] = set()
+        # Content loaded or stored by this checkpointer, least recently used
+        # first. Content keys are hashes of the content, so it never goes stale.
+        self._cached_content: OrderedDict[str, str] = OrderedDict()
+        self._cached_content_chars = 0
+        self._cached_content_lock = threading.Lock()
+        # Held while content is offloaded and its references recorded, and
+        # while unreferenced content is deleted, so neither sees the other
+        # half done
+        self._content_lock = threading.Lock()
+        self.cache = cache
+        self.snapshot_interval = snapshot_interval
+        self.conditional_writes = conditional_writes
+        # The ETag of each latest pointer as last read or written, or None if
+        # it didn't exist
+        self._pointer_etags: Dict[str, Optional[str]] = {}
+        # Namespaces whose latest pointer lost a race with another writer.
+        # Saving to them raises CheckpointConflictError until they are read
+        # again.
+        self._conflicted: Set[Tuple[str, str]] = set()
+        if binary_envelope:
+            self.envelope = "binary"
+        else:
+            self.envelope = serialization
+        # Serializes async calls for each thread_id
+        self._thread_locks: weakref.WeakValueDictionary[
+            str, asyncio.Lock
+        ] = weakref.WeakValueDictionary()
+        # The most recent checkpoint seen in each (thread_id, checkpoint_ns),
+        # and its distance from the last full snapshot
+        self._chain_heads: Dict[Tuple[str, str], Tuple[str, int]] = {}
+        # Runs deferred work, such as background deletion, in the order it
+        # was submitted
+        self._background = ThreadPoolExecutor(max_workers=1)
+        self._background_tasks: List[Future] = []
+        # The threads being deleted in the background, with the keys written
+        # to each since its deletion started
+        self._deleting: Dict[str, Set[str]] = {}
+        self._deleting_lock = threading.Lock()
 
     def put(
         self,
@@ -96,9 +413,39 @@ class S3Checkpointer(BaseCheckpointSaver):
         checkpoint_id = checkpoint["id"]
         parent_checkpoint_id = config["configurable"].get("checkpoint_id")
         key = _make_s3_checkpoint_key(thread_id, checkpoint_ns, checkpoint_id)
+        self._check_conflict(thread_id, checkpoint_ns)
+
+        delta_depth = self._next_delta_depth(
+            thread_id, checkpoint_ns, parent_checkpoint_id
+        )
+        if delta_depth > 0:
+            # Only store the channels whose versions changed since the parent
+            stored_checkpoint = {
+                **checkpoint,
+                "channel_values": {
+                    k: v
+                    for k, v in checkpoint["channel_values"].items()
+                    if k in new_versions
+                },
+            }
+        else:
+            stored_checkpoint = checkpoint
+        content_keys: Set[str] = set()
+        if self.offload_threshold is not None:
+            with self._content_lock:
+                stored_checkpoint = {
+                    **stored_checkpoint,
+                    "channel_values": {
+                        k: self._offload(v, thread_id, content_keys)
+                        for k, v in stored_checkpoint["channel_values"].items()
+                    },
+                }
+                self._record_content_references(
+                    thread_id, checkpoint_ns, checkpoint_id, key, content_keys
+                )
 
-        ck_type, ck_data = self.serde.dumps_typed(checkpoint)
-        md_type, md_data = self.serde.dumps_typed(metadata)
+        ck_type, ck_data = self._dumps_typed(stored_checkpoint)
+        md_type, md_data = self._dumps_typed(metadata)
 
         data = {
             "checkpoint_type": ck_type,
@@ -109,17 +456,40 @@ class S3Checkpointer(BaseCheckpointSaver):
             else None,
             "timestamp": int(time.time() * 1000),
         }
+        if delta_depth > 0:
+            data["delta_depth"] = delta_depth
+            data["channel_keys"] = list(checkpoint["channel_values"].keys())
+        if content_keys:
+            data["content_keys"] = sorted(content_keys)
 
-        body = json.dumps(data).encode("utf-8")
-        self.s3.put_object(Bucket=self.bucket_name, Key=key, Body=body)
+        body, content_type = _encode_envelope(data, self.envelope)
+        self._put_object(
+            key,
+            body,
+            content_type,
+            _make_checkpoint_headers(metadata, parent_checkpoint_id, data["timestamp"]),
+        )
+        self._put_latest_pointer(
+            thread_id, checkpoint_ns, checkpoint_id, data["timestamp"], delta_depth
+        )
+        self._chain_heads[(thread_id, checkpoint_ns)] = (checkpoint_id, delta_depth)
 
-        return {
-            "configurable": {
-                "thread_id": thread_id,
-                "checkpoint_ns": checkpoint_ns,
-                "checkpoint_id": checkpoint_id,
-            }
-        }
+        if self.cache is not None:
+            self.cache.put(
+                (thread_id, checkpoint_ns, checkpoint_id),
+                CheckpointTuple(
+                    _make_config(thread_id, checkpoint_ns, checkpoint_id),
+                    checkpoint,
+                    metadata,
+                    _make_config(thread_id, checkpoint_ns, parent_checkpoint_id)
+                    if parent_checkpoint_id
+                    else None,
+                    [],
+                ),
+                keep_pending_writes=True,
+            )
+
+        return _make_config(thread_id, checkpoint_ns, checkpoint_id)
 
     def put_writes(
         self,
@@ -131,21 +501,38 @@ class S3Checkpointer(BaseCheckpointSaver):
         checkpoint_ns = config["configurable"]["checkpoint_ns"]
         checkpoint_id = config["configurable"]["checkpoint_id"]
 
-        for idx, (channel, value) in enumerate(writes):
-            v_type, v_data = self.serde.dumps_typed(value)
-            write_data = {
-                "channel": channel,
-                "type": v_type,
-                "value": v_data,
-                "timestamp": int(time.time() * 1000),
-            }
-            write_key = _make_s3_write_key(
-                thread_id, checkpoint_ns, checkpoint_id, task_id, idx
-            )
-            self.s3.put_object(
-                Bucket=self.bucket_name,
-                Key=write_key,
-                Body=json.dumps(write_data).encode("utf-8"),
+        if not writes:
+            return
+        self._check_conflict(thread_id, checkpoint_ns)
+
+        batch_key = _make_s3_write_batch_key(
+            thread_id, checkpoint_ns, checkpoint_id, task_id
+        )
+        content_keys: Set[str] = set()
+        if self.offload_threshold is not None:
+            with self._content_lock:
+                writes = [
+                    (channel, self._offload(value, thread_id, content_keys))
+                    for channel, value in writes
+                ]
+                self._record_content_references(
+                    thread_id, checkpoint_ns, checkpoint_id, batch_key, content_keys
+                )
+
+        batch = []
+        for channel, value in writes:
+            v_type, v_data = self._dumps_typed(value)
+            batch.append({"channel": channel, "type": v_type, "value": v_data})
+
+        batch_data = {"writes": batch, "timestamp": int(time.time() * 1000)}
+        if content_keys:
+            batch_data["content_keys"] = sorted(content_keys)
+        body, content_type = _encode_envelope(batch_data, self.envelope)
+        self._put_object(batch_key, body, content_type)
+
+        if self.cache is not None:
+            self.cache.put_writes(
+                (thread_id, checkpoint_ns, checkpoint_id), task_id, writes
             )
 
     def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
@@ -153,58 +540,41 @@ class S3Checkpointer(BaseCheckpointSaver):
         checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
         checkpoint_id = get_checkpoint_id(config)
 
-        if checkpoint_id is None:
+        latest = checkpoint_id is None
+        if latest:
             checkpoint_id = self._get_latest_checkpoint_id(thread_id, checkpoint_ns)
             if checkpoint_id is None:
                 return None
 
-        key = _make_s3_checkpoint_key(thread_id, checkpoint_ns, checkpoint_id)
-        try:
-            obj = self.s3.get_object(Bucket=self.bucket_name, Key=key)
-        except self.s3.exceptions.NoSuchKey:
-            return None
-
-        data = json.loads(obj["Body"].read().decode("utf-8"))
+        if self.cache is not None:
+            cached = self.cache.get((thread_id, checkpoint_ns, checkpoint_id))
+            if cached is not None:
+                return cached
 
-        checkpoint_type = data["checkpoint_type"]
-        checkpoint_data = data["checkpoint_data"]
-        checkpoint = self.serde.loads_typed((checkpoint_type, checkpoint_data))
-
-        metadata_data = data.get("metadata_data")
-        if metadata_data is None:
-            raise ValueError("Metadata is missing in checkpoint data")
-
-        metadata = self.serde.loads_typed((checkpoint_type, metadata_data))
-
-        parent_checkpoint_id = data.get("parent_checkpoint_id")
-        if parent_checkpoint_id:
-            parent_config = {
-                "configurable": {
-                    "thread_id": thread_id,
-                    "checkpoint_ns": checkpoint_ns,
-                    "checkpoint_id": parent_checkpoint_id,
-                }
-            }
-        else:
-            parent_config = None
-
-        pending_writes = self._load_pending_writes(
-            thread_id, checkpoint_ns, checkpoint_id
-        )
+        obj = self._get_checkpoint_object(thread_id, checkpoint_ns, checkpoint_id)
+        if obj is None and latest:
+            # The latest pointer refers to a checkpoint that no longer exists,
+            # so fall back to scanning the namespace
+            checkpoint_id = self._scan_latest_checkpoint_id(thread_id, checkpoint_ns)
+            if checkpoint_id is not None:
+                obj = self._get_checkpoint_object(
+                    thread_id, checkpoint_ns, checkpoint_id
+                )
+        if obj is None:
+            return None
 
-        return CheckpointTuple(
-            {
-                "configurable": {
-                    "thread_id": thread_id,
-                    "checkpoint_ns": checkpoint_ns,
-                    "checkpoint_id": checkpoint_id,
-                }
-            },
-            checkpoint,
-            metadata,
-            parent_config,
-            pending_writes,
+        data = _decode_envelope(obj["Body"].read())
+        checkpoint_tuple = self._load_checkpoint_tuple(
+            thread_id, checkpoint_ns, checkpoint_id, data
         )
+        if latest:
+            self._chain_heads[(thread_id, checkpoint_ns)] = (
+                checkpoint_id,
+                data.get("delta_depth", 0),
+            )
+        if self.cache is not None:
+            self.cache.put((thread_id, checkpoint_ns, checkpoint_id), checkpoint_tuple)
+        return checkpoint_tuple
 
     def list(
         self,
@@ -219,154 +589,873 @@ class S3Checkpointer(BaseCheckpointSaver):
 
         thread_id = config["configurable"]["thread_id"]
         checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
-        prefix = _make_s3_namespace_prefix(thread_id, checkpoint_ns)
+        keys_info = self._list_checkpoint_keys(thread_id, checkpoint_ns)
 
-        paginator = self.s3.get_paginator("list_objects_v2")
-        pages = paginator.paginate(Bucket=self.bucket_name, Prefix=f"{prefix}/")
+        if before:
+            before_id = before["configurable"]["checkpoint_id"]
+            keys_info = [ki for ki in keys_info if ki["checkpoint_id"] < before_id]
 
-        keys = []
-        for page in pages:
-            contents = page.get("Contents", [])
-            for c in contents:
-                key = c["Key"]
-                if key.endswith(".json") and "/writes/" not in key:
-                    keys.append(key)
+        count = 0
+        for ki in keys_info:
+            if limit is not None and count >= limit:
+                return
 
-        keys_info = [_parse_s3_checkpoint_key(k) for k in keys]
-        keys_info.sort(key=lambda x: x["checkpoint_id"], reverse=True)
+            if filter:
+                # Check the metadata before downloading the full checkpoint
+                info = self._get_checkpoint_info(**ki)
+                if info is None or not _metadata_matches(info.metadata, filter):
+                    continue
+
+            obj = self._get_checkpoint_object(**ki)
+            if obj is None:
+                continue
+            data = _decode_envelope(obj["Body"].read())
+            count += 1
+            yield self._load_checkpoint_tuple(
+                ki["thread_id"], ki["checkpoint_ns"], ki["checkpoint_id"], data
+            )
+
+    def list_metadata(
+        self,
+        config: RunnableConfig,
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointInfo]:
+        """
+        Lists checkpoint IDs, timestamps, and metadata, newest first, without
+        downloading checkpoint bodies or pending writes.
+
+        Args:
+            config: The config identifying the thread and namespace to list
+            filter: Metadata key/value pairs that listed checkpoints must match
+            before: Only list checkpoints older than this checkpoint
+            limit: The maximum number of checkpoints to list
+        """
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        keys_info = self._list_checkpoint_keys(thread_id, checkpoint_ns)
 
         if before:
             before_id = before["configurable"]["checkpoint_id"]
             keys_info = [ki for ki in keys_info if ki["checkpoint_id"] < before_id]
 
-        if limit is not None:
-            keys_info = keys_info[:limit]
-
+        count = 0
         for ki in keys_info:
-            ck_key = _make_s3_checkpoint_key(
-                ki["thread_id"], ki["checkpoint_ns"], ki["checkpoint_id"]
-            )
-            obj = self.s3.get_object(Bucket=self.bucket_name, Key=ck_key)
-            data = json.loads(obj["Body"].read().decode("utf-8"))
+            if limit is not None and count >= limit:
+                return
 
-            checkpoint_type = data["checkpoint_type"]
-            checkpoint_data = data["checkpoint_data"]
-            checkpoint = self.serde.loads_typed((checkpoint_type, checkpoint_data))
+            info = self._get_checkpoint_info(**ki)
+            if info is None:
+                continue
+            if filter and not _metadata_matches(info.metadata, filter):
+                continue
+            count += 1
+            yield info
 
-            # Derive metadata_type from checkpoint_type as above
-            if checkpoint_type.startswith("bz2"):
-                metadata_type = "bz2_json"
-            elif checkpoint_type.startswith("gzip"):
-                metadata_type = "gzip_json"
-            else:
-                metadata_type = "json"
-            metadata_data = data["metadata_data"]
-            metadata = self.serde.loads_typed((metadata_type, metadata_data))
+    def list_thread_ids(self) -> Iterator[str]:
+        """
+        Lists the IDs of the threads with objects in the bucket, in key order,
+        a page at a time.
+        """
+        paginator = self.s3.get_paginator("list_objects_v2")
+        pages = paginator.paginate(
+            Bucket=self.bucket_name, Prefix="checkpoints/", Delimiter="/"
+        )
+        for page in pages:
+            for p in page.get("CommonPrefixes", []):
+                yield p["Prefix"].split("/")[1]
 
-            parent_checkpoint_id = data.get("parent_checkpoint_id")
-            if parent_checkpoint_id:
-                parent_config = {
-                    "configurable": {
-                        "thread_id": ki["thread_id"],
-                        "checkpoint_ns": ki["checkpoint_ns"],
-                        "checkpoint_id": parent_checkpoint_id,
-                    }
-                }
-            else:
-                parent_config = None
+    def get_thread_timestamp(self, thread_id: str) -> Optional[int]:
+        """
+        Returns when the newest checkpoint in any of a thread's namespaces was
+        saved, in milliseconds since the epoch, from the timestamp embedded in
+        each namespace's latest pointer or latest checkpoint.
 
-            pending_writes = self._load_pending_writes(
-                ki["thread_id"], ki["checkpoint_ns"], ki["checkpoint_id"]
+        Returns None if the thread has no checkpoints.
+        """
+        _, namespaces = self._list_prefix_level(f"{_make_s3_thread_prefix(thread_id)}/")
+        timestamps = []
+        for namespace in namespaces:
+            checkpoint_ns = _namespace_val(namespace.split("/")[2])
+            pointer = self._get_latest_pointer(thread_id, checkpoint_ns)
+            if pointer and pointer.get("timestamp") is not None:
+                timestamps.append(pointer["timestamp"])
+                continue
+            checkpoint_id = self._scan_latest_checkpoint_id(thread_id, checkpoint_ns)
+            info = (
+                self._get_checkpoint_info(thread_id, checkpoint_ns, checkpoint_id)
+                if checkpoint_id
+                else None
             )
+            if info is not None and info.timestamp is not None:
+                timestamps.append(info.timestamp)
+        return max(timestamps, default=None)
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"]
+        return await self._run_in_thread_order(thread_id, self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        loop = asyncio.get_running_loop()
+        iterator = self.list(config, filter=filter, before=before, limit=limit)
+        # Fetch each checkpoint only when it is asked for, as list does
+        done = object()
+        while True:
+            item = await loop.run_in_executor(None, next, iterator, done)
+            if item is done:
+                return
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        return await self._run_in_thread_order(
+            thread_id, self.put, config, checkpoint, metadata, new_versions
+        )
 
-            yield CheckpointTuple(
-                {
-                    "configurable": {
-                        "thread_id": ki["thread_id"],
-                        "checkpoint_ns": ki["checkpoint_ns"],
-                        "checkpoint_id": ki["checkpoint_id"],
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+    ) -> None:
+        thread_id = config["configurable"]["thread_id"]
+        await self._run_in_thread_order(
+            thread_id, self.put_writes, config, writes, task_id
+        )
+
+    async def _run_in_thread_order(
+        self, thread_id: str, fn: Callable[..., Any], *args: Any
+    ) -> Any:
+        lock = self._thread_locks.get(thread_id)
+        if lock is None:
+            lock = self._thread_locks[thread_id] = asyncio.Lock()
+        async with lock:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, partial(fn, *args))
+
+    def load_offloaded(self, messages: Sequence[BaseMessage]) -> List[BaseMessage]:
+        """
+        Returns the messages with the content of any offloaded ToolMessages
+        fetched and restored. Messages that weren't offloaded are returned
+        as they are. Content this checkpointer has already loaded or stored is
+        reused from memory.
+        """
+        keys = {
+            m.additional_kwargs[OFFLOADED_CONTENT_KEY]["key"]
+            for m in messages
+            if OFFLOADED_CONTENT_KEY in m.additional_kwargs
+        }
+        if not keys:
+            return list(messages)
+
+        with self._cached_content_lock:
+            contents = {
+                k: self._cached_content[k] for k in keys if k in self._cached_content
+            }
+            for key in contents:
+                self._cached_content.move_to_end(key)
+        missing = [k for k in keys if k not in contents]
+        if missing:
+            workers = min(self.write_concurrency, len(missing))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                fetched = dict(zip(missing, executor.map(self._get_content, missing)))
+            for key, content in fetched.items():
+                self._cache_content(key, content)
+            contents.update(fetched)
+
+        result = []
+        for message in messages:
+            ref = message.additional_kwargs.get(OFFLOADED_CONTENT_KEY)
+            if ref is not None:
+                additional_kwargs = {
+                    k: v
+                    for k, v in message.additional_kwargs.items()
+                    if k != OFFLOADED_CONTENT_KEY
+                }
+                message = message.model_copy(
+                    update={
+                        "content": contents[ref["key"]],
+                        "additional_kwargs": additional_kwargs,
                     }
+                )
+            result.append(message)
+        return result
+
+    def _offload(self, value: Any, thread_id: str, content_keys: Set[str]) -> Any:
+        """
+        Replaces large ToolMessages in a channel value or write with copies
+        that reference their separately stored content, adding the keys of the
+        content the value refers to to content_keys.
+        """
+        if isinstance(value, ToolMessage):
+            return self._offload_message(value, thread_id, content_keys)
+        if isinstance(value, list) and any(isinstance(v, ToolMessage) for v in value):
+            return [
+                self._offload_message(v, thread_id, content_keys)
+                if isinstance(v, ToolMessage)
+                else v
+                for v in value
+            ]
+        return value
+
+    def _offload_message(
+        self, message: ToolMessage, thread_id: str, content_keys: Set[str]
+    ) -> ToolMessage:
+        content = message.content
+        ref = message.additional_kwargs.get(OFFLOADED_CONTENT_KEY)
+        if ref is not None:
+            content_keys.add(ref["key"])
+            return message
+        if (
+            not isinstance(content, str)
+            or len(content.encode("utf-8")) < self.offload_threshold
+        ):
+            return message
+        key = _make_s3_content_key(thread_id, content)
+        self._put_content(key, content)
+        content_keys.add(key)
+        return message.model_copy(
+            update={
+                "content": OFFLOADED_CONTENT_PLACEHOLDER,
+                "additional_kwargs": {
+                    **message.additional_kwargs,
+                    OFFLOADED_CONTENT_KEY: {"key": key},
                 },
-                checkpoint,
-                metadata,
-                parent_config,
-                pending_writes,
+            }
+        )
+
+    def _put_content(self, key: str, content: str) -> None:
+        if key in self._known_content:
+            return
+        c_type, c_data = self._dumps_typed(content)
+        body, content_type = _encode_envelope(
+            {"type": c_type, "data": c_data}, self.envelope
+        )
+        # Kept by a background deletion of the thread, like any other write
+        self._track_write(key)
+        try:
+            # Content objects never change, so one already stored is left as
+            # it is
+            self.s3.put_object(
+                Bucket=self.bucket_name,
+                Key=key,
+                Body=body,
+                ContentType=content_type,
+                IfNoneMatch="*",
             )
+        except ClientError as e:
+            if e.response["Error"]["Code"] not in (
+                "PreconditionFailed",
+                "ConditionalRequestConflict",
+            ):
+                raise
+        if len(self._known_content) >= MAX_KNOWN_CONTENT_KEYS:
+            self._known_content.clear()
+        self._known_content.add(key)
+        self._cache_content(key, content)
+
+    def _cache_content(self, key: str, content: str) -> None:
+        if len(content) > MAX_CACHED_CONTENT_CHARS:
+            return
+        with self._cached_content_lock:
+            if key in self._cached_content:
+                self._cached_content.move_to_end(key)
+                return
+            self._cached_content[key] = content
+            self._cached_content_chars += len(content)
+            while self._cached_content_chars > MAX_CACHED_CONTENT_CHARS:
+                _, evicted = self._cached_content.popitem(last=False)
+                self._cached_content_chars -= len(evicted)
+
+    def _record_content_references(
+        self,
+        thread_id: str,
+        checkpoint_ns: str,
+        checkpoint_id: str,
+        key: str,
+        content_keys: Set[str],
+    ) -> None:
+        """
+        Called with the offloaded content a checkpoint or write batch refers
+        to, before it is saved.
+        """
+
+    def _get_content(self, key: str) -> str:
+        obj = self.s3.get_object(Bucket=self.bucket_name, Key=key)
+        data = _decode_envelope(obj["Body"].read())
+        return self.serde.loads_typed((data["type"], data["data"]))
+
+    def _dumps_typed(self, obj: Any) -> Tuple[str, Any]:
+        if self.envelope == "binary":
+            return self.serde.dumps_binary(obj)
+        return self.serde.dumps_typed(obj)
 
     def _get_latest_checkpoint_id(
         self, thread_id: str, checkpoint_ns: str
     ) -> Optional[str]:
+        if self._pending_delete(_make_s3_latest_key(thread_id, checkpoint_ns)):
+            # Nothing has been saved since the thread was deleted
+            return None
+        pointer = self._get_latest_pointer(thread_id, checkpoint_ns)
+        if pointer and pointer.get("checkpoint_id"):
+            if "delta_depth" in pointer:
+                self._chain_heads[(thread_id, checkpoint_ns)] = (
+                    pointer["checkpoint_id"],
+                    pointer["delta_depth"],
+                )
+            return pointer["checkpoint_id"]
+        return self._scan_latest_checkpoint_id(thread_id, checkpoint_ns)
+
+    def _get_latest_pointer(
+        self, thread_id: str, checkpoint_ns: str
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Reads the namespace's latest pointer object, which records the ID of the
+        newest checkpoint.
+
+        Returns None if the pointer does not exist or cannot be parsed.
+        """
+        key = _make_s3_latest_key(thread_id, checkpoint_ns)
+        try:
+            obj = self.s3.get_object(Bucket=self.bucket_name, Key=key)
+        except self.s3.exceptions.NoSuchKey:
+            obj = None
+        self._pointer_etags[key] = obj.get("ETag") if obj else None
+        # Saves now build on the pointer read here
+        self._conflicted.discard((thread_id, checkpoint_ns))
+        if obj is None:
+            return None
+
+        try:
+            data = json.loads(obj["Body"].read().decode("utf-8"))
+        except ValueError:
+            return None
+        return data if isinstance(data, dict) else None
+
+    def _put_latest_pointer(
+        self,
+        thread_id: str,
+        checkpoint_ns: str,
+        checkpoint_id: str,
+        timestamp: int,
+        delta_depth: int = 0,
+    ) -> None:
+        key = _make_s3_latest_key(thread_id, checkpoint_ns)
+        body = json.dumps(
+            {
+                "checkpoint_id": checkpoint_id,
+                "timestamp": timestamp,
+                "delta_depth": delta_depth,
+            }
+        )
+        self._put_object(key, body.encode("utf-8"))
+
+    def _put_object(
+        self,
+        key: str,
+        body: bytes,
+        content_type: Optional[str] = None,
+        metadata: Optional[Dict[str, str]] = None,
+    ) -> None:
+        kwargs = {}
+        if content_type:
+            kwargs["ContentType"] = content_type
+        if metadata:
+            kwargs["Metadata"] = metadata
+        self._track_write(key)
+        if self.conditional_writes and key.endswith("/latest.json"):
+            self._put_pointer_object(key, body, **kwargs)
+        else:
+            self.s3.put_object(Bucket=self.bucket_name, Key=key, Body=body, **kwargs)
+
+    def _put_pointer_object(self, key: str, body: bytes, **kwargs) -> None:
+        """
+        Writes a latest pointer only if it is still the version this
+        checkpointer last saw. A pointer it hasn't seen is written as is.
+        """
+        parts = key.split("/")
+        thread_id, checkpoint_ns = parts[1], _namespace_val(parts[2])
+        self._check_conflict(thread_id, checkpoint_ns)
+        if key in self._pointer_etags:
+            etag = self._pointer_etags[key]
+            if etag is None:
+                kwargs["IfNoneMatch"] = "*"
+            else:
+                kwargs["IfMatch"] = etag
+        try:
+            response = self.s3.put_object(
+                Bucket=self.bucket_name, Key=key, Body=body, **kwargs
+            )
+        except ClientError as e:
+            if e.response["Error"]["Code"] not in (
+                "PreconditionFailed",
+                "ConditionalRequestConflict",
+                "NoSuchKey",
+            ):
+                raise
+            self._record_conflict(thread_id, checkpoint_ns)
+            raise CheckpointConflictError(thread_id, checkpoint_ns) from e
+        self._pointer_etags[key] = response.get("ETag")
+
+    def _check_conflict(self, thread_id: str, checkpoint_ns: str) -> None:
+        if (thread_id, checkpoint_ns) in self._conflicted:
+            raise CheckpointConflictError(thread_id, checkpoint_ns)
+
+    def _record_conflict(self, thread_id: str, checkpoint_ns: str) -> None:
+        """
+        Marks a namespace whose latest pointer lost a race, so that saving to
+        it raises until it is read again (e.g., on retry), and forgets what
+        this checkpointer knew of its losing checkpoints.
+        """
+        self._conflicted.add((thread_id, checkpoint_ns))
+        self._pointer_etags.pop(_make_s3_latest_key(thread_id, checkpoint_ns), None)
+        self._chain_heads.pop((thread_id, checkpoint_ns), None)
+        if self.cache is not None:
+            self.cache.invalidate_thread(thread_id)
+
+    def _get_object_body(self, key: str) -> bytes:
+        return self.s3.get_object(Bucket=self.bucket_name, Key=key)["Body"].read()
+
+    def _list_keys(self, prefix: str) -> List[str]:
+        paginator = self.s3.get_paginator("list_objects_v2")
+        pages = paginator.paginate(Bucket=self.bucket_name, Prefix=prefix)
+        return [c["Key"] for page in pages for c in page.get("Contents", [])]
+
+    def _list_write_keys(
+        self, thread_id: str, checkpoint_ns: str, checkpoint_id: str
+    ) -> List[str]:
+        prefix = _make_s3_checkpoint_prefix(thread_id, checkpoint_ns, checkpoint_id)
+        keys = self._list_keys(f"{prefix}/writes/")
+        return [key for key in keys if not self._pending_delete(key)]
+
+    def _scan_latest_checkpoint_id(
+        self, thread_id: str, checkpoint_ns: str
+    ) -> Optional[str]:
+        keys_info = self._list_checkpoint_keys(thread_id, checkpoint_ns)
+        latest_id = keys_info[0]["checkpoint_id"] if keys_info else None
+        return latest_id
+
+    def _list_checkpoint_keys(
+        self, thread_id: str, checkpoint_ns: str
+    ) -> List[Dict[str, str]]:
+        """
+        Lists the checkpoints in a namespace, newest first.
+        """
         prefix = _make_s3_namespace_prefix(thread_id, checkpoint_ns)
+        latest_key = _make_s3_latest_key(thread_id, checkpoint_ns)
         paginator = self.s3.get_paginator("list_objects_v2")
         pages = paginator.paginate(Bucket=self.bucket_name, Prefix=f"{prefix}/")
         keys = []
         for page in pages:
             for c in page.get("Contents", []):
                 key = c["Key"]
+                if key == latest_key:
+                    continue
+                if self._pending_delete(key):
+                    continue
                 if key.endswith(".json") and "/writes/" not in key:
                     keys.append(key)
 
-        if not keys:
-            return None
-
         keys_info = [_parse_s3_checkpoint_key(k) for k in keys]
         keys_info.sort(key=lambda x: x["checkpoint_id"], reverse=True)
-        latest_id = keys_info[0]["checkpoint_id"] if keys_info else None
-        return latest_id
+        return keys_info
+
+    def _get_checkpoint_object(
+        self, thread_id: str, checkpoint_ns: str, checkpoint_id: str
+    ) -> Optional[Dict[str, Any]]:
+        key = _make_s3_checkpoint_key(thread_id, checkpoint_ns, checkpoint_id)
+        if self._pending_delete(key):
+            return None
+        try:
+            return self.s3.get_object(Bucket=self.bucket_name, Key=key)
+        except self.s3.exceptions.NoSuchKey:
+            return None
+
+    def _get_checkpoint_info(
+        self, thread_id: str, checkpoint_ns: str, checkpoint_id: str
+    ) -> Optional[CheckpointInfo]:
+        """
+        Reads a checkpoint's metadata from the S3 object's headers, falling
+        back to the object body for checkpoints saved without them.
+        """
+        key = _make_s3_checkpoint_key(thread_id, checkpoint_ns, checkpoint_id)
+        try:
+            head = self.s3.head_object(Bucket=self.bucket_name, Key=key)
+        except ClientError as e:
+            if e.response["Error"]["Code"] in ("404", "NoSuchKey"):
+                return None
+            raise
+
+        headers = head.get("Metadata", {})
+        if "checkpoint-metadata" in headers:
+            metadata = json.loads(headers["checkpoint-metadata"])
+            parent_checkpoint_id = headers.get("parent-checkpoint-id")
+            timestamp = int(headers["timestamp"])
+        else:
+            obj = self._get_checkpoint_object(thread_id, checkpoint_ns, checkpoint_id)
+            if obj is None:
+                return None
+            data = _decode_envelope(obj["Body"].read())
+            metadata = self._load_metadata(data)
+            parent_checkpoint_id = data.get("parent_checkpoint_id")
+            timestamp = data.get("timestamp")
+
+        return CheckpointInfo(
+            _make_config(thread_id, checkpoint_ns, checkpoint_id),
+            metadata,
+            _make_config(thread_id, checkpoint_ns, parent_checkpoint_id)
+            if parent_checkpoint_id
+            else None,
+            timestamp,
+        )
+
+    def _load_checkpoint(
+        self, thread_id: str, checkpoint_ns: str, data: Dict[str, Any]
+    ) -> Checkpoint:
+        """
+        Decodes the checkpoint in a stored envelope, rebuilding the full channel
+        values from its parents if it was saved as a delta.
+        """
+        checkpoint = self.serde.loads_typed(
+            (data["checkpoint_type"], data["checkpoint_data"])
+        )
+        if not data.get("delta_depth"):
+            return checkpoint
+
+        parent_values = self._load_channel_values(
+            thread_id, checkpoint_ns, data["parent_checkpoint_id"]
+        )
+        changed_values = checkpoint["channel_values"]
+        checkpoint["channel_values"] = {
+            k: changed_values[k] if k in changed_values else parent_values[k]
+            for k in data["channel_keys"]
+            if k in changed_values or k in parent_values
+        }
+        return checkpoint
+
+    def _load_channel_values(
+        self, thread_id: str, checkpoint_ns: str, checkpoint_id: str
+    ) -> Dict[str, Any]:
+        if self.cache is not None:
+            cached = self.cache.get((thread_id, checkpoint_ns, checkpoint_id))
+            if cached is not None:
+                return cached.checkpoint["channel_values"]
+
+        obj = self._get_checkpoint_object(thread_id, checkpoint_ns, checkpoint_id)
+        if obj is None:
+            raise ValueError(
+                f"Checkpoint {checkpoint_id} needed to rebuild a delta checkpoint "
+                "is missing"
+            )
+        data = _decode_envelope(obj["Body"].read())
+        return self._load_checkpoint(thread_id, checkpoint_ns, data)["channel_values"]
+
+    def _next_delta_depth(
+        self, thread_id: str, checkpoint_ns: str, parent_checkpoint_id: Optional[str]
+    ) -> int:
+        """
+        Returns how many deltas a new checkpoint would be from the last full
+        snapshot, or 0 if it should be saved in full. Checkpoints are saved in
+        full whenever the parent's place in the chain is unknown.
+        """
+        if not self.snapshot_interval or not parent_checkpoint_id:
+            return 0
+        head = self._chain_heads.get((thread_id, checkpoint_ns))
+        if head is None or head[0] != parent_checkpoint_id:
+            return 0
+        depth = head[1] + 1
+        return depth if depth < self.snapshot_interval else 0
+
+    def _load_metadata(self, data: Dict[str, Any]) -> CheckpointMetadata:
+        metadata_data = data.get("metadata_data")
+        if metadata_data is None:
+            raise ValueError("Metadata is missing in checkpoint data")
+        return self.serde.loads_typed((data["checkpoint_type"], metadata_data))
+
+    def _load_checkpoint_tuple(
+        self,
+        thread_id: str,
+        checkpoint_ns: str,
+        checkpoint_id: str,
+        data: Dict[str, Any],
+    ) -> CheckpointTuple:
+        checkpoint = self._load_checkpoint(thread_id, checkpoint_ns, data)
+        metadata = self._load_metadata(data)
+
+        parent_checkpoint_id = data.get("parent_checkpoint_id")
+        if parent_checkpoint_id:
+            parent_config = _make_config(thread_id, checkpoint_ns, parent_checkpoint_id)
+        else:
+            parent_config = None
+
+        pending_writes = self._load_pending_writes(
+            thread_id, checkpoint_ns, checkpoint_id
+        )
+
+        return CheckpointTuple(
+            _make_config(thread_id, checkpoint_ns, checkpoint_id),
+            checkpoint,
+            metadata,
+            parent_config,
+            pending_writes,
+        )
 
     def _load_pending_writes(
         self, thread_id: str, checkpoint_ns: str, checkpoint_id: str
     ) -> List[PendingWrite]:
-        prefix = (
-            _make_s3_checkpoint_prefix(thread_id, checkpoint_ns, checkpoint_id)
-            + "/writes/"
-        )
-        paginator = self.s3.get_paginator("list_objects_v2")
-        pages = paginator.paginate(Bucket=self.bucket_name, Prefix=prefix)
+        # Writes are stored either as one batch object per task
+        # (writes/{task_id}.json) or, for checkpoints saved before batching,
+        # as one object per write (writes/{task_id}/{idx}.json)
+        batch_keys = {}
+        write_keys = []
+        for wkey in self._list_write_keys(thread_id, checkpoint_ns, checkpoint_id):
+            parts = wkey.split("/")
+            if len(parts) == 6 and parts[5].endswith(".json"):
+                batch_keys[parts[5][: -len(".json")]] = wkey
+            elif len(parts) >= 7:
+                write_keys.append((parts[5], _write_index(parts[6]), wkey))
 
-        writes = []
-        for page in pages:
-            for c in page.get("Contents", []):
-                wkey = c["Key"]
-                parts = wkey.split("/")
-                if len(parts) < 7:
-                    continue
-                task_id = parts[5]
-                wobj = self.s3.get_object(Bucket=self.bucket_name, Key=wkey)
-                wdata = json.loads(wobj["Body"].read().decode("utf-8"))
-                channel = wdata["channel"]
-                value_type = wdata["type"]
-                value_data = wdata["value"]
-                value = self.serde.loads_typed((value_type, value_data))
-                writes.append((task_id, channel, value))
+        # A batch supersedes any per-write objects left for the same task
+        write_keys = [wk for wk in write_keys if wk[0] not in batch_keys]
+        write_keys.extend((task_id, -1, wkey) for task_id, wkey in batch_keys.items())
+
+        # Keep writes in (task_id, idx) order regardless of how they are fetched
+        write_keys.sort(key=lambda w: (w[0], w[1]))
+
+        def load_writes(write_key: Tuple[str, int, str]) -> List[PendingWrite]:
+            task_id, idx, wkey = write_key
+            wdata = _decode_envelope(self._get_object_body(wkey))
+            entries = wdata.get("writes", []) if idx < 0 else [wdata]
+            return [
+                (
+                    task_id,
+                    entry["channel"],
+                    self.serde.loads_typed((entry["type"], entry["value"])),
+                )
+                for entry in entries
+            ]
+
+        workers = min(self.write_concurrency, len(write_keys))
+        if workers <= 1:
+            loaded = [load_writes(wk) for wk in write_keys]
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                loaded = list(executor.map(load_writes, write_keys))
+
+        return [write for writes in loaded for write in writes]
 
-        return writes
+    def flush(self) -> None:
+        """
+        Waits for all background work, such as uploads and deletions, to
+        finish, then raises the first error it hit.
+        """
+        tasks, self._background_tasks = self._background_tasks, []
+        wait(tasks)
+        for future in tasks:
+            if future.exception() is not None:
+                raise future.exception()
+
+    def _submit_background(self, fn, *args) -> None:
+        # Keep failed tasks until flush raises their errors
+        self._background_tasks = [
+            f for f in self._background_tasks if not f.done() or f.exception()
+        ]
+        self._background_tasks.append(self._background.submit(fn, *args))
 
-    def delete_checkpoints(self, thread_id: str) -> None:
+    def delete_checkpoints(self, thread_id: str, wait: bool = True) -> None:
         """
         Deletes all items with the specified thread_id from the checkpoint bucket.
 
+        A thread that fits in one DeleteObjects batch is listed and deleted
+        with one request each. A larger thread's namespaces and checkpoints are
+        split into key ranges that are listed and deleted concurrently, up to
+        delete_concurrency at once.
+
         Args:
             thread_id: The thread_id value to delete
+            wait: If False, delete in the background and return immediately.
+                The thread reads as deleted right away, and checkpoints saved
+                to it in the meantime are kept. Call flush to wait for the
+                deletion to finish.
         """
 
-        def delete_objects(objects: dict) -> None:
-            if objects["Objects"]:
-                self.s3.delete_objects(Bucket=self.bucket_name, Delete=objects)
+        if self.cache is not None:
+            self.cache.invalidate_thread(thread_id)
+        for chain in [c for c in self._chain_heads if c[0] == thread_id]:
+            del self._chain_heads[chain]
+        thread_prefix = f"{_make_s3_thread_prefix(thread_id)}/"
+        for key in [k for k in self._pointer_etags if k.startswith(thread_prefix)]:
+            del self._pointer_etags[key]
+        with self._content_lock:
+            self._known_content = {
+                k for k in self._known_content if not k.startswith(thread_prefix)
+            }
+        self._conflicted = {n for n in self._conflicted if n[0] != thread_id}
+
+        if wait:
+            self._delete_thread_objects(thread_id)
+            return
 
+        written: Set[str] = set()
+        with self._deleting_lock:
+            self._deleting[thread_id] = written
+        self._submit_background(self._delete_thread_objects, thread_id, written)
+
+    def _delete_thread_objects(
+        self, thread_id: str, written: Optional[Set[str]] = None
+    ) -> None:
+        try:
+            prefix = f"{_make_s3_thread_prefix(thread_id)}/"
+            response = self.s3.list_objects_v2(
+                Bucket=self.bucket_name,
+                Prefix=prefix,
+                MaxKeys=MAX_UNSPLIT_THREAD_OBJECTS,
+            )
+            if not response.get("IsTruncated"):
+                keys = [c["Key"] for c in response.get("Contents", [])]
+                self._delete_keys_batched(keys)
+                return
+
+            keys, namespaces = self._list_prefix_level(prefix)
+            with ThreadPoolExecutor(max_workers=self.delete_concurrency) as executor:
+                levels = list(executor.map(self._list_prefix_level, namespaces))
+                ranges = []
+                for namespace, (namespace_keys, checkpoints) in zip(namespaces, levels):
+                    keys.extend(namespace_keys)
+                    ranges.extend(self._key_ranges(namespace, checkpoints))
+                tasks = [executor.submit(self._delete_key_range, *r) for r in ranges]
+                tasks.append(executor.submit(self._delete_keys_batched, keys))
+                for task in tasks:
+                    task.result()
+        finally:
+            if written is not None:
+                with self._deleting_lock:
+                    if self._deleting.get(thread_id) is written:
+                        del self._deleting[thread_id]
+
+    def _list_prefix_level(self, prefix: str) -> Tuple[List[str], List[str]]:
+        """
+        Lists the objects directly under a prefix and its sub-prefixes, in
+        key order.
+        """
         paginator = self.s3.get_paginator("list_objects_v2")
-        prefix = f"checkpoints/{thread_id}/"
-        pages = paginator.paginate(Bucket=self.bucket_name, Prefix=prefix)
+        pages = paginator.paginate(
+            Bucket=self.bucket_name, Prefix=prefix, Delimiter="/"
+        )
+        keys, prefixes = [], []
+        for page in pages:
+            keys.extend(c["Key"] for c in page.get("Contents", []))
+            prefixes.extend(p["Prefix"] for p in page.get("CommonPrefixes", []))
+        return keys, sorted(prefixes)
+
+    def _key_ranges(
+        self, namespace: str, checkpoints: List[str]
+    ) -> List[Tuple[str, Optional[str], Optional[str]]]:
+        """
+        Splits a namespace's checkpoint prefixes into up to delete_concurrency
+        contiguous (prefix, start_after, end) key ranges, of at least
+        MIN_DELETE_RANGE_CHECKPOINTS checkpoints each.
+        """
+        if not checkpoints:
+            return []
+        size = max(
+            -(-len(checkpoints) // self.delete_concurrency),
+            MIN_DELETE_RANGE_CHECKPOINTS,
+        )
+        bounds = checkpoints[::size]
+        return [
+            (
+                namespace,
+                bound.rstrip("/") if i > 0 else None,
+                bounds[i + 1] if i + 1 < len(bounds) else None,
+            )
+            for i, bound in enumerate(bounds)
+        ]
 
-        to_delete = {"Objects": []}
-        for item in pages.search("Contents"):
-            if item is not None:
-                to_delete["Objects"].append({"Key": item["Key"]})
+    def _delete_key_range(
+        self, prefix: str, start_after: Optional[str], end: Optional[str]
+    ) -> None:
+        paginator = self.s3.get_paginator("list_objects_v2")
+        kwargs = {"StartAfter": start_after} if start_after else {}
+        pages = paginator.paginate(Bucket=self.bucket_name, Prefix=prefix, **kwargs)
+        for page in pages:
+            keys = [c["Key"] for c in page.get("Contents", [])]
+            in_range = [key for key in keys if end is None or key < end]
+            self._delete_keys_batched(in_range)
+            if len(in_range) < len(keys):
+                return
 
-                # Batch deletions in groups of 1000 (S3's limit)
-                if len(to_delete["Objects"]) >= 1000:
-                    delete_objects(to_delete)
-                    to_delete["Objects"] = []
+    def _delete_keys_batched(self, keys: List[str]) -> None:
+        # Keep anything saved since a background deletion started. Checkpoints
+        # and writes are only created once, so they are deleted concurrently
+        # once checked. Keys that can be saved again are checked and deleted
+        # under the lock, so that one isn't saved again in between.
+        rewritable = []
+        if self._deleting:
+            rewritable = [k for k in keys if _is_rewritable_key(k)]
+            keys = [k for k in keys if not _is_rewritable_key(k)]
+        for i in range(0, len(keys), 1000):  # S3's limit per request
+            with self._deleting_lock:
+                batch = [k for k in keys[i : i + 1000] if not self._written(k)]
+            self._delete_objects(batch)
+        for i in range(0, len(rewritable), 1000):
+            with self._deleting_lock:
+                batch = [k for k in rewritable[i : i + 1000] if not self._written(k)]
+                self._delete_objects(batch)
+
+    def _delete_objects(self, keys: List[str]) -> None:
+        if keys:
+            self.s3.delete_objects(
+                Bucket=self.bucket_name,
+                Delete={"Objects": [{"Key": key} for key in keys]},
+            )
 
-        # Delete any remaining objects
-        delete_objects(to_delete)
+    def _written(self, key: str) -> bool:
+        written = self._deleting.get(key.split("/")[1])
+        return written is not None and key in written
+
+    def _pending_delete(self, key: str) -> bool:
+        """
+        Returns whether a key belongs to a thread being deleted in the
+        background and hasn't been written since.
+        """
+        if not self._deleting:
+            return False
+        with self._deleting_lock:
+            written = self._deleting.get(key.split("/")[1])
+            return written is not None and key not in written
+
+    def _track_write(self, key: str) -> None:
+        if self._deleting:
+            with self._deleting_lock:
+                written = self._deleting.get(key.split("/")[1])
+                if written is not None:
+                    written.add(key)
+
+    async def adelete_checkpoints(self, thread_id: str, wait: bool = True) -> None:
+        """
+        Deletes all items with the specified thread_id from the checkpoint
+        bucket, after any pending async writes to the thread.
+
+        Args:
+            thread_id: The thread_id value to delete
+            wait: If False, delete in the background, as delete_checkpoints does
+        """
+        await self._run_in_thread_order(
+            thread_id, self.delete_checkpoints, thread_id, wait
+        )
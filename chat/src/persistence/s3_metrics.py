@@ -0,0 +1,81 @@
+import threading
+import time
+from typing import Any, Dict
+
+# Reported operation types for each S3 API operation; others are reported by
+# their operation name
+OPERATION_TYPES = {
+    "GetObject": "get",
+    "HeadObject": "head",
+    "PutObject": "put",
+    "ListObjectsV2": "list",
+    "DeleteObject": "delete",
+    "DeleteObjects": "delete",
+}
+
+_START = "s3_metrics_start"
+
+
+class S3Metrics:
+    """
+    Counts the S3 requests made by the clients it is registered with, along
+    with the object bytes read and written and the time spent, per operation
+    type ("get", "head", "put", "list", "delete").
+
+    Requests are counted through botocore's event hooks, so requests made from
+    background threads or by paginators are included. Thread-safe.
+    """
+
+    def __init__(self):
+        self._totals: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def register(self, client) -> None:
+        client.meta.events.register("provide-client-params.s3", self._before_call)
+        client.meta.events.register("after-call.s3", self._after_call)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._totals.clear()
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Returns the totals per operation type: calls, bytes_read, bytes_written,
+        and time_ms.
+        """
+        with self._lock:
+            return {
+                operation: {**totals, "time_ms": round(totals["time_ms"], 1)}
+                for operation, totals in sorted(self._totals.items())
+            }
+
+    def _totals_for(self, model) -> Dict[str, Any]:
+        operation = OPERATION_TYPES.get(model.name, model.name)
+        if operation not in self._totals:
+            self._totals[operation] = {
+                "calls": 0,
+                "bytes_read": 0,
+                "bytes_written": 0,
+                "time_ms": 0.0,
+            }
+        return self._totals[operation]
+
+    def _before_call(self, params, model, context, **kwargs) -> None:
+        context[_START] = time.perf_counter()
+        body = params.get("Body")
+        with self._lock:
+            totals = self._totals_for(model)
+            totals["calls"] += 1
+            if isinstance(body, str):
+                totals["bytes_written"] += len(body.encode("utf-8"))
+            elif isinstance(body, (bytes, bytearray)):
+                totals["bytes_written"] += len(body)
+
+    def _after_call(self, parsed, model, context, **kwargs) -> None:
+        start = context.get(_START)
+        elapsed = (time.perf_counter() - start) * 1000 if start else 0.0
+        with self._lock:
+            totals = self._totals_for(model)
+            totals["time_ms"] += elapsed
+            if model.name == "GetObject":
+                totals["bytes_read"] += parsed.get("ContentLength") or 0
@@ -1,9 +1,37 @@
+import json
 import os
-from typing import Optional
-from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+import threading
+from botocore.exceptions import ClientError
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Set, Tuple
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
 from langchain_core.runnables import RunnableConfig
-from langgraph.checkpoint.base import ChannelVersions, Checkpoint, CheckpointMetadata
-from persistence.s3_checkpointer import S3Checkpointer
+from langgraph.checkpoint.base import (
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+)
+from persistence.s3_checkpointer import (
+    S3Checkpointer,
+    _decode_envelope,
+    _make_s3_checkpoint_key,
+    _make_s3_latest_key,
+    _make_s3_namespace_prefix,
+    _make_s3_write_batch_key,
+)
+
+DEFAULT_RETAINED_CHECKPOINTS = 2
+MAX_PRUNE_STATES = 32
+COMPACTED_HISTORY_KEY = "compacted_history"
+COMPACTED_HISTORY_HEADER = (
+    "Here is a shortened record of our earlier conversation, oldest first:"
+)
+COMPACTED_HISTORY_REPLY = "Thanks, I'll keep our earlier conversation in mind."
+MAX_COMPACTED_QUESTION_CHARS = 200
+MAX_COMPACTED_ANSWER_CHARS = 400
 
 
 # Split messages into interactions, each one starting with a HumanMessage
@@ -49,8 +77,200 @@ def _prune_messages(messages):
     return [message for interaction in interactions for message in interaction]
 
 
+def _interaction_start(messages):
+    for i in range(len(messages) - 1, -1, -1):
+        if isinstance(messages[i], HumanMessage):
+            return i
+    return 0
+
+
+def _message_size(message):
+    content = message.content
+    if isinstance(content, str):
+        return len(content)
+    return len(json.dumps(content, default=str))
+
+
+def _message_text(message, limit):
+    content = message.content
+    if not isinstance(content, str):
+        content = " ".join(
+            part.get("text", "") if isinstance(part, dict) else str(part)
+            for part in content
+        )
+    content = " ".join(content.split())
+    return content if len(content) <= limit else content[: limit - 3] + "..."
+
+
+def _is_compacted_history(message):
+    return bool(message.additional_kwargs.get(COMPACTED_HISTORY_KEY))
+
+
+def _compact_messages(messages, max_bytes):
+    """
+    Replaces the oldest interactions in a pruned message history with a pair of
+    synthetic messages holding a truncated record of their questions and
+    answers, until the content of the history fits in max_bytes (or every
+    interaction has been compacted). Half of the budget is set aside for the
+    record, which drops its oldest entries to fit, and is left out if none
+    fit.
+
+    Returns the messages unchanged if they already fit.
+    """
+    interactions = _split_interactions(messages)
+    sizes = [sum(_message_size(m) for m in interaction) for interaction in interactions]
+    total = sum(sizes)
+    if total <= max_bytes:
+        return messages
+
+    entries = []
+    if interactions and _is_compacted_history(interactions[0][0]):
+        record = interactions[0][0].content[len(COMPACTED_HISTORY_HEADER) :]
+        entries = [entry for entry in record.strip().split("\n\n") if entry]
+        total -= sizes[0]
+        interactions, sizes = interactions[1:], sizes[1:]
+
+    def record_size():
+        overhead = len(COMPACTED_HISTORY_HEADER) + len(COMPACTED_HISTORY_REPLY)
+        return overhead + sum(len(e) + 2 for e in entries)
+
+    record_budget = max_bytes // 2
+    compacted = 0
+    while compacted < len(interactions) and total + record_budget > max_bytes:
+        interaction = interactions[compacted]
+        answers = [
+            m for m in interaction if isinstance(m, AIMessage) and _message_size(m)
+        ]
+        entry = f"Q: {_message_text(interaction[0], MAX_COMPACTED_QUESTION_CHARS)}"
+        if answers:
+            entry += f"\nA: {_message_text(answers[-1], MAX_COMPACTED_ANSWER_CHARS)}"
+        entries.append(entry)
+        total -= sizes[compacted]
+        compacted += 1
+
+    while entries and record_size() > record_budget:
+        entries.pop(0)
+
+    remaining = [m for interaction in interactions[compacted:] for m in interaction]
+    if not entries:
+        # Not even the newest entry fits beside the record's own text
+        return remaining
+    summary = [
+        HumanMessage(
+            content="\n\n".join([COMPACTED_HISTORY_HEADER, *entries]),
+            additional_kwargs={COMPACTED_HISTORY_KEY: True},
+        ),
+        AIMessage(
+            content=COMPACTED_HISTORY_REPLY,
+            additional_kwargs={COMPACTED_HISTORY_KEY: True},
+        ),
+    ]
+    return summary + remaining
+
+
+class _PruneState(NamedTuple):
+    """
+    Where pruning left off for the latest checkpoint in a namespace, so that the
+    next put only has to look at the messages appended since.
+    """
+
+    checkpoint_id: str
+    # The (start of the current interaction, message count) in the messages
+    # passed to put, which may still include pruned tool messages, and in the
+    # stored messages
+    positions: Tuple[Tuple[int, int], ...]
+    pruned_prefix: List[BaseMessage]  # The pruned messages before the start
+    first_message: Optional[BaseMessage]  # The current interaction's first message
+    last_message: Optional[BaseMessage]
+
+
+def _same_message(a: Optional[BaseMessage], b: Optional[BaseMessage]) -> bool:
+    return a is b or a == b
+
+
+def _prune_state(
+    checkpoint_id: str,
+    messages: List[BaseMessage],
+    start: int,
+    pruned: List[BaseMessage],
+    pruned_prefix: List[BaseMessage],
+) -> _PruneState:
+    positions = [(len(pruned_prefix), len(pruned))]
+    if (start, len(messages)) != positions[0]:
+        positions.insert(0, (start, len(messages)))
+    return _PruneState(
+        checkpoint_id,
+        tuple(positions),
+        pruned_prefix,
+        pruned[len(pruned_prefix)] if len(pruned) > len(pruned_prefix) else None,
+        pruned[-1] if pruned else None,
+    )
+
+
+def _prune_new_messages(
+    messages: List[BaseMessage], state: _PruneState
+) -> Optional[Tuple[List[BaseMessage], int, List[BaseMessage]]]:
+    """
+    Prunes messages that extend the ones pruned for the state's checkpoint,
+    scanning only the messages appended since. Returns the pruned messages and
+    the new start and pruned prefix, or None if the messages don't extend them.
+    """
+    for start, count in state.positions:
+        if count > len(messages) or start > count:
+            continue
+        if count > 0 and not _same_message(messages[count - 1], state.last_message):
+            continue
+        if start < count and not _same_message(messages[start], state.first_message):
+            continue
+
+        prefix = state.pruned_prefix
+        for i in range(len(messages) - 1, count - 1, -1):
+            if isinstance(messages[i], HumanMessage):
+                if i > start:
+                    # The interactions between the old and new start are finished
+                    finished = [m for m in messages[start:i] if not _is_tool_message(m)]
+                    start, prefix = i, prefix + finished
+                break
+        return prefix + messages[start:], start, prefix
+    return None
+
+
+@dataclass
+class _StoredCheckpoint:
+    """
+    The S3 keys known to belong to a checkpoint, the offloaded content each of
+    them refers to if known, and its delta depth if known
+    """
+
+    keys: Set[str] = field(default_factory=set)
+    content: Dict[str, Set[str]] = field(default_factory=dict)
+    delta_depth: Optional[int] = None
+
+
 class SelectiveCheckpointer(S3Checkpointer):
-    """S3 Checkpointer that discards ToolMessages from previous checkpoints."""
+    """
+    S3 Checkpointer that discards ToolMessages from previous checkpoints.
+
+    With retain_history=False, only the newest retained_checkpoints checkpoints
+    in each namespace are kept, along with any older ones still needed to
+    rebuild them from a full snapshot. Older checkpoints are deleted in the
+    background after each put, by key, from the checkpoints and writes this
+    checkpointer has saved. A namespace is listed the first time this
+    checkpointer prunes it, to find checkpoints and writes saved before it was
+    created. Since checkpoint_saver builds a new checkpointer for each
+    invocation, that is one listing per namespace per invocation, kept short by
+    the pruning earlier invocations have done.
+
+    With offload_threshold also set, offloaded content is deleted once none of
+    the thread's retained checkpoints and writes refers to it. The references
+    of checkpoints and writes saved before the checkpointer was created are
+    read from them the first time it prunes the thread.
+
+    With max_history_bytes set, finished interactions are compacted into a
+    short record of their questions and answers once the content of the
+    thread's earlier interactions exceeds that many bytes (roughly four bytes
+    per model token). The current interaction is never compacted.
+    """
 
     def __init__(
         self,
@@ -59,9 +279,19 @@ class SelectiveCheckpointer(S3Checkpointer):
         endpoint_url: Optional[str] = None,
         compression: Optional[str] = None,
         retain_history: Optional[bool] = True,
+        retained_checkpoints: int = DEFAULT_RETAINED_CHECKPOINTS,
+        max_history_bytes: Optional[int] = None,
+        **kwargs,
     ) -> None:
-        super().__init__(bucket_name, region_name, endpoint_url, compression)
+        super().__init__(bucket_name, region_name, endpoint_url, compression, **kwargs)
         self.retain_history = retain_history
+        self.max_history_bytes = max_history_bytes
+        self.retained_checkpoints = max(1, retained_checkpoints)
+        self._prune_states: OrderedDict[Tuple[str, str], _PruneState] = OrderedDict()
+        # Known checkpoints in each (thread_id, checkpoint_ns), by checkpoint ID
+        self._history: Dict[Tuple[str, str], Dict[str, _StoredCheckpoint]] = {}
+        self._listed_namespaces: Set[Tuple[str, str]] = set()
+        self._history_lock = threading.Lock()
 
     def put(
         self,
@@ -70,14 +300,283 @@ class SelectiveCheckpointer(S3Checkpointer):
         metadata: CheckpointMetadata,
         new_versions: ChannelVersions,
     ) -> RunnableConfig:
-        # Remove previous checkpoints
         thread_id = config["configurable"]["thread_id"]
-        if not self.retain_history:
-            self.delete_checkpoints(thread_id)
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        parent_checkpoint_id = config["configurable"].get("checkpoint_id")
 
         # Remove all ToolMessages except those related to the most
         # recent question (HumanMessage)
         messages = checkpoint.get("channel_values", {}).get("messages", [])
-        checkpoint["channel_values"]["messages"] = _prune_messages(messages)
+        state = self._prune_states.get((thread_id, checkpoint_ns))
+        incremental = None
+        if (
+            messages is not None
+            and state is not None
+            and state.checkpoint_id == parent_checkpoint_id
+        ):
+            incremental = _prune_new_messages(messages, state)
+        if incremental is not None:
+            pruned, start, prefix = incremental
+        else:
+            pruned = _prune_messages(messages)
+            start = _interaction_start(messages or [])
+            prefix = pruned[: _interaction_start(pruned)]
+
+        if self.max_history_bytes is not None and (
+            state is None or prefix is not state.pruned_prefix
+        ):
+            # Earlier interactions only change when a new one starts
+            compacted = _compact_messages(prefix, self.max_history_bytes)
+            if compacted is not prefix:
+                pruned = compacted + pruned[len(prefix) :]
+                prefix = compacted
+        checkpoint["channel_values"]["messages"] = pruned
+        metadata = {**metadata, "interaction_start": len(prefix)}
+
+        result = super().put(config, checkpoint, metadata, new_versions)
+        self._set_prune_state(
+            thread_id,
+            checkpoint_ns,
+            _prune_state(checkpoint["id"], messages or [], start, pruned, prefix),
+        )
+
+        # Remove previous checkpoints
+        if not self.retain_history:
+            self._record_checkpoint(
+                thread_id, checkpoint_ns, checkpoint["id"], parent_checkpoint_id
+            )
+            self._submit_background(self.prune_history, thread_id, checkpoint_ns)
+
+        return result
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        checkpoint_tuple = super().get_tuple(config)
+        metadata = checkpoint_tuple.metadata if checkpoint_tuple else None
+        if metadata and "interaction_start" in metadata:
+            # Messages loaded from a checkpoint are already pruned up to the
+            # current interaction. A state saved by put for the same checkpoint
+            # also covers them, along with the unpruned messages put was given.
+            configurable = checkpoint_tuple.config["configurable"]
+            namespace = (configurable["thread_id"], configurable["checkpoint_ns"])
+            state = self._prune_states.get(namespace)
+            if state is None or state.checkpoint_id != configurable["checkpoint_id"]:
+                messages = (
+                    checkpoint_tuple.checkpoint["channel_values"].get("messages") or []
+                )
+                start = metadata["interaction_start"]
+                self._set_prune_state(
+                    *namespace,
+                    _prune_state(
+                        configurable["checkpoint_id"],
+                        messages,
+                        start,
+                        messages,
+                        messages[:start],
+                    ),
+                )
+        return checkpoint_tuple
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+    ) -> None:
+        super().put_writes(config, writes, task_id)
+        if not self.retain_history and writes:
+            thread_id = config["configurable"]["thread_id"]
+            checkpoint_ns = config["configurable"]["checkpoint_ns"]
+            checkpoint_id = config["configurable"]["checkpoint_id"]
+            key = _make_s3_write_batch_key(
+                thread_id, checkpoint_ns, checkpoint_id, task_id
+            )
+            with self._history_lock:
+                history = self._history.setdefault((thread_id, checkpoint_ns), {})
+                history.setdefault(checkpoint_id, _StoredCheckpoint()).keys.add(key)
+
+    def delete_checkpoints(self, thread_id: str, wait: bool = True) -> None:
+        with self._history_lock:
+            for namespace in [n for n in self._prune_states if n[0] == thread_id]:
+                del self._prune_states[namespace]
+            for namespace in [n for n in self._history if n[0] == thread_id]:
+                del self._history[namespace]
+            self._listed_namespaces = {
+                n for n in self._listed_namespaces if n[0] != thread_id
+            }
+        super().delete_checkpoints(thread_id, wait)
+
+    def prune_history(self, thread_id: str, checkpoint_ns: str) -> None:
+        """
+        Deletes the checkpoints in a namespace that are no longer retained.
+        """
+        namespace = (thread_id, checkpoint_ns)
+        if namespace in self._conflicted:
+            # What this checkpointer knows of the namespace may include the
+            # checkpoints of the writer that won
+            return
+        if namespace not in self._listed_namespaces:
+            self._list_history(thread_id, checkpoint_ns)
+        if self.offload_threshold is not None:
+            self._load_content_references(thread_id)
+
+        with self._history_lock:
+            history = self._history.get(namespace, {})
+            expired = self._expired_checkpoints(history)
+            keys = sorted(key for ck_id in expired for key in history[ck_id].keys)
+
+        self._delete_keys(keys)
+
+        with self._content_lock:
+            with self._history_lock:
+                released = set()
+                for ck_id in expired:
+                    stored = history.pop(ck_id, None)
+                    if stored is not None:
+                        released.update(*stored.content.values())
+                released -= self._referenced_content(thread_id)
+            # Deleted under the lock, so that a put can't refer to it again
+            # in between
+            self._known_content -= released
+            self._delete_keys(sorted(released))
+
+    def _record_conflict(self, thread_id: str, checkpoint_ns: str) -> None:
+        super()._record_conflict(thread_id, checkpoint_ns)
+        namespace = (thread_id, checkpoint_ns)
+        with self._history_lock:
+            self._prune_states.pop(namespace, None)
+            self._history.pop(namespace, None)
+            self._listed_namespaces.discard(namespace)
+
+    def _record_content_references(
+        self,
+        thread_id: str,
+        checkpoint_ns: str,
+        checkpoint_id: str,
+        key: str,
+        content_keys: Set[str],
+    ) -> None:
+        if self.retain_history:
+            return
+        with self._history_lock:
+            history = self._history.setdefault((thread_id, checkpoint_ns), {})
+            stored = history.setdefault(checkpoint_id, _StoredCheckpoint())
+            stored.keys.add(key)
+            stored.content[key] = set(content_keys)
+
+    def _referenced_content(self, thread_id: str) -> Set[str]:
+        """
+        Returns the offloaded content the thread's known checkpoints and writes
+        refer to. Call with the history lock held.
+        """
+        return {
+            content_key
+            for namespace, history in self._history.items()
+            if namespace[0] == thread_id
+            for stored in history.values()
+            for content_keys in stored.content.values()
+            for content_key in content_keys
+        }
+
+    def _load_content_references(self, thread_id: str) -> None:
+        """
+        Reads the offloaded content referred to by the thread's checkpoints and
+        writes that this checkpointer only knows of from a listing.
+        """
+        with self._history_lock:
+            unknown = [
+                (stored, key)
+                for namespace, history in self._history.items()
+                if namespace[0] == thread_id
+                for stored in history.values()
+                for key in stored.keys
+                if key not in stored.content
+            ]
+        if not unknown:
+            return
+
+        workers = min(self.write_concurrency, len(unknown))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            references = list(
+                executor.map(lambda item: self._get_content_keys(item[1]), unknown)
+            )
+        with self._history_lock:
+            for (stored, key), content_keys in zip(unknown, references):
+                stored.content.setdefault(key, content_keys)
+
+    def _get_content_keys(self, key: str) -> Set[str]:
+        try:
+            body = self._get_object_body(key)
+        except ClientError as e:
+            if e.response["Error"]["Code"] == "NoSuchKey":
+                return set()
+            raise
+        return set(_decode_envelope(body).get("content_keys", []))
+
+    def _delete_keys(self, keys: List[str]) -> None:
+        for i in range(0, len(keys), 1000):  # S3's limit per request
+            self.s3.delete_objects(
+                Bucket=self.bucket_name,
+                Delete={"Objects": [{"Key": key} for key in keys[i : i + 1000]]},
+            )
+
+    def _set_prune_state(
+        self, thread_id: str, checkpoint_ns: str, state: _PruneState
+    ) -> None:
+        with self._history_lock:
+            self._prune_states[(thread_id, checkpoint_ns)] = state
+            self._prune_states.move_to_end((thread_id, checkpoint_ns))
+            while len(self._prune_states) > MAX_PRUNE_STATES:
+                self._prune_states.popitem(last=False)
+
+    def _record_checkpoint(
+        self,
+        thread_id: str,
+        checkpoint_ns: str,
+        checkpoint_id: str,
+        parent_checkpoint_id: Optional[str],
+    ) -> None:
+        head = self._chain_heads.get((thread_id, checkpoint_ns))
+        delta_depth = head[1] if head and head[0] == checkpoint_id else 0
+        key = _make_s3_checkpoint_key(thread_id, checkpoint_ns, checkpoint_id)
+        with self._history_lock:
+            history = self._history.setdefault((thread_id, checkpoint_ns), {})
+            stored = history.setdefault(checkpoint_id, _StoredCheckpoint())
+            stored.keys.add(key)
+            stored.delta_depth = delta_depth
+            if delta_depth > 0 and parent_checkpoint_id:
+                parent = history.setdefault(parent_checkpoint_id, _StoredCheckpoint())
+                parent.delta_depth = delta_depth - 1
+
+    def _list_history(self, thread_id: str, checkpoint_ns: str) -> None:
+        prefix = _make_s3_namespace_prefix(thread_id, checkpoint_ns)
+        latest_key = _make_s3_latest_key(thread_id, checkpoint_ns)
+        paginator = self.s3.get_paginator("list_objects_v2")
+        pages = paginator.paginate(Bucket=self.bucket_name, Prefix=f"{prefix}/")
+        keys = [
+            item["Key"]
+            for item in pages.search("Contents")
+            if item is not None and item["Key"] != latest_key
+        ]
+
+        with self._history_lock:
+            history = self._history.setdefault((thread_id, checkpoint_ns), {})
+            for key in keys:
+                checkpoint_id = key[len(prefix) + 1 :].split("/")[0]
+                history.setdefault(checkpoint_id, _StoredCheckpoint()).keys.add(key)
+            self._listed_namespaces.add((thread_id, checkpoint_ns))
 
-        return super().put(config, checkpoint, metadata, new_versions)
+    def _expired_checkpoints(self, history: Dict[str, _StoredCheckpoint]) -> List[str]:
+        """
+        Returns the IDs of the checkpoints that are no longer retained, oldest
+        first. Checkpoints are retained back to the nearest full snapshot, and
+        a checkpoint of unknown depth is assumed to be a delta when deltas are
+        enabled.
+        """
+        ids = sorted(history, reverse=True)
+        retained = min(self.retained_checkpoints, len(ids))
+        while retained < len(ids):
+            depth = history[ids[retained - 1]].delta_depth
+            if depth == 0 or (depth is None and not self.snapshot_interval):
+                break
+            retained += 1
+        return ids[retained:][::-1]
@@ -0,0 +1,184 @@
+import io
+import json
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+)
+from persistence.local_checkpoint_store import LocalCheckpointStore
+from persistence.s3_checkpointer import (
+    _make_s3_checkpoint_key,
+    _make_s3_checkpoint_prefix,
+    _make_s3_latest_key,
+    _namespace_val,
+)
+from persistence.selective_checkpointer import SelectiveCheckpointer
+
+
+class TieredCheckpointer(SelectiveCheckpointer):
+    """
+    SelectiveCheckpointer that writes checkpoints to a local store first and
+    uploads them to S3 in the background, in the order they were written.
+    flush waits for the uploads to finish, and should be called before the
+    container can be frozen or reused by another request.
+
+    A namespace's local copy is only read once it is known to be current:
+    either this checkpointer wrote to it, or the local copy of its latest
+    pointer matches the one in S3. Otherwise (e.g., in a cold container, or
+    when another container saved a newer checkpoint), checkpoints are read
+    from S3. Objects missing from the local store are always read from S3.
+
+    With conditional_writes, a latest pointer upload that loses a race with
+    another writer drops the thread's local copy, along with the uploads and
+    pruning still queued for the namespace, and flush raises the
+    CheckpointConflictError. Saving to the namespace raises it too, until the
+    thread is read again. Since uploads run in the background, a conflict may
+    only be found by flush, after the turn's answer has already been sent.
+
+    Args:
+        local_store: The local store, usually shared by every checkpointer in
+            the process
+    """
+
+    def __init__(
+        self,
+        bucket_name: str,
+        local_store: LocalCheckpointStore,
+        **kwargs,
+    ) -> None:
+        super().__init__(bucket_name, **kwargs)
+        self.local_store = local_store
+        # Namespaces whose local copy is current
+        self._local_namespaces: Set[Tuple[str, str]] = set()
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        result = super().put(config, checkpoint, metadata, new_versions)
+        configurable = result["configurable"]
+        self._local_namespaces.add(
+            (configurable["thread_id"], configurable["checkpoint_ns"])
+        )
+        return result
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        # Listing reads S3, so wait for it to hold every checkpoint
+        self.flush()
+        return super().list(config, filter=filter, before=before, limit=limit)
+
+    def list_metadata(self, config: RunnableConfig, **kwargs) -> Iterator[Any]:
+        self.flush()
+        return super().list_metadata(config, **kwargs)
+
+    def delete_checkpoints(self, thread_id: str, wait: bool = True) -> None:
+        # Let pending uploads finish so that none lands after the deletion
+        self.flush()
+        self.local_store.delete_thread(thread_id)
+        self._local_namespaces = {
+            n for n in self._local_namespaces if n[0] != thread_id
+        }
+        super().delete_checkpoints(thread_id, wait)
+
+    def _put_object(
+        self,
+        key: str,
+        body: bytes,
+        content_type: Optional[str] = None,
+        metadata: Optional[Dict[str, str]] = None,
+    ) -> None:
+        self._track_write(key)
+        version = self.local_store.put(key, body, content_type, metadata)
+        self._submit_background(self._upload, key, version)
+
+    def _upload(self, key: str, version: int) -> None:
+        parts = key.split("/")
+        if (parts[1], _namespace_val(parts[2])) in self._conflicted:
+            # Saved to the losing branch of a conflict before it was found
+            return
+        obj = self.local_store.get(key)
+        if obj is None or obj.version != version:
+            # Replaced (e.g., a latest pointer) or deleted since, so a later
+            # upload covers it
+            return
+        super()._put_object(key, obj.body, obj.content_type, obj.metadata)
+        self.local_store.mark_flushed(key, version)
+
+    def _record_conflict(self, thread_id: str, checkpoint_ns: str) -> None:
+        # The local copy holds the losing checkpoints, and uploads still queued
+        # for them find nothing to upload. Read the thread from S3 from now on.
+        super()._record_conflict(thread_id, checkpoint_ns)
+        self.local_store.delete_thread(thread_id)
+        self._local_namespaces = {
+            n for n in self._local_namespaces if n[0] != thread_id
+        }
+
+    def _delete_keys(self, keys: List[str]) -> None:
+        self.local_store.delete(keys)
+        super()._delete_keys(keys)
+
+    def _get_latest_pointer(
+        self, thread_id: str, checkpoint_ns: str
+    ) -> Optional[Dict[str, Any]]:
+        namespace = (thread_id, checkpoint_ns)
+        local = self.local_store.get(_make_s3_latest_key(thread_id, checkpoint_ns))
+        local_pointer = _parse_pointer(local.body) if local else None
+        if namespace in self._local_namespaces and local_pointer is not None:
+            return local_pointer
+
+        pointer = super()._get_latest_pointer(thread_id, checkpoint_ns)
+        if pointer is not None and pointer == local_pointer:
+            self._local_namespaces.add(namespace)
+        return pointer
+
+    def _get_checkpoint_object(
+        self, thread_id: str, checkpoint_ns: str, checkpoint_id: str
+    ) -> Optional[Dict[str, Any]]:
+        if (thread_id, checkpoint_ns) in self._local_namespaces:
+            key = _make_s3_checkpoint_key(thread_id, checkpoint_ns, checkpoint_id)
+            local = self.local_store.get(key)
+            if local is not None:
+                return {"Body": io.BytesIO(local.body)}
+        return super()._get_checkpoint_object(thread_id, checkpoint_ns, checkpoint_id)
+
+    def _get_object_body(self, key: str) -> bytes:
+        parts = key.split("/")
+        if (parts[1], _namespace_val(parts[2])) in self._local_namespaces:
+            local = self.local_store.get(key)
+            if local is not None:
+                return local.body
+        return super()._get_object_body(key)
+
+    def _list_write_keys(
+        self, thread_id: str, checkpoint_ns: str, checkpoint_id: str
+    ) -> List[str]:
+        # A checkpoint in the local copy has every write made to it from this
+        # container, since writes follow the checkpoint they belong to
+        key = _make_s3_checkpoint_key(thread_id, checkpoint_ns, checkpoint_id)
+        if (thread_id, checkpoint_ns) in self._local_namespaces and (
+            key in self.local_store
+        ):
+            prefix = _make_s3_checkpoint_prefix(thread_id, checkpoint_ns, checkpoint_id)
+            return self.local_store.keys(f"{prefix}/writes/")
+        return super()._list_write_keys(thread_id, checkpoint_ns, checkpoint_id)
+
+
+def _parse_pointer(body: bytes) -> Optional[Dict[str, Any]]:
+    try:
+        data = json.loads(body.decode("utf-8"))
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
@@ -0,0 +1,103 @@
+import sqlite3
+import threading
+from array import array
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+DEFAULT_EMBEDDING_CACHE_SIZE = 256
+DEFAULT_EMBEDDING_DISK_SIZE = 10000
+
+EmbeddingKey = Tuple[str, str]
+
+
+class EmbeddingCache:
+    """
+    A thread-safe cache of query embeddings keyed by (model_id, text): a
+    size-bounded in-memory LRU, optionally backed by an SQLite file that
+    persists across warm invocations. Vectors found on disk are promoted to
+    memory, and the least recently stored ones are dropped from disk past
+    max_disk_size.
+
+    Any object with the same get and put methods can be used in its place.
+
+    Args:
+        max_size: The number of vectors to keep in memory
+        path: An optional SQLite file to also keep vectors in
+        max_disk_size: The number of vectors to keep in the SQLite file
+    """
+
+    def __init__(
+        self,
+        max_size: int = DEFAULT_EMBEDDING_CACHE_SIZE,
+        path: Optional[str] = None,
+        max_disk_size: int = DEFAULT_EMBEDDING_DISK_SIZE,
+    ):
+        self.max_size = max_size
+        self.path = path
+        self.max_disk_size = max_disk_size
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[EmbeddingKey, List[float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                """
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    model_id TEXT NOT NULL,
+                    text TEXT NOT NULL,
+                    vector BLOB NOT NULL,
+                    PRIMARY KEY (model_id, text)
+                )
+                """
+            )
+            self._db.commit()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, model_id: str, text: str) -> Optional[List[float]]:
+        key = (model_id, text)
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is not None:
+                self._entries.move_to_end(key)
+            elif self._db is not None:
+                row = self._db.execute(
+                    "SELECT vector FROM embeddings WHERE model_id = ? AND text = ?",
+                    key,
+                ).fetchone()
+                if row is not None:
+                    vector = array("f", row[0]).tolist()
+                    self._remember(key, vector)
+            if vector is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return list(vector)
+
+    def put(self, model_id: str, text: str, vector: List[float]) -> None:
+        key = (model_id, text)
+        vector = list(vector)
+        with self._lock:
+            self._remember(key, vector)
+            if self._db is not None:
+                with self._db:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO embeddings (model_id, text, vector) "
+                        "VALUES (?, ?, ?)",
+                        (model_id, text, array("f", vector).tobytes()),
+                    )
+                    self._db.execute(
+                        "DELETE FROM embeddings WHERE rowid <= "
+                        "(SELECT MAX(rowid) FROM embeddings) - ?",
+                        (self.max_disk_size,),
+                    )
+
+    def _remember(self, key: EmbeddingKey, vector: List[float]) -> None:
+        self._entries[key] = vector
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
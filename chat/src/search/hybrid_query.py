@@ -1,4 +1,4 @@
-from typing import Any
+from typing import Any, List, Optional
 
 
 def filter(query: dict, facets: list = None):
@@ -31,8 +31,25 @@ def hybrid_query(
     vector_field: str = "embedding",
     k: int = 40,
     facets: list = None,
+    query_vector: Optional[List[float]] = None,
     **kwargs: Any,
 ):
+    if query_vector is not None:
+        # Search by a vector embedded ahead of time instead of having OpenSearch
+        # embed the query text
+        vector_query = {vector_field: {"k": k, "vector": query_vector}}
+        vector_clause = {"knn": vector_query}
+    else:
+        vector_clause = {
+            "neural": {
+                vector_field: {
+                    "k": k,
+                    "model_id": model_id,
+                    "query_text": query,
+                }
+            }
+        }
+
     result = {
         "size": kwargs.get("size", 20),
         "_source": {
@@ -92,18 +109,7 @@ def hybrid_query(
                         },
                         facets
                     ),
-                    filter(
-                        {
-                            "neural": {
-                                vector_field: {
-                                    "k": k,
-                                    "model_id": model_id,
-                                    "query_text": query,
-                                }
-                            }
-                        },
-                        facets
-                    ),
+                    filter(vector_clause, facets),
                 ]
             },
         },
@@ -1,12 +1,38 @@
+import copy
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from langchain_core.documents import Document
 from langchain_core.vectorstores import VectorStore
-from opensearchpy import OpenSearch
-from typing import Any, List, Tuple
+from opensearchpy import OpenSearch, TransportError
+from typing import Any, Dict, List, Optional, Tuple
+from search.embedding_cache import EmbeddingCache
 from search.hybrid_query import hybrid_query, filter
+from search.search_result_cache import SearchResultCache, search_cache_key
+
+# The most recent uncached queries remembered, so that one searched again can
+# be embedded for the next time
+MAX_SEEN_QUERIES = 1024
 
 
 class OpenSearchNeuralSearch(VectorStore):
-    """Read-only OpenSearch vectorstore with neural search."""
+    """Read-only OpenSearch vectorstore with neural search.
+
+    If given a result_cache, repeated similarity searches with the same
+    normalized query, facets, k, and options are answered from it. Pass
+    use_cache=False to a search to bypass it.
+
+    If given an embedding_cache, queries whose embeddings are cached are
+    searched with a knn clause, instead of a neural clause that has OpenSearch
+    embed the query on every search. Other queries are still searched with a
+    neural clause. A query searched again before its embedding is cached is
+    also embedded with the model's predict API in the background, so that the
+    search doesn't wait on a second request, and queries that are only
+    searched once are only embedded once. Call wait_for_embeddings before the
+    invocation returns.
+
+    batch_similarity_search runs several queries in one _msearch request.
+    """
 
     def __init__(
         self,
@@ -17,6 +43,8 @@ class OpenSearchNeuralSearch(VectorStore):
         vector_field: str = "embedding",
         search_pipeline: str = None,
         text_field: str = "id",
+        result_cache: Optional[SearchResultCache] = None,
+        embedding_cache: Optional[EmbeddingCache] = None,
         **kwargs: Any,
     ):
         self.client = client or OpenSearch(
@@ -27,6 +55,16 @@ class OpenSearchNeuralSearch(VectorStore):
         self.vector_field = vector_field
         self.search_pipeline = search_pipeline
         self.text_field = text_field
+        self.result_cache = result_cache
+        self.embedding_cache = embedding_cache
+        self._embedding_executor = (
+            ThreadPoolExecutor(max_workers=1, thread_name_prefix="query-embedding")
+            if embedding_cache is not None
+            else None
+        )
+        self._embedding_texts = set()
+        self._seen_queries: OrderedDict[str, None] = OrderedDict()
+        self._embedding_lock = threading.Lock()
 
     def similarity_search(
         self, query: str, k: int = 10, facets: list = None, **kwargs: Any
@@ -36,27 +74,121 @@ class OpenSearchNeuralSearch(VectorStore):
         return [doc[0] for doc in docs_with_scores]
 
     def similarity_search_with_score(
-        self, query: str, k: int = 10, facets: list = None, **kwargs: Any
+        self,
+        query: str,
+        k: int = 10,
+        facets: list = None,
+        use_cache: bool = True,
+        **kwargs: Any,
     ) -> List[Tuple[Document, float]]:
         """Return docs most similar to query."""
+        cache = self.result_cache if use_cache else None
+        if cache is not None:
+            key = search_cache_key(query, k, facets, **kwargs)
+            cached = cache.get(key)
+            if cached is not None:
+                return cached
+
+        query_vector = self._query_vectors([query])[0]
+        response = self.client.search(
+            index=self.index,
+            body=self._hybrid_dsl(query, query_vector, k, facets, **kwargs),
+            params=self._search_params(),
+        )
+        documents_with_scores = self._documents_with_scores(response)
+
+        if cache is not None:
+            cache.put(key, documents_with_scores)
+        return documents_with_scores
+
+    def batch_similarity_search(
+        self, queries: List[str], k: int = 10, facets: list = None, **kwargs: Any
+    ) -> List[List[Document]]:
+        """Return the docs most similar to each query, searched in one request."""
+        results = self.batch_similarity_search_with_score(
+            queries, k, facets=facets, **kwargs
+        )
+        return [[doc[0] for doc in docs_with_scores] for docs_with_scores in results]
+
+    def batch_similarity_search_with_score(
+        self,
+        queries: List[str],
+        k: int = 10,
+        facets: list = None,
+        use_cache: bool = True,
+        **kwargs: Any,
+    ) -> List[List[Tuple[Document, float]]]:
+        """Return the docs most similar to each query, in the order of the queries.
+
+        Queries not answered by the result cache are sent together in a single
+        _msearch request, and queries that normalize to the same search are
+        only sent once. Repeated queries missing from the embedding cache are
+        embedded together in one background predict request. A failed query
+        raises a
+        TransportError, as it would from similarity_search_with_score.
+        """
+        cache = self.result_cache if use_cache else None
+        results: List[Optional[List[Tuple[Document, float]]]] = [None] * len(queries)
+        pending: Dict[str, List[int]] = {}
+        for i, query in enumerate(queries):
+            key = search_cache_key(query, k, facets, **kwargs)
+            if key not in pending and cache is not None:
+                results[i] = cache.get(key)
+            if results[i] is None:
+                pending.setdefault(key, []).append(i)
+
+        if pending:
+            pending_queries = [queries[indexes[0]] for indexes in pending.values()]
+            body = []
+            for query, query_vector in zip(
+                pending_queries, self._query_vectors(pending_queries)
+            ):
+                body.append({"index": self.index})
+                body.append(self._hybrid_dsl(query, query_vector, k, facets, **kwargs))
+            response = self.client.msearch(
+                index=self.index, body=body, params=self._search_params()
+            )
+            for (key, indexes), item in zip(pending.items(), response["responses"]):
+                if "error" in item:
+                    error = item["error"]
+                    raise TransportError(
+                        item.get("status", "N/A"), error.get("type"), error
+                    )
+                documents_with_scores = self._documents_with_scores(item)
+                if cache is not None:
+                    cache.put(key, documents_with_scores)
+                results[indexes[0]] = documents_with_scores
+                for i in indexes[1:]:
+                    results[i] = copy.deepcopy(documents_with_scores)
+        return results
+
+    def _hybrid_dsl(
+        self,
+        query: str,
+        query_vector: Optional[List[float]],
+        k: int,
+        facets: list = None,
+        **kwargs: Any,
+    ) -> dict:
         if facets is not None:
-            kwargs['facets'] = facets
-            
-        dsl = hybrid_query(
+            kwargs["facets"] = facets
+
+        return hybrid_query(
             query=query,
             model_id=self.model_id,
             vector_field=self.vector_field,
             k=k,
+            query_vector=query_vector,
             **kwargs,
         )
-        response = self.client.search(
-            index=self.index,
-            body=dsl,
-            params={"search_pipeline": self.search_pipeline}
-            if self.search_pipeline
-            else None,
-        )
-        documents_with_scores = [
+
+    def _search_params(self) -> Optional[dict]:
+        if self.search_pipeline:
+            return {"search_pipeline": self.search_pipeline}
+        return None
+
+    def _documents_with_scores(self, response: dict) -> List[Tuple[Document, float]]:
+        return [
             (
                 Document(
                     page_content=hit["_source"][self.text_field],
@@ -67,7 +199,60 @@ class OpenSearchNeuralSearch(VectorStore):
             for hit in response["hits"]["hits"]
         ]
 
-        return documents_with_scores
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Return the model's embeddings of the texts, from one predict request."""
+        response = self.client.transport.perform_request(
+            "POST",
+            f"/_plugins/_ml/_predict/text_embedding/{self.model_id}",
+            body={"text_docs": texts, "target_response": ["sentence_embedding"]},
+        )
+        return [
+            result["output"][0]["data"] for result in response["inference_results"]
+        ]
+
+    def wait_for_embeddings(self) -> None:
+        """Wait for the queries being embedded in the background to be cached."""
+        if self._embedding_executor is not None:
+            # The executor runs one task at a time, in order
+            self._embedding_executor.submit(lambda: None).result()
+
+    def _query_vectors(self, queries: List[str]) -> List[Optional[List[float]]]:
+        # Repeated cache misses are embedded off the request path, together in
+        # one predict request, for the next search. A query's first search
+        # only has OpenSearch embed it, for the neural clause.
+        if self.embedding_cache is None:
+            return [None] * len(queries)
+        vectors = [self.embedding_cache.get(self.model_id, query) for query in queries]
+        misses = [query for query, vector in zip(queries, vectors) if vector is None]
+        if misses:
+            self._embed_in_background(misses)
+        return vectors
+
+    def _embed_in_background(self, texts: List[str]) -> None:
+        with self._embedding_lock:
+            repeated = []
+            for text in dict.fromkeys(texts):
+                if text in self._seen_queries:
+                    self._seen_queries.move_to_end(text)
+                    if text not in self._embedding_texts:
+                        repeated.append(text)
+                else:
+                    self._seen_queries[text] = None
+                    if len(self._seen_queries) > MAX_SEEN_QUERIES:
+                        self._seen_queries.popitem(last=False)
+            self._embedding_texts.update(repeated)
+        if repeated:
+            self._embedding_executor.submit(self._cache_embeddings, repeated)
+
+    def _cache_embeddings(self, texts: List[str]) -> None:
+        try:
+            for text, vector in zip(texts, self.embed_queries(texts)):
+                self.embedding_cache.put(self.model_id, text, vector)
+        except Exception as e:
+            print(f"Could not embed queries: {e}")
+        finally:
+            with self._embedding_lock:
+                self._embedding_texts.difference_update(texts)
 
     def aggregations_search(
         self, agg_field: str, term_field: str = None, term: str = None, facets: list = None, **kwargs: Any
@@ -0,0 +1,111 @@
+import copy
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+from langchain_core.documents import Document
+
+DEFAULT_SEARCH_CACHE_SIZE = 128
+DEFAULT_SEARCH_CACHE_TTL = 300
+
+SearchResults = List[Tuple[Document, float]]
+
+
+def normalize_query(query: str) -> str:
+    # Only whitespace is normalized: query_string operators are case-sensitive,
+    # and so is matching on keyword fields like all_ids (e.g., accession numbers)
+    return " ".join(query.split())
+
+
+def _canonical_facets(facets: Optional[list]) -> list:
+    # Facets are ANDed together and a facet's values are ORed, so neither
+    # order changes the results
+    canonical = []
+    for facet in facets or []:
+        canonical.append(
+            {
+                field: sorted(values, key=str) if isinstance(values, list) else values
+                for field, values in facet.items()
+            }
+        )
+    return sorted(canonical, key=lambda f: json.dumps(f, sort_keys=True, default=str))
+
+
+def search_cache_key(
+    query: str, k: int, facets: Optional[list] = None, **kwargs: Any
+) -> str:
+    """
+    Returns a hash identifying a search by its normalized query text, facets,
+    k, and any other search options (e.g., size).
+    """
+    canonical = json.dumps(
+        {
+            "query": normalize_query(query),
+            "facets": _canonical_facets(facets),
+            "k": k,
+            "options": kwargs,
+        },
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class SearchResultCache:
+    """
+    A size-bounded, thread-safe LRU cache of search results, each kept for at
+    most ttl seconds.
+
+    Results are copied on the way in and out, since callers modify the
+    documents' metadata (e.g., to drop embeddings).
+    """
+
+    def __init__(
+        self,
+        max_size: int = DEFAULT_SEARCH_CACHE_SIZE,
+        ttl: float = DEFAULT_SEARCH_CACHE_TTL,
+    ):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, Tuple[float, SearchResults]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[SearchResults]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] >= self.ttl:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return copy.deepcopy(entry[1])
+
+    def put(self, key: str, results: SearchResults) -> None:
+        entry = (time.monotonic(), copy.deepcopy(results))
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
@@ -205,3 +205,20 @@ class TestSocketCallbackHandler(TestCase):
             mock.assert_called_once_with(response)
             self.assertEqual(self.handler.answers, ["Answer without metadata"])
             self.assertEqual(self.handler.accumulator, {})
+
+    @patch.dict("os.environ", {"METRICS_LOG_GROUP": "metrics"})
+    @patch("agent.callbacks.metrics.ensure_log_stream_exists", return_value=True)
+    @patch("agent.callbacks.metrics.log_client")
+    def test_log_metrics_includes_checkpoint_requests(self, log_client, _):
+        handler = MetricsCallbackHandler("stream", extra_data={"ref": self.ref})
+        handler.accumulator = {"input_tokens": 10}
+        handler.checkpoint_requests = {"get": {"calls": 3}}
+        handler.log_metrics()
+
+        log_events = log_client.return_value.put_log_events.call_args.kwargs[
+            "logEvents"
+        ]
+        message = json.loads(log_events[0]["message"])
+        self.assertEqual(message["token_counts"], {"input_tokens": 10})
+        self.assertEqual(message["checkpoint_requests"], {"get": {"calls": 3}})
+        self.assertEqual(message["ref"], self.ref)
@@ -1,3 +1,4 @@
+import json
 import unittest
 from unittest import TestCase
 from unittest.mock import MagicMock
@@ -132,6 +133,37 @@ class TestSocketCallbackHandler(TestCase):
             {"type": "search_result", "ref": self.ref, "message": expected_message}
         )
 
+    def test_on_tool_end_search_many(self):
+        class MockToolMessage:
+            def __init__(self, name, content):
+                self.name = name
+                self.content = content
+
+        content = [
+            {
+                "query": "masks",
+                "documents": [{"id": 1, "title": "Result 1", "description": "text"}],
+                "duplicate_ids": [],
+            },
+            {
+                "query": "festivals",
+                "documents": [{"id": 2, "title": "Result 2"}],
+                "duplicate_ids": [1],
+            },
+        ]
+
+        output = MockToolMessage("search_many", json.dumps(content))
+        self.handler.on_tool_end(output)
+
+        fields = ("id", "title", "visibility", "work_type", "thumbnail")
+        expected_message = [
+            {field: doc.get(field) for field in fields}
+            for doc in (content[0]["documents"][0], content[1]["documents"][0])
+        ]
+        self.mock_socket.send.assert_called_once_with(
+            {"type": "search_result", "ref": self.ref, "message": expected_message}
+        )
+
     def test_on_tool_end_aggregate(self):
         class MockToolMessage:
             def __init__(self, name, content):
@@ -1,6 +1,7 @@
 from unittest import TestCase
 from unittest.mock import patch
 
+from agent.callbacks.metrics import MetricsCallbackHandler
 from agent.search_agent import SearchAgent
 from langchain_core.language_models.fake_chat_models import FakeListChatModel
 from langchain_core.language_models.fake_chat_models import FakeMessagesListChatModel
@@ -119,4 +120,43 @@ class TestSearchAgent(TestCase):
         self.assertEqual(result_3["messages"][-1].content, "fresh response")
 
         # Verify delete_checkpoints was called
-        memory_saver.delete_checkpoints.assert_called_once_with("test_ref")
+        memory_saver.delete_checkpoints.assert_called_once_with("test_ref", wait=False)
+
+    @patch("agent.search_agent.checkpoint_saver")
+    def test_search_agent_reports_checkpoint_requests(self, mock_create_saver):
+        memory_saver = MemorySaver()
+        from unittest.mock import Mock
+
+        memory_saver.metrics = Mock()
+        memory_saver.metrics.snapshot.return_value = {"put": {"calls": 2}}
+        mock_create_saver.return_value = memory_saver
+
+        metrics = MetricsCallbackHandler()
+        chat_model = FakeListChatModel(responses=["response"])
+        search_agent = SearchAgent(model=chat_model, metrics=metrics)
+        search_agent.invoke(question="Question?", ref="test_ref")
+
+        # The counts cover this invocation only
+        memory_saver.metrics.reset.assert_called_once()
+        self.assertEqual(metrics.checkpoint_requests, {"put": {"calls": 2}})
+
+    @patch("agent.search_agent.checkpoint_saver")
+    def test_search_agent_keeps_invoke_error_when_flush_fails(self, mock_create_saver):
+        memory_saver = MemorySaver()
+        from unittest.mock import Mock
+
+        memory_saver.flush = Mock(side_effect=RuntimeError("flush failed"))
+        mock_create_saver.return_value = memory_saver
+
+        chat_model = FakeListChatModel(responses=["response"])
+        search_agent = SearchAgent(model=chat_model)
+        with patch.object(
+            search_agent, "_invoke", side_effect=ValueError("invoke failed")
+        ):
+            with self.assertRaisesRegex(ValueError, "invoke failed"):
+                search_agent.invoke(question="Question?", ref="test_ref")
+        memory_saver.flush.assert_called_once()
+
+        # Without an earlier error, a failed flush is raised
+        with self.assertRaisesRegex(RuntimeError, "flush failed"):
+            search_agent.invoke(question="Question?", ref="test_ref")
@@ -1,3 +1,4 @@
+import json
 import unittest
 from langchain_core.messages.base import BaseMessage
 from langchain_core.messages.system import SystemMessage
@@ -41,6 +42,28 @@ class TestSearchWorkflow(unittest.TestCase):
         result = self.workflow.should_continue(state)
         self.assertEqual(result, END)
 
+    def test_summarize_search_many(self):
+        doc = {"id": "doc1", "title": "Mask", "embedding": [0.1]}
+        doc.update({field: [] for field in ("subject", "creator", "contributor", "genre")})
+        content = json.dumps(
+            [{"query": "masks", "documents": [doc], "duplicate_ids": ["doc2"]}]
+        )
+        message = FakeMessage(content=content, name="search_many")
+        result = self.workflow.summarize(SearchAgentState(messages=[message]))
+
+        summarized = json.loads(result["messages"][-1].content)
+        self.assertEqual(summarized[0]["query"], "masks")
+        self.assertEqual(summarized[0]["duplicate_ids"], ["doc2"])
+        self.assertEqual(summarized[0]["documents"][0]["id"], "doc1")
+        self.assertEqual(summarized[0]["documents"][0]["title"], "Mask")
+        self.assertNotIn("embedding", summarized[0]["documents"][0])
+
+    def test_summarize_tool_error(self):
+        content = json.dumps({"error": "Test error"})
+        message = FakeMessage(content=content, name="search_many")
+        result = self.workflow.summarize(SearchAgentState(messages=[message]))
+        self.assertEqual(result["messages"][-1].content, content)
+
     def test_call_model(self):
         state = SearchAgentState(messages=[FakeMessage(content="User input")])
         result = self.workflow.call_model(state)
@@ -59,6 +82,27 @@ class TestSearchWorkflow(unittest.TestCase):
         self.assertEqual(len(result["messages"]), 1)
         self.assertEqual(result["messages"][0].content, "Mock Response")
 
+    def test_call_model_loads_messages(self):
+        received = []
+
+        class RecordingModel:
+            def invoke(self, messages):
+                received.extend(messages)
+                return SystemMessage(content="Mock Response")
+
+        workflow = SearchWorkflow(
+            model=RecordingModel(),
+            system_message="Test system message",
+            load_messages=lambda messages: [
+                FakeMessage(content=m.content.upper()) for m in messages
+            ],
+        )
+        state = SearchAgentState(messages=[FakeMessage(content="stored")])
+        workflow.call_model(state)
+        self.assertEqual([m.content for m in received[1:]], ["STORED"])
+        # The graph state is left as it was
+        self.assertEqual(state["messages"][0].content, "stored")
+
     def test_create_facets_context(self):
         facets = [
             {"subject.label": ["Nigeria", "Ghana"]},
@@ -2,26 +2,43 @@ from unittest import TestCase
 from unittest.mock import patch, MagicMock
 import json
 
-from agent.tools import discover_fields, search, aggregate, get_keyword_fields
+from agent.tools import (
+    KEYWORD_FIELDS_MIN_REFRESH,
+    KEYWORD_FIELDS_TTL,
+    discover_fields,
+    search,
+    search_many,
+    aggregate,
+    get_keyword_fields,
+    reset_keyword_fields,
+)
 from test.fixtures.opensearch import TOP_PROPERTIES
 
+MAPPING = {
+    "index_name": {
+        "mappings": {
+            "properties": {
+                "field1": {"type": "keyword"},
+                "field3": {"properties": {"subfield1": {"type": "keyword"}}},
+            }
+        }
+    }
+}
+
 
 class TestTools(TestCase):
+    def setUp(self):
+        reset_keyword_fields()
+
+    def mock_mapping(self, mock_opensearch, mapping=MAPPING):
+        mock_opensearch.return_value.index = "index_name"
+        mock_opensearch.return_value.client.indices.get_mapping.return_value = mapping
+        return mock_opensearch.return_value.client.indices.get_mapping
+
     @patch("agent.tools.opensearch_vector_store")
     def test_discover_fields(self, mock_opensearch):
         # Mock the OpenSearch response
-        mock_client = MagicMock()
-        mock_client.indices.get_mapping.return_value = {
-            "index_name": {
-                "mappings": {
-                    "properties": {
-                        "field1": {"type": "keyword"},
-                        "field3": {"properties": {"subfield1": {"type": "keyword"}}},
-                    }
-                }
-            }
-        }
-        mock_opensearch.return_value.client = mock_client
+        self.mock_mapping(mock_opensearch)
 
         # Pass required parameters based on the tool's schema
         response = discover_fields.invoke(
@@ -29,6 +46,19 @@ class TestTools(TestCase):
         )  # Assuming query is the required parameter
         self.assertEqual(response, ["field1", "field3.subfield1"])
 
+    @patch("agent.tools.time.monotonic", return_value=1000.0)
+    @patch("agent.tools.opensearch_vector_store")
+    def test_discover_fields_cached(self, mock_opensearch, mock_monotonic):
+        get_mapping = self.mock_mapping(mock_opensearch)
+        discover_fields.invoke({})
+        discover_fields.invoke({})
+        get_mapping.assert_called_once_with(index="index_name")
+
+        # The mapping is read again once the cached fields expire
+        mock_monotonic.return_value += KEYWORD_FIELDS_TTL
+        discover_fields.invoke({})
+        self.assertEqual(get_mapping.call_count, 2)
+
     @patch("agent.tools.opensearch_vector_store")
     def test_search(self, mock_opensearch):
         class MockDoc:
@@ -45,8 +75,51 @@ class TestTools(TestCase):
         response = search.invoke("test query")
         self.assertEqual(response, json.dumps(expected_results))
 
+    @patch("agent.tools.opensearch_vector_store")
+    def test_search_many(self, mock_opensearch):
+        def doc(id):
+            return MagicMock(metadata={"id": id, "embedding": [0.1]})
+
+        mock_opensearch.return_value.batch_similarity_search.return_value = [
+            [doc("doc1"), doc("doc2")],
+            [doc("doc2"), doc("doc3")],
+        ]
+        facets = [{"subject.label": ["Nigeria"]}]
+
+        response = search_many.invoke(
+            {"queries": ["masks", "festivals"], "facets": facets}
+        )
+
+        mock_opensearch.return_value.batch_similarity_search.assert_called_once_with(
+            ["masks", "festivals"], size=20, facets=facets
+        )
+        self.assertEqual(
+            json.loads(response),
+            [
+                {
+                    "query": "masks",
+                    "documents": [{"id": "doc1"}, {"id": "doc2"}],
+                    "duplicate_ids": [],
+                },
+                {
+                    "query": "festivals",
+                    "documents": [{"id": "doc3"}],
+                    "duplicate_ids": ["doc2"],
+                },
+            ],
+        )
+
+    @patch("agent.tools.opensearch_vector_store")
+    def test_search_many_exception(self, mock_opensearch):
+        mock_opensearch.return_value.batch_similarity_search.side_effect = Exception(
+            "Test error"
+        )
+        response = search_many.invoke({"queries": ["masks"]})
+        self.assertEqual(json.loads(response), {"error": "Test error"})
+
     @patch("agent.tools.opensearch_vector_store")
     def test_aggregate(self, mock_opensearch):
+        self.mock_mapping(mock_opensearch)
         mock_response = json.dumps({"aggregations": {"example_agg": {"buckets": []}}})
         mock_opensearch.return_value.aggregations_search.return_value = mock_response
 
@@ -59,6 +132,7 @@ class TestTools(TestCase):
 
     @patch("agent.tools.opensearch_vector_store")
     def test_aggregate_no_term(self, mock_opensearch):
+        self.mock_mapping(mock_opensearch)
         mock_response = json.dumps({"aggregations": {"all_docs": {"buckets": []}}})
         mock_opensearch.return_value.aggregations_search.return_value = mock_response
 
@@ -68,6 +142,25 @@ class TestTools(TestCase):
         self.assertIsInstance(response, str)
         self.assertEqual(json.loads(response), json.loads(mock_response))
 
+    @patch("agent.tools.time.monotonic", return_value=1000.0)
+    @patch("agent.tools.opensearch_vector_store")
+    def test_aggregate_unknown_field(self, mock_opensearch, mock_monotonic):
+        get_mapping = self.mock_mapping(mock_opensearch)
+        response = aggregate.invoke(
+            {"agg_field": "field2", "term_field": "", "term": ""}
+        )
+        self.assertIn("discover_fields", json.loads(response)["error"])
+        mock_opensearch.return_value.aggregations_search.assert_not_called()
+        get_mapping.assert_called_once()
+
+        # A field added to the mapping is found once the cache may be refreshed
+        get_mapping.return_value = {
+            "index_name": {"mappings": {"properties": {"field2": {"type": "keyword"}}}}
+        }
+        mock_monotonic.return_value += KEYWORD_FIELDS_MIN_REFRESH
+        aggregate.invoke({"agg_field": "field2", "term_field": "", "term": ""})
+        mock_opensearch.return_value.aggregations_search.assert_called_once()
+
     def test_get_keyword_fields(self):
         properties = {
             "field1": {"type": "keyword"},
@@ -225,6 +318,7 @@ class TestTools(TestCase):
         mock_client = MagicMock()
         mock_client.aggregations_search.side_effect = Exception("Test error")
         mock_opensearch.return_value = mock_client
+        self.mock_mapping(mock_opensearch)
 
         # Call aggregate with some parameters
         response = aggregate.invoke(
@@ -1,15 +1,23 @@
 import unittest
 from unittest.mock import patch, MagicMock
 import os
+import tempfile
 from opensearchpy import RequestsHttpConnection
+from persistence.checkpoint_cache import CheckpointCache
+from persistence.local_checkpoint_store import LocalCheckpointStore
 
 from core.setup import (
     chat_model,
+    checkpoint_cache,
     checkpoint_saver,
     prefix,
+    query_embedding_cache,
     opensearch_endpoint,
     opensearch_client,
     opensearch_vector_store,
+    reset_opensearch_clients,
+    search_result_cache,
+    wait_for_query_embeddings,
     websocket_client,
 )
 
@@ -35,6 +43,74 @@ class TestCheckpointSaver(unittest.TestCase):
         )
         self.assertEqual(result, mock_checkpointer.return_value)
 
+    @patch.dict(
+        os.environ,
+        {"CHECKPOINT_BUCKET_NAME": "test-bucket", "CHECKPOINT_CACHE_SIZE": "8"},
+    )
+    @patch("core.setup.SelectiveCheckpointer")
+    def test_checkpoint_saver_with_cache(self, mock_checkpointer):
+        checkpoint_saver()
+        checkpoint_saver()
+
+        first_cache = mock_checkpointer.call_args_list[0].kwargs["cache"]
+        second_cache = mock_checkpointer.call_args_list[1].kwargs["cache"]
+        self.assertIsInstance(first_cache, CheckpointCache)
+        self.assertEqual(first_cache.max_size, 8)
+        self.assertIs(first_cache, second_cache)
+
+    @patch.dict(
+        os.environ,
+        {
+            "CHECKPOINT_BUCKET_NAME": "test-bucket",
+            "CHECKPOINT_MAX_HISTORY_BYTES": "1000",
+        },
+    )
+    @patch("core.setup.SelectiveCheckpointer")
+    def test_checkpoint_saver_with_max_history_bytes(self, mock_checkpointer):
+        checkpoint_saver()
+        checkpoint_saver(max_history_bytes=500)
+
+        first_kwargs = mock_checkpointer.call_args_list[0].kwargs
+        second_kwargs = mock_checkpointer.call_args_list[1].kwargs
+        self.assertEqual(first_kwargs["max_history_bytes"], 1000)
+        self.assertEqual(second_kwargs["max_history_bytes"], 500)
+
+    @patch.dict(
+        os.environ,
+        {
+            "CHECKPOINT_BUCKET_NAME": "test-bucket",
+            "CHECKPOINT_OFFLOAD_BYTES": "4096",
+        },
+    )
+    @patch("core.setup.SelectiveCheckpointer")
+    def test_checkpoint_saver_with_offload_threshold(self, mock_checkpointer):
+        checkpoint_saver()
+        self.assertEqual(mock_checkpointer.call_args.kwargs["offload_threshold"], 4096)
+
+    @patch("core.setup.TieredCheckpointer")
+    def test_checkpoint_saver_with_local_store(self, mock_checkpointer):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "checkpoints.sqlite3")
+            env = {
+                "CHECKPOINT_BUCKET_NAME": "test-bucket",
+                "CHECKPOINT_LOCAL_STORE": path,
+            }
+            with patch.dict(os.environ, env):
+                result = checkpoint_saver()
+                checkpoint_saver()
+
+        first_kwargs = mock_checkpointer.call_args_list[0].kwargs
+        second_kwargs = mock_checkpointer.call_args_list[1].kwargs
+        self.assertIsInstance(first_kwargs["local_store"], LocalCheckpointStore)
+        self.assertEqual(first_kwargs["local_store"].path, path)
+        self.assertIs(first_kwargs["local_store"], second_kwargs["local_store"])
+        self.assertFalse(first_kwargs["retain_history"])
+        self.assertEqual(result, mock_checkpointer.return_value)
+
+    @patch.dict(os.environ, {"CHECKPOINT_CACHE_SIZE": "0"})
+    def test_checkpoint_cache_disabled(self):
+        self.assertIsNone(checkpoint_cache())
+
 
 class TestPrefix(unittest.TestCase):
     def test_prefix_with_env_prefix(self):
@@ -68,6 +144,12 @@ class TestOpenSearchEndpoint(unittest.TestCase):
 
 
 class TestOpenSearchClient(unittest.TestCase):
+    def setUp(self):
+        reset_opensearch_clients()
+
+    def tearDown(self):
+        reset_opensearch_clients()
+
     @patch("core.setup.boto3.Session")
     @patch("core.setup.AWS4Auth")
     @patch("core.setup.OpenSearch")
@@ -97,20 +179,46 @@ class TestOpenSearchClient(unittest.TestCase):
                 use_ssl=True,
                 connection_class=RequestsHttpConnection,
                 http_auth=mock_aws4auth.return_value,
+                pool_maxsize=10,
             )
 
-
-class TestOpenSearchVectorStore(unittest.TestCase):
     @patch("core.setup.boto3.Session")
     @patch("core.setup.AWS4Auth")
+    @patch("core.setup.OpenSearch")
+    def test_opensearch_client_reused(
+        self, mock_opensearch, mock_aws4auth, mock_session
+    ):
+        mock_opensearch.side_effect = lambda **kwargs: MagicMock()
+        env = {"AWS_REGION": "us-west-2", "OPENSEARCH_ENDPOINT": "test.amazonaws.com"}
+        with patch.dict(os.environ, env):
+            first = opensearch_client()
+            self.assertIs(opensearch_client(), first)
+            mock_session.assert_called_once()
+
+            # A changed setting builds a new client
+            with patch.dict(os.environ, {"OPENSEARCH_POOL_SIZE": "25"}):
+                pooled = opensearch_client()
+            self.assertIsNot(pooled, first)
+            self.assertEqual(mock_opensearch.call_args.kwargs["pool_maxsize"], 25)
+
+            reset_opensearch_clients()
+            self.assertIsNot(opensearch_client(), first)
+
+
+class TestOpenSearchVectorStore(unittest.TestCase):
+    def setUp(self):
+        reset_opensearch_clients()
+
+    def tearDown(self):
+        reset_opensearch_clients()
+
+    @patch("core.setup.query_embedding_cache")
+    @patch("core.setup.search_result_cache")
+    @patch("core.setup.opensearch_client")
     @patch("core.setup.OpenSearchNeuralSearch")
     def test_opensearch_vector_store_initialization(
-        self, mock_neural_search, mock_aws4auth, mock_session
+        self, mock_neural_search, mock_client, mock_cache, mock_embedding_cache
     ):
-        # Setup mock credentials
-        mock_credentials = MagicMock()
-        mock_session.return_value.get_credentials.return_value = mock_credentials
-
         with patch.dict(
             os.environ,
             {
@@ -120,25 +228,60 @@ class TestOpenSearchVectorStore(unittest.TestCase):
                 "ENV_PREFIX": "dev",
             },
         ):
-            _result = opensearch_vector_store()
-
-            # Verify AWS4Auth initialization
-            mock_aws4auth.assert_called_once_with(
-                region="us-west-2",
-                service="es",
-                refreshable_credentials=mock_credentials,
-            )
+            result = opensearch_vector_store()
+            self.assertIs(opensearch_vector_store(), result)
 
+            mock_client.assert_called_with(None)
             # Verify OpenSearchNeuralSearch initialization
             mock_neural_search.assert_called_once_with(
                 index="dev-dc-v2-work",
                 model_id="test-model",
                 endpoint="test.amazonaws.com",
-                connection_class=RequestsHttpConnection,
-                http_auth=mock_aws4auth.return_value,
+                client=mock_client.return_value,
                 text_field="id",
+                result_cache=mock_cache.return_value,
+                embedding_cache=mock_embedding_cache.return_value,
             )
 
+    @patch("core.setup.query_embedding_cache")
+    @patch("core.setup.search_result_cache")
+    @patch("core.setup.opensearch_client")
+    @patch("core.setup.OpenSearchNeuralSearch")
+    def test_wait_for_query_embeddings(
+        self, mock_neural_search, mock_client, mock_cache, mock_embedding_cache
+    ):
+        wait_for_query_embeddings()
+        with patch.dict(os.environ, {"OPENSEARCH_ENDPOINT": "test.amazonaws.com"}):
+            store = opensearch_vector_store()
+        wait_for_query_embeddings()
+        store.wait_for_embeddings.assert_called_once_with()
+
+    def test_search_result_cache(self):
+        with patch.dict(
+            os.environ, {"SEARCH_CACHE_SIZE": "16", "SEARCH_CACHE_TTL": "60"}
+        ):
+            cache = search_result_cache()
+        self.assertEqual(cache.max_size, 16)
+        self.assertEqual(cache.ttl, 60)
+
+        with patch.dict(os.environ, {"SEARCH_CACHE_SIZE": "0"}):
+            self.assertIsNone(search_result_cache())
+
+    def test_query_embedding_cache(self):
+        with patch.dict(os.environ, {"QUERY_EMBEDDING_CACHE_SIZE": ""}):
+            self.assertIsNone(query_embedding_cache())
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "query_embeddings.sqlite3")
+            env = {
+                "QUERY_EMBEDDING_CACHE_SIZE": "64",
+                "QUERY_EMBEDDING_CACHE_PATH": path,
+            }
+            with patch.dict(os.environ, env):
+                cache = query_embedding_cache()
+        self.assertEqual(cache.max_size, 64)
+        self.assertEqual(cache.path, path)
+
 
 class TestWebsocketClient(unittest.TestCase):
     @patch("core.setup.boto3.client")
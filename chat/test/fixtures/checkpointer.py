@@ -0,0 +1,13 @@
+from langchain_core.messages import AIMessage
+from langgraph.checkpoint.memory import MemorySaver
+from persistence.s3_checkpointer import CheckpointConflictError
+
+
+class AnsweredConflictSaver(MemorySaver):
+    """Loses a race to another message when the model's answer is saved."""
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        messages = checkpoint["channel_values"].get("messages", [])
+        if messages and isinstance(messages[-1], AIMessage):
+            raise CheckpointConflictError(config["configurable"]["thread_id"], "")
+        return super().put(config, checkpoint, metadata, new_versions)
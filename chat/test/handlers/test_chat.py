@@ -12,9 +12,12 @@ from handlers import chat
 from core.apitoken import ApiToken
 from core.event_config import CHAT_MODEL
 from core.websocket import Websocket
+from agent.callbacks.metrics import MetricsCallbackHandler
 from langchain_core.language_models.fake_chat_models import FakeListChatModel
 from langgraph.checkpoint.memory import MemorySaver
+from persistence.s3_checkpointer import CheckpointConflictError
 from test.fixtures.apitoken import TEST_SECRET, TEST_TOKEN
+from test.fixtures.checkpointer import AnsweredConflictSaver
 
 class MockClient:
     def __init__(self):
@@ -83,6 +86,45 @@ class TestHandler(TestCase):
         self.assertEqual(response["type"], "error")
         self.assertEqual(response["message"], "Question cannot be blank")
 
+    @patch.dict(os.environ, {"API_TOKEN_SECRET": TEST_SECRET})
+    @patch.object(ApiToken, "can", return_value=True)
+    @patch.object(ApiToken, 'is_logged_in', return_value=True)
+    @patch('agent.search_agent.checkpoint_saver', return_value=MemorySaver())
+    @patch('handlers.chat_model', return_value=FakeListChatModel(responses=["fake response"]))
+    @patch('handlers.SearchAgent.invoke', side_effect=CheckpointConflictError("test", ""))
+    def test_handler_checkpoint_conflict(self, mock_invoke, mock_chat_model, mock_create_saver, mock_is_logged_in, mock_can):
+        mock_client = MockClient()
+        event = {
+            "socket": Websocket(client=mock_client, endpoint_url="test", connection_id="test", ref="test"),
+            "body": '{"question": "Question?", "auth": "%s"}' % TEST_TOKEN,
+        }
+        response = chat(event, MockContext())
+        self.assertEqual(response, {'statusCode': 409, 'body': 'Conversation is busy'})
+        message = json.loads(mock_client.received_data)
+        self.assertEqual(message["type"], "error")
+        self.assertTrue(message["retryable"])
+
+    @patch.dict(os.environ, {"API_TOKEN_SECRET": TEST_SECRET})
+    @patch.object(ApiToken, "can", return_value=True)
+    @patch.object(ApiToken, 'is_logged_in', return_value=True)
+    @patch('agent.search_agent.checkpoint_saver', return_value=AnsweredConflictSaver())
+    @patch('handlers.chat_model', return_value=FakeListChatModel(responses=["fake response"]))
+    @patch.object(MetricsCallbackHandler, "log_metrics")
+    def test_handler_checkpoint_conflict_after_answer(self, mock_log_metrics, mock_chat_model, mock_create_saver, mock_is_logged_in, mock_can):
+        mock_client = MockClient()
+        event = {
+            "socket": Websocket(client=mock_client, endpoint_url="test", connection_id="test", ref="test"),
+            "body": '{"question": "Question?", "auth": "%s"}' % TEST_TOKEN,
+        }
+        response = chat(event, MockContext())
+        self.assertEqual(response, {'statusCode': 409, 'body': 'Conversation is busy'})
+        # The answer was already sent, so the client isn't asked to resend it
+        message = json.loads(mock_client.received_data)
+        self.assertEqual(message["type"], "error")
+        self.assertIn("not saved", message["message"])
+        self.assertFalse(message["retryable"])
+        mock_log_metrics.assert_called_once()
+
     @patch.dict(os.environ, {"API_TOKEN_SECRET": TEST_SECRET})
     @patch.dict(os.environ, {"METRICS_LOG_GROUP": "/nul/test/metrics/log/group"})
     @patch.object(ApiToken, "can", return_value=True)
@@ -121,7 +163,8 @@ class TestHandler(TestCase):
             "model": CHAT_MODEL,
             "question": "Question?",
             "ref": "test",
-            "token_counts": {}
+            "token_counts": {},
+            "checkpoint_requests": {}
         }
         log_events = response["events"]
         self.assertEqual(len(log_events), 2)
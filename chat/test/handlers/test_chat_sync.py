@@ -11,6 +11,7 @@ from core.apitoken import ApiToken
 from core.event_config import CHAT_MODEL
 from langchain_core.language_models.fake_chat_models import FakeListChatModel
 from langgraph.checkpoint.memory import MemorySaver
+from test.fixtures.checkpointer import AnsweredConflictSaver
 
 
 class MockContext:
@@ -103,3 +104,23 @@ class TestHandler(TestCase):
         self.assertEqual(
             response.get("headers", {}).get("Content-Type"), "application/json"
         )
+
+    @patch.object(ApiToken, "is_logged_in", return_value=True)
+    @patch.object(ApiToken, "is_dev_team", return_value=True)
+    @patch("agent.search_agent.checkpoint_saver", return_value=AnsweredConflictSaver())
+    @patch(
+        "handlers.chat_model",
+        return_value=FakeListChatModel(responses=["fake response"]),
+    )
+    def test_checkpoint_conflict_after_answer(
+        self, mock_chat_model, mock_create_saver, mock_is_logged_in, mock_is_dev_team
+    ):
+        response = chat_sync(
+            {"body": '{"question": "Question?", "ref": "test_ref"}'}, MockContext()
+        )
+
+        # The answer is returned, marked as not saved to the conversation
+        self.assertEqual(response.get("statusCode"), 200)
+        body = json.loads(response.get("body"))
+        self.assertEqual(body["answer"], ["fake response"])
+        self.assertFalse(body["saved"])
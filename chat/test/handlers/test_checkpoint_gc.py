@@ -0,0 +1,39 @@
+# ruff: noqa: E402
+
+import boto3
+import json
+import os
+import pytest
+from unittest import TestCase
+from unittest.mock import patch
+from moto import mock_aws
+
+from handlers import checkpoint_gc
+from langgraph.checkpoint.base import Checkpoint
+from persistence.s3_checkpointer import S3Checkpointer
+
+
+@mock_aws
+@pytest.mark.filterwarnings("ignore::DeprecationWarning")
+@patch.dict(os.environ, {"CHECKPOINT_BUCKET_NAME": "checkpoint-bucket"})
+class TestCheckpointGcHandler(TestCase):
+    def setUp(self):
+        self.s3 = boto3.client("s3", region_name="us-east-1")
+        self.s3.create_bucket(Bucket="checkpoint-bucket")
+        saver = S3Checkpointer(bucket_name="checkpoint-bucket", region_name="us-east-1")
+        config = {"configurable": {"thread_id": "thread1", "checkpoint_ns": ""}}
+        saver.put(config, Checkpoint(id="checkpoint1"), {}, {})
+
+    def test_keeps_recent_threads(self):
+        response = checkpoint_gc({}, None)
+        self.assertEqual(response["statusCode"], 200)
+        report = json.loads(response["body"])
+        self.assertEqual(report["threads_scanned"], 1)
+        self.assertEqual(report["threads_deleted"], 0)
+
+    def test_dry_run(self):
+        response = checkpoint_gc({"max_age_days": -1, "dry_run": True}, None)
+        report = json.loads(response["body"])
+        self.assertEqual(report["threads_deleted"], 1)
+        response = self.s3.list_objects_v2(Bucket="checkpoint-bucket")
+        self.assertEqual(response["KeyCount"], 2)
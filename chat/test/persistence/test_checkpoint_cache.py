@@ -0,0 +1,94 @@
+# ruff: noqa: E402
+import sys
+
+sys.path.append("./src")
+
+from unittest import TestCase
+
+from langchain_core.messages import HumanMessage
+from langgraph.checkpoint.base import CheckpointTuple
+from persistence.checkpoint_cache import CheckpointCache
+
+
+def make_tuple(checkpoint_id, messages=None, pending_writes=None):
+    config = {
+        "configurable": {
+            "thread_id": "thread1",
+            "checkpoint_ns": "",
+            "checkpoint_id": checkpoint_id,
+        }
+    }
+    checkpoint = {"id": checkpoint_id, "channel_values": {"messages": messages or []}}
+    return CheckpointTuple(config, checkpoint, {}, None, pending_writes or [])
+
+
+class TestCheckpointCache(TestCase):
+    def test_get_and_put(self):
+        cache = CheckpointCache()
+        key = ("thread1", "", "checkpoint1")
+        self.assertIsNone(cache.get(key))
+
+        cache.put(key, make_tuple("checkpoint1"))
+        self.assertEqual(cache.get(key).checkpoint["id"], "checkpoint1")
+        self.assertEqual(cache.stats(), {"hits": 1, "misses": 1, "size": 1})
+
+    def test_lru_eviction(self):
+        cache = CheckpointCache(max_size=2)
+        for checkpoint_id in ["a", "b"]:
+            cache.put(("thread1", "", checkpoint_id), make_tuple(checkpoint_id))
+
+        # Touch "a" so that "b" becomes the least recently used entry
+        cache.get(("thread1", "", "a"))
+        cache.put(("thread1", "", "c"), make_tuple("c"))
+
+        self.assertEqual(len(cache), 2)
+        self.assertIsNotNone(cache.get(("thread1", "", "a")))
+        self.assertIsNone(cache.get(("thread1", "", "b")))
+        self.assertIsNotNone(cache.get(("thread1", "", "c")))
+
+    def test_entries_are_copied(self):
+        cache = CheckpointCache()
+        key = ("thread1", "", "checkpoint1")
+        message = HumanMessage(content="original")
+        cache.put(key, make_tuple("checkpoint1", messages=[message]))
+
+        message.content = "changed after put"
+        cached = cache.get(key)
+        self.assertEqual(
+            cached.checkpoint["channel_values"]["messages"][0].content, "original"
+        )
+
+        cached.checkpoint["channel_values"]["messages"].clear()
+        self.assertEqual(
+            len(cache.get(key).checkpoint["channel_values"]["messages"]), 1
+        )
+
+    def test_put_writes(self):
+        cache = CheckpointCache()
+        key = ("thread1", "", "checkpoint1")
+        cache.put(key, make_tuple("checkpoint1"))
+
+        cache.put_writes(key, "task_b", [("channel1", 1), ("channel2", 2)])
+        cache.put_writes(key, "task_a", [("channel1", "a")])
+        cache.put_writes(key, "task_b", [("channel3", 3)])
+
+        self.assertEqual(
+            cache.get(key).pending_writes,
+            [("task_a", "channel1", "a"), ("task_b", "channel3", 3)],
+        )
+
+    def test_put_writes_uncached(self):
+        cache = CheckpointCache()
+        cache.put_writes(("thread1", "", "missing"), "task", [("channel", 1)])
+        self.assertEqual(len(cache), 0)
+
+    def test_invalidate_thread(self):
+        cache = CheckpointCache()
+        cache.put(("thread1", "", "a"), make_tuple("a"))
+        cache.put(("thread1", "ns", "b"), make_tuple("b"))
+        cache.put(("thread2", "", "c"), make_tuple("c"))
+
+        cache.invalidate_thread("thread1")
+
+        self.assertEqual(len(cache), 1)
+        self.assertIsNotNone(cache.get(("thread2", "", "c")))
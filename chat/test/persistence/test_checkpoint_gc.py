@@ -0,0 +1,131 @@
+# ruff: noqa: E402
+import sys
+
+sys.path.append("./src")
+
+import io
+import json
+import pytest
+import time
+from contextlib import redirect_stdout
+from unittest import TestCase
+
+import boto3
+from moto import mock_aws
+from langchain_core.messages import ToolMessage
+from langgraph.checkpoint.base import Checkpoint
+from persistence.checkpoint_gc import DAY_MS, collect_garbage, main
+from persistence.s3_checkpointer import S3Checkpointer
+
+BUCKET_NAME = "mybucket"
+REGION = "us-east-1"
+
+
+@mock_aws
+@pytest.mark.filterwarnings("ignore::DeprecationWarning")
+class TestCheckpointGarbageCollection(TestCase):
+    def setUp(self):
+        self.s3 = boto3.client("s3", region_name=REGION)
+        self.s3.create_bucket(Bucket=BUCKET_NAME)
+        self.saver = S3Checkpointer(bucket_name=BUCKET_NAME, region_name=REGION)
+        self.now = int(time.time() * 1000)
+
+    def put_thread(self, thread_id, checkpoint_ns="", count=2):
+        config = {
+            "configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns}
+        }
+        for i in range(count):
+            config = self.saver.put(config, Checkpoint(id=f"checkpoint{i}"), {}, {})
+            self.saver.put_writes(config, [("channel", i)], "task")
+
+    def thread_ids(self):
+        return list(self.saver.list_thread_ids())
+
+    def test_get_thread_timestamp(self):
+        self.put_thread("thread1")
+        self.put_thread("thread1", checkpoint_ns="inner")
+        timestamp = self.saver.get_thread_timestamp("thread1")
+        self.assertAlmostEqual(timestamp, self.now, delta=60_000)
+        self.assertIsNone(self.saver.get_thread_timestamp("missing"))
+
+        # Threads saved without latest pointers fall back to their checkpoints
+        self.s3.delete_object(
+            Bucket=BUCKET_NAME, Key="checkpoints/thread1/__default__/latest.json"
+        )
+        self.s3.delete_object(
+            Bucket=BUCKET_NAME, Key="checkpoints/thread1/inner/latest.json"
+        )
+        self.assertEqual(self.saver.get_thread_timestamp("thread1"), timestamp)
+
+    def test_collects_stale_threads(self):
+        self.put_thread("thread1")
+        self.put_thread("thread2", count=3)
+        later = self.now + 10 * DAY_MS
+        self.put_thread("thread3")
+        # thread3 is saved to again after the others
+        self.s3.put_object(
+            Bucket=BUCKET_NAME,
+            Key="checkpoints/thread3/__default__/latest.json",
+            Body=json.dumps({"checkpoint_id": "checkpoint1", "timestamp": later}),
+        )
+
+        report = collect_garbage(
+            self.saver, max_age_days=5, concurrency=4, now=later + DAY_MS
+        )
+
+        self.assertEqual(self.thread_ids(), ["thread3"])
+        self.assertEqual(report.threads_scanned, 3)
+        self.assertEqual(report.threads_deleted, 2)
+        # 2 and 3 checkpoints, each with a write, plus the latest pointers
+        self.assertEqual(report.objects_deleted, 4 + 1 + 6 + 1)
+        self.assertEqual(report.requests["delete"]["calls"], 1)
+        self.assertGreater(report.threads_per_second, 0)
+
+    def test_collects_offloaded_content(self):
+        saver = S3Checkpointer(
+            bucket_name=BUCKET_NAME, region_name=REGION, offload_threshold=100
+        )
+        message = ToolMessage(content="x" * 200, tool_call_id="1")
+        for thread_id in ("thread1", "thread2"):
+            saver.put(
+                {"configurable": {"thread_id": thread_id, "checkpoint_ns": ""}},
+                Checkpoint(id="checkpoint0", channel_values={"messages": [message]}),
+                {},
+                {},
+            )
+
+        report = collect_garbage(saver, max_age_days=1, now=self.now + 2 * DAY_MS)
+
+        self.assertEqual(report.threads_deleted, 2)
+        # Each thread's checkpoint, latest pointer and content
+        self.assertEqual(report.objects_deleted, 6)
+        response = self.s3.list_objects_v2(Bucket=BUCKET_NAME)
+        self.assertNotIn("Contents", response)
+
+    def test_dry_run(self):
+        self.put_thread("thread1")
+        report = collect_garbage(
+            self.saver, max_age_days=1, dry_run=True, now=self.now + 2 * DAY_MS
+        )
+        self.assertEqual(report.threads_deleted, 1)
+        self.assertEqual(report.objects_deleted, 5)
+        self.assertEqual(self.thread_ids(), ["thread1"])
+        self.assertNotIn("delete", report.requests)
+
+    def test_keeps_recent_threads(self):
+        self.put_thread("thread1")
+        report = collect_garbage(self.saver, max_age_days=1)
+        self.assertEqual(report.threads_deleted, 0)
+        self.assertEqual(self.thread_ids(), ["thread1"])
+
+    def test_main(self):
+        self.put_thread("thread1")
+        time.sleep(0.01)
+        output = io.StringIO()
+        with redirect_stdout(output):
+            main(["--bucket", BUCKET_NAME, "--region", REGION, "--max-age-days", "0"])
+        report = json.loads(output.getvalue())
+        self.assertEqual(report["threads_scanned"], 1)
+        self.assertEqual(report["threads_deleted"], 1)
+        self.assertIn("threads_per_second", report)
+        self.assertEqual(self.thread_ids(), [])
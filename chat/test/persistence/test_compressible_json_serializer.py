@@ -6,7 +6,10 @@ sys.path.append("./src")
 from unittest import TestCase
 
 from langchain_core.messages import HumanMessage
-from persistence.compressible_json_serializer import CompressibleJsonSerializer
+from persistence.compressible_json_serializer import (
+    CompressibleJsonSerializer,
+    train_zstd_dictionary,
+)
 import warnings
 
 warnings.simplefilter("ignore", DeprecationWarning)
@@ -52,6 +55,63 @@ class TestCompressibleJsonSerializer(TestCase):
         obj = serializer.loads_typed(data)
         self.assertEqual(obj, {"key": "value"})
 
+    def test_zstd_round_trip(self):
+        serializer = CompressibleJsonSerializer(compression="zstd")
+        obj = {"messages": [HumanMessage(content="Hello")], "step": 1}
+        data = serializer.dumps_typed(obj)
+        self.assertEqual(data[0], "zstd_json")
+
+        result = serializer.loads_typed(data)
+        self.assertEqual(result["step"], 1)
+        self.assertEqual(result["messages"][0].content, "Hello")
+
+    def test_compression_level(self):
+        obj = {"key": "value " * 1000}
+        for compression in ("bz2", "gzip", "zstd"):
+            fast = CompressibleJsonSerializer(
+                compression=compression, compression_level=1
+            )
+            data = fast.dumps_typed(obj)
+            # Levels only affect writing, so any serializer can read the data
+            reader = CompressibleJsonSerializer(compression=compression)
+            self.assertEqual(reader.loads_typed(data), obj)
+
+    def test_zstd_dictionary(self):
+        samples = [
+            {"messages": [HumanMessage(content=f"Question {i} about topic {i % 7}")]}
+            for i in range(200)
+        ]
+        dictionary = train_zstd_dictionary(samples, dict_size=4096)
+        serializer = CompressibleJsonSerializer(
+            compression="zstd", zstd_dictionary=dictionary
+        )
+        obj = {"messages": [HumanMessage(content="Question 1000 about topic 3")]}
+        data = serializer.dumps_typed(obj)
+        without_dictionary = CompressibleJsonSerializer(compression="zstd")
+        self.assertLess(len(data[1]), len(without_dictionary.dumps_typed(obj)[1]))
+        self.assertEqual(
+            serializer.loads_typed(data)["messages"][0].content,
+            "Question 1000 about topic 3",
+        )
+
+        # Data compressed with a dictionary can't be read without it
+        with self.assertRaises(Exception):
+            without_dictionary.loads_typed(data)
+
+    def test_dumps_binary(self):
+        obj = {"messages": [HumanMessage(content="Hello")]}
+        for serialization in ("json", "msgpack"):
+            for compression in (None, "gzip", "zstd"):
+                serializer = CompressibleJsonSerializer(
+                    compression=compression, serialization=serialization
+                )
+                data_type, payload = serializer.dumps_binary(obj)
+                self.assertEqual(data_type, serializer.dumps_typed(obj)[0])
+                self.assertIsInstance(payload, bytes)
+
+                result = serializer.loads_typed((data_type, payload))
+                self.assertEqual(result["messages"][0].content, "Hello")
+
     def test_nested_complex_object(self):
         serializer = CompressibleJsonSerializer(compression="gzip")
         data = (
@@ -140,3 +200,40 @@ KAd2GXI2/CIwh6fqDJuUcS9xq/oR8cwxZcwHnezfPf7+MYFuv/AShWPagOiHSXdDRM94zSpAHJdnRYJG
             serializer.dumps_typed(NotSerializable())
 
         self.assertIn("is not JSON serializable", str(context.exception))
+
+    def test_msgpack_round_trip(self):
+        for compression, expected_type in [
+            (None, "msgpack"),
+            ("bz2", "bz2_msgpack"),
+            ("gzip", "gzip_msgpack"),
+            ("zstd", "zstd_msgpack"),
+        ]:
+            serializer = CompressibleJsonSerializer(
+                compression=compression, serialization="msgpack"
+            )
+            obj = {"messages": [HumanMessage(content="Hello")], "step": 1}
+            data_type, payload = serializer.dumps_typed(obj)
+            self.assertEqual(data_type, expected_type)
+            self.assertIsInstance(payload, bytes)
+
+            result = serializer.loads_typed((data_type, payload))
+            self.assertEqual(result["step"], 1)
+            self.assertIsInstance(result["messages"][0], HumanMessage)
+            self.assertEqual(result["messages"][0].content, "Hello")
+
+    def test_msgpack_reads_json_types(self):
+        serializer = CompressibleJsonSerializer(serialization="msgpack")
+        obj = serializer.loads_typed(("json", '{"key": "value"}'))
+        self.assertEqual(obj, {"key": "value"})
+
+    def test_msgpack_none(self):
+        serializer = CompressibleJsonSerializer(serialization="msgpack")
+        data = serializer.dumps_typed(None)
+        self.assertEqual(data, ("null", b""))
+        self.assertIsNone(serializer.loads_typed(data))
+
+    def test_unsupported_serialization(self):
+        with self.assertRaises(ValueError) as context:
+            CompressibleJsonSerializer(serialization="xml")
+
+        self.assertIn("Unsupported serialization type", str(context.exception))
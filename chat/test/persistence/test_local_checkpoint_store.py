@@ -0,0 +1,79 @@
+# ruff: noqa: E402
+import sys
+
+sys.path.append("./src")
+
+import os
+import tempfile
+from unittest import TestCase
+from persistence.local_checkpoint_store import LocalCheckpointStore
+
+
+class TestLocalCheckpointStore(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "checkpoints.sqlite3")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_put_and_get(self):
+        store = LocalCheckpointStore(path=self.path)
+        key = "checkpoints/thread1/__default__/ck1/checkpoint.json"
+        version = store.put(key, b"body", "application/json", {"a": "b"})
+
+        obj = LocalCheckpointStore(path=self.path).get(key)
+        self.assertEqual(obj.body, b"body")
+        self.assertEqual(obj.content_type, "application/json")
+        self.assertEqual(obj.metadata, {"a": "b"})
+        self.assertEqual(obj.version, version)
+        self.assertIn(key, store)
+        self.assertIsNone(store.get("checkpoints/thread1/missing"))
+        self.assertEqual(store.keys("checkpoints/thread1/"), [key])
+        self.assertEqual(store.keys("checkpoints/thread2/"), [])
+
+    def test_mark_flushed(self):
+        store = LocalCheckpointStore(path=self.path)
+        key = "checkpoints/thread1/__default__/latest.json"
+        first = store.put(key, b"1")
+        second = store.put(key, b"2")
+        self.assertNotEqual(first, second)
+
+        # Flushing a replaced version leaves the object unflushed
+        store.mark_flushed(key, first)
+        self.assertEqual(store.unflushed(), [key])
+        store.mark_flushed(key, second)
+        self.assertEqual(store.unflushed(), [])
+
+    def test_evicts_flushed_threads(self):
+        store = LocalCheckpointStore(path=self.path, max_bytes=250)
+        versions = {}
+        for thread in ("thread1", "thread2", "thread3"):
+            for name in ("a", "b"):
+                key = f"checkpoints/{thread}/__default__/{name}"
+                versions[key] = store.put(key, b"x" * 50)
+
+        # thread1 has an object that isn't flushed, so thread2 is evicted
+        for key, version in versions.items():
+            if key != "checkpoints/thread1/__default__/b":
+                store.mark_flushed(key, version)
+        self.assertEqual(store.size(), 200)
+        self.assertEqual(store.keys("checkpoints/thread2/"), [])
+        self.assertEqual(len(store.keys("checkpoints/thread1/")), 2)
+        self.assertEqual(len(store.keys("checkpoints/thread3/")), 2)
+
+    def test_delete(self):
+        store = LocalCheckpointStore(path=self.path)
+        store.put("checkpoints/thread1/__default__/a", b"a")
+        store.put("checkpoints/thread1/__default__/b", b"b")
+        store.put("checkpoints/thread2/__default__/a", b"a")
+
+        store.delete(["checkpoints/thread1/__default__/a"])
+        self.assertEqual(
+            store.keys("checkpoints/"),
+            ["checkpoints/thread1/__default__/b", "checkpoints/thread2/__default__/a"],
+        )
+        store.delete_thread("thread1")
+        self.assertEqual(
+            store.keys("checkpoints/"), ["checkpoints/thread2/__default__/a"]
+        )
@@ -5,18 +5,34 @@ sys.path.append("./src")
 
 import pytest
 from unittest import TestCase
+from unittest.mock import patch
 
+import asyncio
 import boto3
 import json
+import ormsgpack
+import threading
 import time
 from moto import mock_aws
+from langchain_core.messages import HumanMessage, ToolMessage
 from langchain_core.runnables import RunnableConfig
 from langgraph.checkpoint.base import (
     Checkpoint,
     CheckpointMetadata,
 )
 from typing import Optional
-from persistence.s3_checkpointer import S3Checkpointer
+from persistence.checkpoint_cache import CheckpointCache
+from persistence.compressible_json_serializer import train_zstd_dictionary
+from persistence.s3_checkpointer import (
+    BINARY_ENVELOPE_MAGIC,
+    CheckpointConflictError,
+    OFFLOADED_CONTENT_KEY,
+    OFFLOADED_CONTENT_PLACEHOLDER,
+    S3Checkpointer,
+    _decode_envelope,
+    _encode_envelope,
+    _make_s3_write_key,
+)
 
 import bz2
 import base64
@@ -214,14 +230,49 @@ class TestS3Checkpointer(TestCase):
         task_id = "task123"
         self.checkpointer.put_writes(returned_config, writes, task_id)
 
+        write_key = (
+            f"checkpoints/{THREAD_ID}/__default__/checkpoint4/writes/{task_id}.json"
+        )
+        response = self.s3.get_object(Bucket=BUCKET_NAME, Key=write_key)
+        body = json.loads(response["Body"].read().decode("utf-8"))
+        assert "timestamp" in body
+        self.assertEqual(len(body["writes"]), len(writes))
+        for entry, (channel, value) in zip(body["writes"], writes):
+            self.assertEqual(entry["channel"], channel)
+            self.assertEqual(entry["type"], "json")
+            self.assertEqual(entry["value"], json.dumps(value))
+
+    def test_load_legacy_pending_writes(self):
+        """Test that writes saved one object per write are still loaded."""
+        checkpoint = Checkpoint(id="checkpoint_legacy_writes")
+        config = self.create_config()
+        returned_config = self.checkpointer.put(config, checkpoint, {}, {})
+
+        writes = [("channel1", {"data": "value1"}), ("channel2", {"data": "value2"})]
         for idx, (channel, value) in enumerate(writes):
-            write_key = f"checkpoints/{THREAD_ID}/__default__/checkpoint4/writes/{task_id}/{idx}.json"
-            response = self.s3.get_object(Bucket=BUCKET_NAME, Key=write_key)
-            body = json.loads(response["Body"].read().decode("utf-8"))
-            self.assertEqual(body["channel"], channel)
-            self.assertEqual(body["type"], "json")
-            self.assertEqual(body["value"], json.dumps(value))
-            assert "timestamp" in body
+            write_key = _make_s3_write_key(
+                THREAD_ID, CHECKPOINT_NAMESPACE, checkpoint["id"], "legacy_task", idx
+            )
+            body = {
+                "channel": channel,
+                "type": "json",
+                "value": json.dumps(value),
+                "timestamp": int(time.time() * 1000),
+            }
+            self.s3.put_object(Bucket=BUCKET_NAME, Key=write_key, Body=json.dumps(body))
+        self.checkpointer.put_writes(
+            returned_config, [("channel3", {"data": "value3"})], "batch_task"
+        )
+
+        checkpoint_tuple = self.checkpointer.get_tuple(returned_config)
+        self.assertEqual(
+            checkpoint_tuple.pending_writes,
+            [
+                ("batch_task", "channel3", {"data": "value3"}),
+                ("legacy_task", "channel1", {"data": "value1"}),
+                ("legacy_task", "channel2", {"data": "value2"}),
+            ],
+        )
 
     def test_put_writes_empty(self):
         """Test putting an empty list of writes."""
@@ -297,6 +348,191 @@ class TestS3Checkpointer(TestCase):
             self.assertEqual(channel, writes[i][0])
             self.assertEqual(value, writes[i][1])
 
+    def test_load_pending_writes_order(self):
+        """Test that pending writes are returned in (task_id, idx) order."""
+        config = self.create_config()
+        returned_config = self.checkpointer.put(
+            config, Checkpoint(id="checkpoint_order"), {}, {}
+        )
+        writes_b = [(f"channel{i}", {"data": i}) for i in range(12)]
+        writes_a = [("channel0", {"data": "a"})]
+        self.checkpointer.put_writes(returned_config, writes_b, "task_b")
+        self.checkpointer.put_writes(returned_config, writes_a, "task_a")
+
+        expected = [("task_a", "channel0", {"data": "a"})] + [
+            ("task_b", channel, value) for channel, value in writes_b
+        ]
+
+        sequential = S3Checkpointer(
+            bucket_name=BUCKET_NAME, region_name=REGION, write_concurrency=1
+        )
+        for saver in [self.checkpointer, sequential]:
+            checkpoint_tuple = saver.get_tuple(returned_config)
+            self.assertEqual(checkpoint_tuple.pending_writes, expected)
+
+    #
+    # Checkpoint Cache
+    #
+
+    def test_get_tuple_from_cache(self):
+        """Test that get_tuple reads back cached checkpoints without S3 GETs."""
+        cache = CheckpointCache()
+        saver = S3Checkpointer(bucket_name=BUCKET_NAME, region_name=REGION, cache=cache)
+        config = saver.put(
+            self.create_config(), Checkpoint(id="checkpoint_cached"), {}, {}
+        )
+        saver.put_writes(config, [("channel1", {"data": "value1"})], "task1")
+
+        with patch.object(saver, "_get_checkpoint_object") as get_checkpoint_object:
+            checkpoint_tuple = saver.get_tuple(config)
+            latest_tuple = saver.get_tuple(self.create_config())
+        get_checkpoint_object.assert_not_called()
+
+        self.assertEqual(checkpoint_tuple.checkpoint["id"], "checkpoint_cached")
+        self.assertEqual(
+            checkpoint_tuple.pending_writes, [("task1", "channel1", {"data": "value1"})]
+        )
+        self.assertEqual(latest_tuple.checkpoint["id"], "checkpoint_cached")
+        self.assertEqual(cache.hits, 2)
+
+    def test_get_tuple_populates_cache(self):
+        """Test that checkpoints loaded from S3 are added to the cache."""
+        self.setup_s3_bucket()
+        cache = CheckpointCache()
+        saver = S3Checkpointer(bucket_name=BUCKET_NAME, region_name=REGION, cache=cache)
+        config = self.create_config(checkpoint_id=CHECKPOINT_ID_2)
+
+        saver.get_tuple(config)
+        saver.get_tuple(config)
+
+        self.assertEqual(cache.stats(), {"hits": 1, "misses": 1, "size": 1})
+
+    def test_delete_checkpoints_invalidates_cache(self):
+        """Test that deleting a thread's checkpoints removes them from the cache."""
+        cache = CheckpointCache()
+        saver = S3Checkpointer(bucket_name=BUCKET_NAME, region_name=REGION, cache=cache)
+        config = saver.put(
+            self.create_config(), Checkpoint(id="checkpoint_cached"), {}, {}
+        )
+
+        saver.delete_checkpoints(THREAD_ID)
+
+        self.assertEqual(len(cache), 0)
+        self.assertIsNone(saver.get_tuple(config))
+
+    #
+    # Delta Checkpoints
+    #
+
+    def read_envelope(self, checkpoint_id):
+        key = f"checkpoints/{THREAD_ID}/__default__/{checkpoint_id}/checkpoint.json"
+        response = self.s3.get_object(Bucket=BUCKET_NAME, Key=key)
+        return json.loads(response["Body"].read().decode("utf-8"))
+
+    def put_chain(self, saver, steps, config=None):
+        config = config or self.create_config()
+        channel_values = {}
+        for checkpoint_id, changes in steps:
+            channel_values = {**channel_values, **changes}
+            channel_values = {k: v for k, v in channel_values.items() if v is not None}
+            checkpoint = Checkpoint(id=checkpoint_id, channel_values=channel_values)
+            new_versions = {k: 1 for k in changes}
+            config = saver.put(config, checkpoint, {}, new_versions)
+        return config
+
+    def test_put_delta_checkpoints(self):
+        """Test that only every Nth checkpoint is saved in full."""
+        saver = S3Checkpointer(
+            bucket_name=BUCKET_NAME, region_name=REGION, snapshot_interval=3
+        )
+        self.put_chain(
+            saver,
+            [
+                ("c0", {"messages": ["a"], "facets": ["f"]}),
+                ("c1", {"messages": ["a", "b"]}),
+                ("c2", {"messages": ["a", "b", "c"]}),
+                ("c3", {"messages": ["a", "b", "c", "d"]}),
+            ],
+        )
+
+        depths = [self.read_envelope(f"c{i}").get("delta_depth", 0) for i in range(4)]
+        self.assertEqual(depths, [0, 1, 2, 0])
+
+        delta = json.loads(self.read_envelope("c1")["checkpoint_data"])
+        self.assertEqual(delta["channel_values"], {"messages": ["a", "b"]})
+
+    def test_get_tuple_rebuilds_delta_checkpoint(self):
+        """Test that get_tuple rebuilds a delta checkpoint from its parents."""
+        saver = S3Checkpointer(
+            bucket_name=BUCKET_NAME, region_name=REGION, snapshot_interval=4
+        )
+        config = self.put_chain(
+            saver,
+            [
+                ("c0", {"messages": ["a"], "facets": ["f"], "scratch": 1}),
+                ("c1", {"messages": ["a", "b"], "scratch": None}),
+                ("c2", {"messages": ["a", "b", "c"]}),
+            ],
+        )
+
+        reader = S3Checkpointer(bucket_name=BUCKET_NAME, region_name=REGION)
+        checkpoint_tuple = reader.get_tuple(config)
+        self.assertEqual(
+            checkpoint_tuple.checkpoint["channel_values"],
+            {"messages": ["a", "b", "c"], "facets": ["f"]},
+        )
+
+        listed = list(reader.list(self.create_config()))
+        self.assertEqual(
+            listed[1].checkpoint["channel_values"],
+            {"messages": ["a", "b"], "facets": ["f"]},
+        )
+
+    def test_delta_chain_continues_after_get_tuple(self):
+        """Test that a new saver continues the delta chain of the latest checkpoint."""
+        first = S3Checkpointer(
+            bucket_name=BUCKET_NAME, region_name=REGION, snapshot_interval=4
+        )
+        self.put_chain(
+            first, [("c0", {"messages": ["a"]}), ("c1", {"messages": ["b"]})]
+        )
+
+        second = S3Checkpointer(
+            bucket_name=BUCKET_NAME, region_name=REGION, snapshot_interval=4
+        )
+        latest = second.get_tuple(self.create_config())
+        self.put_chain(second, [("c2", {"messages": ["c"]})], config=latest.config)
+
+        self.assertEqual(self.read_envelope("c2")["delta_depth"], 2)
+
+    def test_delta_checkpoint_missing_parent(self):
+        """Test that a delta checkpoint whose parent was deleted can't be read."""
+        saver = S3Checkpointer(
+            bucket_name=BUCKET_NAME, region_name=REGION, snapshot_interval=4
+        )
+        config = self.put_chain(
+            saver, [("c0", {"messages": ["a"]}), ("c1", {"messages": ["b"]})]
+        )
+        self.s3.delete_object(
+            Bucket=BUCKET_NAME,
+            Key=f"checkpoints/{THREAD_ID}/__default__/c0/checkpoint.json",
+        )
+
+        with self.assertRaises(ValueError) as context:
+            saver.get_tuple(config)
+        self.assertIn("is missing", str(context.exception))
+
+    def test_delete_checkpoints_restarts_delta_chain(self):
+        """Test that the first checkpoint after deleting a thread is saved in full."""
+        saver = S3Checkpointer(
+            bucket_name=BUCKET_NAME, region_name=REGION, snapshot_interval=4
+        )
+        config = self.put_chain(saver, [("c0", {"messages": ["a"]})])
+        saver.delete_checkpoints(THREAD_ID)
+        self.put_chain(saver, [("c1", {"messages": ["b"]})], config=config)
+
+        self.assertNotIn("delta_depth", self.read_envelope("c1"))
+
     #
     # Listing Checkpoints and Filters
     #
@@ -353,6 +589,90 @@ class TestS3Checkpointer(TestCase):
         results = list(self.checkpointer.list(config, before=before_config))
         self.assertEqual(len(results), 0)
 
+    def test_list_with_metadata_filter(self):
+        """Test that list only fully loads checkpoints whose metadata matches."""
+        config = self.create_config()
+        for i, source in enumerate(["input", "loop", "loop"]):
+            config = self.checkpointer.put(
+                config, Checkpoint(id=f"checkpoint_{i}"), {"source": source}, {}
+            )
+
+        with patch.object(
+            self.checkpointer,
+            "_get_checkpoint_object",
+            wraps=self.checkpointer._get_checkpoint_object,
+        ) as get_checkpoint_object:
+            results = list(
+                self.checkpointer.list(self.create_config(), filter={"source": "loop"})
+            )
+
+        self.assertEqual(
+            [r.config["configurable"]["checkpoint_id"] for r in results],
+            ["checkpoint_2", "checkpoint_1"],
+        )
+        self.assertEqual(get_checkpoint_object.call_count, 2)
+
+    def test_list_is_lazy(self):
+        """Test that list only loads checkpoints as the iterator reaches them."""
+        self.setup_s3_bucket()
+        with patch.object(
+            self.checkpointer,
+            "_load_pending_writes",
+            wraps=self.checkpointer._load_pending_writes,
+        ) as load_pending_writes:
+            first = next(self.checkpointer.list(self.create_config()))
+
+        self.assertEqual(first.config["configurable"]["checkpoint_id"], CHECKPOINT_ID_2)
+        self.assertEqual(load_pending_writes.call_count, 1)
+
+    def test_list_metadata(self):
+        """Test listing checkpoint metadata without loading checkpoint bodies."""
+        config = self.create_config()
+        first = self.checkpointer.put(
+            config, Checkpoint(id="checkpoint_a"), {"source": "input", "step": -1}, {}
+        )
+        self.checkpointer.put(
+            first, Checkpoint(id="checkpoint_b"), {"source": "loop", "step": 0}, {}
+        )
+
+        with patch.object(self.checkpointer, "_get_checkpoint_object") as get_object:
+            results = list(self.checkpointer.list_metadata(config))
+        get_object.assert_not_called()
+
+        self.assertEqual(len(results), 2)
+        self.assertEqual(
+            results[0].config["configurable"]["checkpoint_id"], "checkpoint_b"
+        )
+        self.assertEqual(results[0].metadata, {"source": "loop", "step": 0})
+        self.assertEqual(
+            results[0].parent_config["configurable"]["checkpoint_id"], "checkpoint_a"
+        )
+        assert isinstance(results[0].timestamp, int)
+        assert results[1].parent_config is None
+
+        filtered = list(
+            self.checkpointer.list_metadata(config, filter={"source": "input"})
+        )
+        self.assertEqual(len(filtered), 1)
+        self.assertEqual(
+            filtered[0].config["configurable"]["checkpoint_id"], "checkpoint_a"
+        )
+
+        limited = list(self.checkpointer.list_metadata(config, limit=1))
+        self.assertEqual(len(limited), 1)
+
+    def test_list_metadata_without_headers(self):
+        """Test listing metadata for checkpoints saved without metadata headers."""
+        self.setup_s3_bucket()
+        results = list(self.checkpointer.list_metadata(self.create_config()))
+
+        self.assertEqual(len(results), 2)
+        self.assertEqual(results[0].metadata, {})
+        self.assertEqual(
+            results[0].parent_config["configurable"]["checkpoint_id"], CHECKPOINT_ID_1
+        )
+        assert results[0].timestamp is not None
+
     #
     # Parent-Child Checkpoint Relationship
     #
@@ -538,6 +858,346 @@ class TestS3Checkpointer(TestCase):
         self.assertEqual(retrieved_checkpoints[0].checkpoint, {})
         self.assertEqual(retrieved_checkpoints[0].metadata, {})
 
+    def test_put_and_get_msgpack(self):
+        """Test storing checkpoints and writes as raw msgpack."""
+        saver = S3Checkpointer(
+            bucket_name=BUCKET_NAME,
+            region_name=REGION,
+            compression="gzip",
+            serialization="msgpack",
+        )
+        checkpoint = Checkpoint(
+            id="checkpoint_msgpack",
+            channel_values={"messages": [HumanMessage(content="Hello")]},
+        )
+        config = saver.put(self.create_config(), checkpoint, {"step": 1}, {})
+        saver.put_writes(config, [("channel1", {"data": "value1"})], "task1")
+
+        key = f"checkpoints/{THREAD_ID}/__default__/checkpoint_msgpack/checkpoint.json"
+        response = self.s3.get_object(Bucket=BUCKET_NAME, Key=key)
+        self.assertEqual(response["ContentType"], "application/msgpack")
+        body = ormsgpack.unpackb(response["Body"].read())
+        self.assertEqual(body["checkpoint_type"], "gzip_msgpack")
+        assert body["checkpoint_data"].startswith(b"\x1f\x8b")  # Gzip magic number
+
+        checkpoint_tuple = saver.get_tuple(config)
+        self.assertEqual(checkpoint_tuple.metadata, {"step": 1})
+        message = checkpoint_tuple.checkpoint["channel_values"]["messages"][0]
+        self.assertIsInstance(message, HumanMessage)
+        self.assertEqual(message.content, "Hello")
+        self.assertEqual(
+            checkpoint_tuple.pending_writes, [("task1", "channel1", {"data": "value1"})]
+        )
+
+    def test_put_and_get_zstd_with_dictionary(self):
+        """Test storing checkpoints with zstd and a trained dictionary."""
+        dictionary = train_zstd_dictionary(
+            [{"messages": [HumanMessage(content=f"Hello {i}")]} for i in range(100)],
+            dict_size=1024,
+        )
+        saver = S3Checkpointer(
+            bucket_name=BUCKET_NAME,
+            region_name=REGION,
+            compression="zstd",
+            compression_level=9,
+            zstd_dictionary=dictionary,
+        )
+        checkpoint = Checkpoint(
+            id="checkpoint_zstd",
+            channel_values={"messages": [HumanMessage(content="Hello")]},
+        )
+        config = saver.put(self.create_config(), checkpoint, {"step": 1}, {})
+
+        key = f"checkpoints/{THREAD_ID}/__default__/checkpoint_zstd/checkpoint.json"
+        body = json.loads(
+            self.s3.get_object(Bucket=BUCKET_NAME, Key=key)["Body"].read()
+        )
+        self.assertEqual(body["checkpoint_type"], "zstd_json")
+
+        checkpoint_tuple = saver.get_tuple(config)
+        message = checkpoint_tuple.checkpoint["channel_values"]["messages"][0]
+        self.assertEqual(message.content, "Hello")
+
+    def test_put_and_get_binary_envelope(self):
+        """Test storing checkpoints and writes with raw payloads after a binary header."""
+        saver = S3Checkpointer(
+            bucket_name=BUCKET_NAME,
+            region_name=REGION,
+            compression="gzip",
+            binary_envelope=True,
+        )
+        checkpoint = Checkpoint(
+            id="checkpoint_binary",
+            channel_values={"messages": [HumanMessage(content="Hello")]},
+        )
+        config = saver.put(self.create_config(), checkpoint, {"step": 1}, {})
+        saver.put_writes(
+            config, [("channel1", {"data": "value1"}), ("channel2", None)], "task1"
+        )
+
+        key = f"checkpoints/{THREAD_ID}/__default__/checkpoint_binary/checkpoint.json"
+        response = self.s3.get_object(Bucket=BUCKET_NAME, Key=key)
+        self.assertEqual(response["ContentType"], "application/octet-stream")
+        body = response["Body"].read()
+        self.assertTrue(body.startswith(BINARY_ENVELOPE_MAGIC))
+        self.assertIn(b"\x1f\x8b", body)  # Raw gzip data, not base64
+
+        checkpoint_tuple = saver.get_tuple(config)
+        self.assertEqual(checkpoint_tuple.metadata, {"step": 1})
+        message = checkpoint_tuple.checkpoint["channel_values"]["messages"][0]
+        self.assertEqual(message.content, "Hello")
+        self.assertEqual(
+            checkpoint_tuple.pending_writes,
+            [("task1", "channel1", {"data": "value1"}), ("task1", "channel2", None)],
+        )
+
+        # Checkpointers using the other envelopes can still read it
+        json_saver = S3Checkpointer(
+            bucket_name=BUCKET_NAME, region_name=REGION, compression="gzip"
+        )
+        self.assertEqual(json_saver.get_tuple(config).metadata, {"step": 1})
+
+    def test_binary_envelope_round_trip(self):
+        """Test that binary envelopes keep nested payloads and header fields."""
+        data = {
+            "writes": [
+                {"channel": "a", "type": "json", "value": b'{"x": 1}'},
+                {"channel": "b", "type": "null", "value": b""},
+            ],
+            "timestamp": 123,
+        }
+        body, content_type = _encode_envelope(data, "binary")
+        self.assertEqual(content_type, "application/octet-stream")
+        self.assertEqual(_decode_envelope(body), data)
+
+    def test_msgpack_reads_json_checkpoints(self):
+        """Test that a msgpack checkpointer still reads JSON checkpoints."""
+        self.setup_s3_bucket()
+        saver = S3Checkpointer(
+            bucket_name=BUCKET_NAME, region_name=REGION, serialization="msgpack"
+        )
+        checkpoint_tuple = saver.get_tuple(self.create_config(CHECKPOINT_ID_2))
+        self.assertEqual(checkpoint_tuple.checkpoint, {})
+
+    #
+    # Offloaded Tool Message Content
+    #
+
+    def content_keys(self):
+        response = self.s3.list_objects_v2(Bucket=BUCKET_NAME, Prefix="checkpoints/")
+        return [
+            obj["Key"]
+            for obj in response.get("Contents", [])
+            if "/content-" in obj["Key"]
+        ]
+
+    def test_offloads_large_tool_messages(self):
+        """Test that large ToolMessage content is stored once and read lazily."""
+        saver = S3Checkpointer(
+            bucket_name=BUCKET_NAME,
+            region_name=REGION,
+            compression="gzip",
+            offload_threshold=100,
+        )
+        results = json.dumps([{"id": i, "title": f"Result {i}"} for i in range(20)])
+        messages = [
+            HumanMessage(content="Question"),
+            ToolMessage(content=results, tool_call_id="1", name="search"),
+            ToolMessage(content="Short", tool_call_id="2", name="search"),
+        ]
+        config = saver.put(
+            self.create_config(),
+            Checkpoint(id="checkpoint1", channel_values={"messages": messages}),
+            {},
+            {"messages": 1},
+        )
+        saver.put_writes(config, [("messages", [messages[1]])], "task")
+        self.assertEqual(len(self.content_keys()), 1)
+        # The messages being saved are left as they were
+        self.assertEqual(messages[1].content, results)
+
+        checkpoint_tuple = saver.get_tuple(config)
+        stored = checkpoint_tuple.checkpoint["channel_values"]["messages"]
+        self.assertEqual(stored[1].content, OFFLOADED_CONTENT_PLACEHOLDER)
+        self.assertIn(OFFLOADED_CONTENT_KEY, stored[1].additional_kwargs)
+        self.assertEqual(stored[2], messages[2])
+        pending = checkpoint_tuple.pending_writes[0][2]
+        self.assertEqual(pending[0].content, OFFLOADED_CONTENT_PLACEHOLDER)
+
+        self.assertEqual(saver.load_offloaded(stored), messages)
+        self.assertEqual(saver.load_offloaded(pending), [messages[1]])
+
+        # Saving an offloaded message again doesn't store its content again
+        with patch.object(saver, "_put_content") as put_content:
+            saver.put(
+                config,
+                Checkpoint(id="checkpoint2", channel_values={"messages": stored}),
+                {},
+                {"messages": 2},
+            )
+        put_content.assert_not_called()
+
+    def test_offloaded_content_loaded_once(self):
+        """Test that offloaded content is only fetched the first time it's loaded."""
+        message = ToolMessage(content="x" * 200, tool_call_id="1")
+        saver = S3Checkpointer(
+            bucket_name=BUCKET_NAME, region_name=REGION, offload_threshold=100
+        )
+        config = saver.put(
+            self.create_config(),
+            Checkpoint(id="checkpoint1", channel_values={"messages": [message]}),
+            {},
+            {},
+        )
+
+        for checkpointer in (
+            saver,
+            S3Checkpointer(
+                bucket_name=BUCKET_NAME, region_name=REGION, offload_threshold=100
+            ),
+        ):
+            stored = checkpointer.get_tuple(config).checkpoint["channel_values"]
+            with patch.object(
+                checkpointer, "_get_content", wraps=checkpointer._get_content
+            ) as get_content:
+                for _ in range(3):
+                    self.assertEqual(
+                        checkpointer.load_offloaded(stored["messages"]), [message]
+                    )
+            # Content the checkpointer stored itself is never fetched
+            self.assertEqual(get_content.call_count, 0 if checkpointer is saver else 1)
+
+    def test_offloaded_content_deleted_with_thread(self):
+        """Test that offloaded content is stored per thread and deleted with it."""
+        message = ToolMessage(content="x" * 200, tool_call_id="1")
+        saver = S3Checkpointer(
+            bucket_name=BUCKET_NAME, region_name=REGION, offload_threshold=100
+        )
+        configs = {}
+        for thread_id in (THREAD_ID, "thread2"):
+            config = RunnableConfig({"configurable": {"thread_id": thread_id}})
+            configs[thread_id] = saver.put(
+                config,
+                Checkpoint(id="checkpoint1", channel_values={"messages": [message]}),
+                {},
+                {},
+            )
+        self.assertEqual(len(self.content_keys()), 2)
+
+        saver.delete_checkpoints("thread2")
+        self.assertEqual(len(self.content_keys()), 1)
+        checkpoint_tuple = saver.get_tuple(configs[THREAD_ID])
+        stored = checkpoint_tuple.checkpoint["channel_values"]["messages"]
+        self.assertEqual(saver.load_offloaded(stored), [message])
+
+        # The same content saved to the deleted thread again is stored again
+        config = saver.put(
+            RunnableConfig({"configurable": {"thread_id": "thread2"}}),
+            Checkpoint(id="checkpoint2", channel_values={"messages": [message]}),
+            {},
+            {},
+        )
+        stored = saver.get_tuple(config).checkpoint["channel_values"]["messages"]
+        self.assertEqual(saver.load_offloaded(stored), [message])
+
+    def test_offloaded_content_kept_by_background_deletion(self):
+        """Test that content saved during a background deletion is kept."""
+        message = ToolMessage(content="x" * 200, tool_call_id="1")
+        saver = S3Checkpointer(
+            bucket_name=BUCKET_NAME, region_name=REGION, offload_threshold=100
+        )
+        checkpoint = Checkpoint(
+            id="checkpoint1", channel_values={"messages": [message]}
+        )
+        saver.put(self.create_config(), checkpoint, {}, {})
+
+        # Hold up the background deletion until the content has been saved again
+        release = threading.Event()
+        saver._submit_background(release.wait)
+        saver.delete_checkpoints(THREAD_ID, wait=False)
+        config = saver.put(self.create_config(), checkpoint, {}, {})
+        release.set()
+        saver.flush()
+
+        self.assertEqual(len(self.content_keys()), 1)
+        stored = saver.get_tuple(config).checkpoint["channel_values"]["messages"]
+        self.assertEqual(saver.load_offloaded(stored), [message])
+
+    #
+    # Conditional Latest Pointer Writes
+    #
+
+    def put_turn(self, saver, checkpoint_id):
+        """Reads the thread and saves a checkpoint to it, as one agent turn does."""
+        config = self.create_config()
+        checkpoint_tuple = saver.get_tuple(config)
+        if checkpoint_tuple:
+            config = checkpoint_tuple.config
+        return saver.put(config, Checkpoint(id=checkpoint_id), {}, {})
+
+    def test_concurrent_turns_conflict(self):
+        """Test that the losing writer of a race gets a retryable conflict."""
+        self.put_turn(self.checkpointer, "checkpoint1")
+        first = S3Checkpointer(bucket_name=BUCKET_NAME, region_name=REGION)
+        second = S3Checkpointer(bucket_name=BUCKET_NAME, region_name=REGION)
+        first_config = first.get_tuple(self.create_config()).config
+        second_config = second.get_tuple(self.create_config()).config
+
+        first.put(first_config, Checkpoint(id="checkpoint2"), {}, {})
+        with self.assertRaises(CheckpointConflictError) as context:
+            second.put(second_config, Checkpoint(id="checkpoint3"), {}, {})
+        self.assertEqual(context.exception.thread_id, THREAD_ID)
+        self.assertEqual(context.exception.checkpoint_ns, CHECKPOINT_NAMESPACE)
+
+        # The loser can't save over the winner until it reads the thread again
+        with self.assertRaises(CheckpointConflictError):
+            second.put(second_config, Checkpoint(id="checkpoint4"), {}, {})
+        with self.assertRaises(CheckpointConflictError):
+            second.put_writes(second_config, [("channel", 1)], "task")
+
+        # The winner's checkpoint stays the latest, and a retry builds on it
+        latest = self.checkpointer.get_tuple(self.create_config())
+        self.assertEqual(latest.checkpoint["id"], "checkpoint2")
+        self.put_turn(second, "checkpoint3")
+        latest = self.checkpointer.get_tuple(self.create_config())
+        self.assertEqual(latest.checkpoint["id"], "checkpoint3")
+        self.assertEqual(
+            latest.parent_config["configurable"]["checkpoint_id"], "checkpoint2"
+        )
+
+    def test_concurrent_first_turns_conflict(self):
+        """Test that two writers starting a new thread can't both win."""
+        first = S3Checkpointer(bucket_name=BUCKET_NAME, region_name=REGION)
+        second = S3Checkpointer(bucket_name=BUCKET_NAME, region_name=REGION)
+        self.assertIsNone(first.get_tuple(self.create_config()))
+        self.assertIsNone(second.get_tuple(self.create_config()))
+
+        first.put(self.create_config(), Checkpoint(id="checkpoint1"), {}, {})
+        with self.assertRaises(CheckpointConflictError):
+            second.put(self.create_config(), Checkpoint(id="checkpoint2"), {}, {})
+
+    def test_consecutive_puts_dont_conflict(self):
+        """Test that a writer's own pointer updates don't conflict."""
+        config = self.put_turn(self.checkpointer, "checkpoint1")
+        for i in range(2, 5):
+            config = self.checkpointer.put(
+                config, Checkpoint(id=f"checkpoint{i}"), {}, {}
+            )
+        self.put_turn(self.checkpointer, "checkpoint5")
+        self.checkpointer.delete_checkpoints(THREAD_ID)
+        self.put_turn(self.checkpointer, "checkpoint6")
+
+    def test_unconditional_writes(self):
+        """Test that conditional writes can be turned off."""
+        first = S3Checkpointer(
+            bucket_name=BUCKET_NAME, region_name=REGION, conditional_writes=False
+        )
+        self.assertIsNone(first.get_tuple(self.create_config()))
+        self.put_turn(self.checkpointer, "checkpoint1")
+        first.put(self.create_config(), Checkpoint(id="checkpoint2"), {}, {})
+        latest = self.checkpointer.get_tuple(self.create_config())
+        self.assertEqual(latest.checkpoint["id"], "checkpoint2")
+
     #
     # Concurrency
     #
@@ -546,11 +1206,19 @@ class TestS3Checkpointer(TestCase):
         """Test concurrent puts to ensure thread safety (basic simulation)."""
         import threading
 
+        saved, conflicts, errors = [], [], []
+
         def put_checkpoint(id_suffix):
             checkpoint = Checkpoint(id=f"checkpoint_concurrent_{id_suffix}")
             metadata = CheckpointMetadata()
             config = self.create_config()
-            self.checkpointer.put(config, checkpoint, metadata, {})
+            try:
+                self.checkpointer.put(config, checkpoint, metadata, {})
+                saved.append(checkpoint["id"])
+            except CheckpointConflictError:
+                conflicts.append(checkpoint["id"])
+            except Exception as e:
+                errors.append(e)
 
         threads = []
         for i in range(5):
@@ -561,13 +1229,87 @@ class TestS3Checkpointer(TestCase):
         for t in threads:
             t.join()
 
+        # Racing pointer writes either win or raise a conflict
+        self.assertEqual(errors, [])
+        self.assertTrue(saved)
+        self.assertEqual(len(saved) + len(conflicts), 5)
+
         config = self.create_config()
         retrieved_checkpoints = list(self.checkpointer.list(config))
-        expected_ids = {f"checkpoint_concurrent_{i}" for i in range(5)}
         retrieved_ids = {
             ck.config["configurable"]["checkpoint_id"] for ck in retrieved_checkpoints
         }
-        assert expected_ids.issubset(retrieved_ids)
+        assert set(saved).issubset(retrieved_ids)
+        latest = self.checkpointer.get_tuple(config)
+        self.assertIn(latest.checkpoint["id"], saved)
+
+    #
+    # Async
+    #
+
+    def test_async_put_and_get(self):
+        """Test that the async methods read and write checkpoints."""
+
+        async def run():
+            config = await self.checkpointer.aput(
+                self.create_config(),
+                Checkpoint(id="checkpoint_async"),
+                {"step": 1},
+                {},
+            )
+            await self.checkpointer.aput_writes(
+                config, [("channel1", {"data": "value1"})], "task1"
+            )
+            checkpoint_tuple = await self.checkpointer.aget_tuple(self.create_config())
+            listed = [c async for c in self.checkpointer.alist(self.create_config())]
+            return checkpoint_tuple, listed
+
+        checkpoint_tuple, listed = asyncio.run(run())
+        self.assertEqual(
+            checkpoint_tuple.config["configurable"]["checkpoint_id"], "checkpoint_async"
+        )
+        self.assertEqual(checkpoint_tuple.metadata, {"step": 1})
+        self.assertEqual(
+            checkpoint_tuple.pending_writes, [("task1", "channel1", {"data": "value1"})]
+        )
+        self.assertEqual(
+            [c.config["configurable"]["checkpoint_id"] for c in listed],
+            ["checkpoint_async"],
+        )
+
+    def test_async_puts_keep_thread_order(self):
+        """Test that concurrent async puts to a thread are applied in call order."""
+        put = self.checkpointer.put
+
+        # Make earlier puts slower, so they would finish last if run at once
+        def slow_put(config, checkpoint, metadata, new_versions):
+            time.sleep(0.02 * (5 - int(checkpoint["id"][-1])))
+            return put(config, checkpoint, metadata, new_versions)
+
+        async def run():
+            await asyncio.gather(
+                *[
+                    self.checkpointer.aput(
+                        self.create_config(),
+                        Checkpoint(id=f"checkpoint_async_{i}"),
+                        {"step": i},
+                        {},
+                    )
+                    for i in range(5)
+                ]
+            )
+
+        with patch.object(self.checkpointer, "put", side_effect=slow_put):
+            asyncio.run(run())
+
+        checkpoint_tuple = self.checkpointer.get_tuple(self.create_config())
+        self.assertEqual(checkpoint_tuple.metadata, {"step": 4})
+
+    def test_async_delete_checkpoints(self):
+        """Test that adelete_checkpoints removes the thread's checkpoints."""
+        self.setup_s3_bucket()
+        asyncio.run(self.checkpointer.adelete_checkpoints(THREAD_ID))
+        self.assertIsNone(self.checkpointer.get_tuple(self.create_config()))
 
     #
     # Latest Checkpoint ID
@@ -588,6 +1330,62 @@ class TestS3Checkpointer(TestCase):
         )
         assert latest_id is None
 
+    def test_put_updates_latest_pointer(self):
+        """Test that put records the newest checkpoint ID in the latest pointer."""
+        config = self.create_config()
+        self.checkpointer.put(config, Checkpoint(id="checkpoint_a"), {}, {})
+        self.checkpointer.put(config, Checkpoint(id="checkpoint_b"), {}, {})
+
+        response = self.s3.get_object(
+            Bucket=BUCKET_NAME, Key=f"checkpoints/{THREAD_ID}/__default__/latest.json"
+        )
+        body = json.loads(response["Body"].read().decode("utf-8"))
+        self.assertEqual(body["checkpoint_id"], "checkpoint_b")
+        assert "timestamp" in body
+
+    def test_get_tuple_uses_latest_pointer(self):
+        """Test that get_tuple resolves the latest checkpoint from the pointer."""
+        config = self.create_config()
+        self.checkpointer.put(config, Checkpoint(id="checkpoint_a"), {}, {})
+
+        with patch.object(
+            self.checkpointer,
+            "_scan_latest_checkpoint_id",
+            wraps=self.checkpointer._scan_latest_checkpoint_id,
+        ) as scan:
+            checkpoint_tuple = self.checkpointer.get_tuple(config)
+
+        scan.assert_not_called()
+        self.assertEqual(
+            checkpoint_tuple.config["configurable"]["checkpoint_id"], "checkpoint_a"
+        )
+
+    def test_get_tuple_stale_latest_pointer(self):
+        """Test that get_tuple falls back to listing when the pointer is stale."""
+        self.setup_s3_bucket()
+        self.s3.put_object(
+            Bucket=BUCKET_NAME,
+            Key=f"checkpoints/{THREAD_ID}/__default__/latest.json",
+            Body=json.dumps({"checkpoint_id": "deleted_checkpoint"}),
+        )
+
+        checkpoint_tuple = self.checkpointer.get_tuple(self.create_config())
+        assert checkpoint_tuple is not None
+        self.assertEqual(
+            checkpoint_tuple.config["configurable"]["checkpoint_id"], CHECKPOINT_ID_2
+        )
+
+    def test_list_ignores_latest_pointer(self):
+        """Test that the latest pointer is not listed as a checkpoint."""
+        config = self.create_config()
+        self.checkpointer.put(config, Checkpoint(id="checkpoint_a"), {}, {})
+
+        results = list(self.checkpointer.list(config))
+        self.assertEqual(len(results), 1)
+        self.assertEqual(
+            results[0].config["configurable"]["checkpoint_id"], "checkpoint_a"
+        )
+
     #
     # Deleting Checkpoints
     #
@@ -615,6 +1413,154 @@ class TestS3Checkpointer(TestCase):
         retrieved_after_delete = list(self.checkpointer.list(self.create_config()))
         self.assertEqual(len(retrieved_after_delete), 0)
 
+    def thread_keys(self, thread_id=THREAD_ID):
+        paginator = self.s3.get_paginator("list_objects_v2")
+        pages = paginator.paginate(
+            Bucket=BUCKET_NAME, Prefix=f"checkpoints/{thread_id}/"
+        )
+        return sorted(item["Key"] for item in pages.search("Contents") if item)
+
+    def test_delete_checkpoints_sharded(self):
+        """Test that deleting a thread covers every namespace and key range."""
+        for concurrency in (1, 3):
+            saver = S3Checkpointer(
+                bucket_name=BUCKET_NAME,
+                region_name=REGION,
+                delete_concurrency=concurrency,
+            )
+            for thread_id in (THREAD_ID, "thread2"):
+                for ns in ("", "child"):
+                    config = RunnableConfig(
+                        {"configurable": {"thread_id": thread_id, "checkpoint_ns": ns}}
+                    )
+                    for i in range(10):
+                        config = saver.put(
+                            config,
+                            Checkpoint(id=f"ckpt_{i:02}"),
+                            CheckpointMetadata(),
+                            {},
+                        )
+                        saver.put_writes(config, [("channel", i)], "task")
+
+            with patch.object(
+                saver, "_delete_key_range", wraps=saver._delete_key_range
+            ) as delete_key_range, patch(
+                "persistence.s3_checkpointer.MAX_UNSPLIT_THREAD_OBJECTS", 10
+            ), patch("persistence.s3_checkpointer.MIN_DELETE_RANGE_CHECKPOINTS", 1):
+                saver.delete_checkpoints(THREAD_ID)
+
+            self.assertEqual(self.thread_keys(), [])
+            self.assertEqual(len(self.thread_keys("thread2")), 42)
+            self.assertEqual(delete_key_range.call_count, 2 * concurrency)
+            saver.delete_checkpoints("thread2")
+
+    def test_delete_checkpoints_concurrently(self):
+        """Test that a large thread's key ranges are deleted concurrently."""
+        saver = S3Checkpointer(
+            bucket_name=BUCKET_NAME, region_name=REGION, delete_concurrency=4
+        )
+        in_flight, most_in_flight = [0], [0]
+        lock = threading.Lock()
+        delete_objects = saver.s3.delete_objects
+
+        def slow_delete_objects(**kwargs):
+            with lock:
+                in_flight[0] += 1
+                most_in_flight[0] = max(most_in_flight[0], in_flight[0])
+            time.sleep(0.1)
+            try:
+                return delete_objects(**kwargs)
+            finally:
+                with lock:
+                    in_flight[0] -= 1
+
+        for wait in (True, False):
+            config = self.create_config()
+            for i in range(8):
+                config = saver.put(config, Checkpoint(id=f"ckpt_{i}"), {}, {})
+            with patch.object(
+                saver.s3, "delete_objects", side_effect=slow_delete_objects
+            ), patch(
+                "persistence.s3_checkpointer.MAX_UNSPLIT_THREAD_OBJECTS", 5
+            ), patch("persistence.s3_checkpointer.MIN_DELETE_RANGE_CHECKPOINTS", 1):
+                most_in_flight[0] = 0
+                saver.delete_checkpoints(THREAD_ID, wait=wait)
+                saver.flush()
+
+            self.assertEqual(self.thread_keys(), [])
+            self.assertGreater(most_in_flight[0], 1)
+
+    def test_delete_checkpoints_small_thread(self):
+        """Test that a thread fitting in one batch is deleted with two requests."""
+        config = self.create_config()
+        for i in range(3):
+            config = self.checkpointer.put(config, Checkpoint(id=f"ckpt_{i}"), {}, {})
+            self.checkpointer.put_writes(config, [("channel", i)], "task")
+
+        self.checkpointer.metrics.reset()
+        self.checkpointer.delete_checkpoints(THREAD_ID)
+
+        self.assertEqual(self.thread_keys(), [])
+        requests = self.checkpointer.metrics.snapshot()
+        self.assertEqual(requests["list"]["calls"], 1)
+        self.assertEqual(requests["delete"]["calls"], 1)
+
+    def test_delete_checkpoints_in_background(self):
+        """Test that a background deletion keeps checkpoints saved meanwhile."""
+        config = self.create_config()
+        for i in range(3):
+            config = self.checkpointer.put(config, Checkpoint(id=f"ckpt_{i}"), {}, {})
+            self.checkpointer.put_writes(config, [("channel", i)], "task")
+
+        # Hold up the background deletion until the thread has been written to
+        release = threading.Event()
+        self.checkpointer._submit_background(release.wait)
+        self.checkpointer.delete_checkpoints(THREAD_ID, wait=False)
+
+        # The thread reads as deleted right away
+        self.assertIsNone(self.checkpointer.get_tuple(self.create_config()))
+        self.assertIsNone(self.checkpointer.get_tuple(config))
+        self.assertEqual(list(self.checkpointer.list(self.create_config())), [])
+
+        config = self.checkpointer.put(
+            self.create_config(), Checkpoint(id="ckpt_new"), {}, {}
+        )
+        self.checkpointer.put_writes(config, [("channel", "new")], "task")
+        release.set()
+        self.checkpointer.flush()
+
+        prefix = f"checkpoints/{THREAD_ID}/__default__"
+        self.assertEqual(
+            self.thread_keys(),
+            [
+                f"{prefix}/ckpt_new/checkpoint.json",
+                f"{prefix}/ckpt_new/writes/task.json",
+                f"{prefix}/latest.json",
+            ],
+        )
+        checkpoint_tuple = self.checkpointer.get_tuple(self.create_config())
+        self.assertEqual(checkpoint_tuple.checkpoint["id"], "ckpt_new")
+        self.assertEqual(checkpoint_tuple.pending_writes, [("task", "channel", "new")])
+
+    def test_flush_waits_for_every_task(self):
+        """Test that flush waits for all background work before raising."""
+        finished = []
+
+        def fail(message):
+            raise ValueError(message)
+
+        release = threading.Event()
+        self.checkpointer._submit_background(fail, "first")
+        self.checkpointer._submit_background(release.wait)
+        self.checkpointer._submit_background(fail, "second")
+        self.checkpointer._submit_background(finished.append, "last")
+        threading.Timer(0.05, release.set).start()
+
+        with self.assertRaisesRegex(ValueError, "first"):
+            self.checkpointer.flush()
+        self.assertEqual(finished, ["last"])
+        self.checkpointer.flush()
+
     #
     # Invalid Key Formats and Other Edge Cases
     #
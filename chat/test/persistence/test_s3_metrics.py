@@ -0,0 +1,67 @@
+# ruff: noqa: E402
+import sys
+
+sys.path.append("./src")
+
+import pytest
+from unittest import TestCase
+
+import boto3
+from moto import mock_aws
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import Checkpoint
+from persistence.s3_checkpointer import S3Checkpointer
+from persistence.s3_metrics import S3Metrics
+
+BUCKET_NAME = "mybucket"
+REGION = "us-east-1"
+
+
+@mock_aws
+@pytest.mark.filterwarnings("ignore::DeprecationWarning")
+class TestS3Metrics(TestCase):
+    def setUp(self):
+        self.s3 = boto3.client("s3", region_name=REGION)
+        self.s3.create_bucket(Bucket=BUCKET_NAME)
+
+    def test_counts_requests(self):
+        metrics = S3Metrics()
+        metrics.register(self.s3)
+        self.s3.put_object(Bucket=BUCKET_NAME, Key="a", Body=b"12345")
+        self.s3.put_object(Bucket=BUCKET_NAME, Key="b", Body="héllo")
+        self.s3.get_object(Bucket=BUCKET_NAME, Key="a")["Body"].read()
+        self.s3.list_objects_v2(Bucket=BUCKET_NAME)
+        with self.assertRaises(self.s3.exceptions.NoSuchKey):
+            self.s3.get_object(Bucket=BUCKET_NAME, Key="missing")
+        self.s3.delete_objects(
+            Bucket=BUCKET_NAME, Delete={"Objects": [{"Key": "a"}, {"Key": "b"}]}
+        )
+
+        snapshot = metrics.snapshot()
+        self.assertEqual(list(snapshot), ["delete", "get", "list", "put"])
+        self.assertEqual(snapshot["put"]["calls"], 2)
+        self.assertEqual(snapshot["put"]["bytes_written"], 11)
+        self.assertEqual(snapshot["get"]["calls"], 2)
+        self.assertEqual(snapshot["get"]["bytes_read"], 5)
+        self.assertEqual(snapshot["list"]["calls"], 1)
+        self.assertEqual(snapshot["delete"]["calls"], 1)
+        for totals in snapshot.values():
+            self.assertGreater(totals["time_ms"], 0)
+
+        metrics.reset()
+        self.assertEqual(metrics.snapshot(), {})
+
+    def test_checkpointer_metrics(self):
+        saver = S3Checkpointer(bucket_name=BUCKET_NAME, region_name=REGION)
+        config = RunnableConfig({"configurable": {"thread_id": "thread1"}})
+        config = saver.put(config, Checkpoint(id="checkpoint1"), {}, {})
+        saver.put_writes(config, [("channel", "value")], "task")
+        saver.get_tuple(config)
+
+        snapshot = saver.metrics.snapshot()
+        # The checkpoint, its latest pointer, and the batch of writes
+        self.assertEqual(snapshot["put"]["calls"], 3)
+        self.assertGreater(snapshot["put"]["bytes_written"], 0)
+        self.assertEqual(snapshot["get"]["calls"], 2)
+        self.assertGreater(snapshot["get"]["bytes_read"], 0)
+        self.assertEqual(snapshot["list"]["calls"], 1)
@@ -0,0 +1,407 @@
+# ruff: noqa: E402
+import sys
+
+sys.path.append("./src")
+
+import pytest
+from unittest import TestCase
+from unittest.mock import patch
+
+import boto3
+from moto import mock_aws
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import Checkpoint
+from typing import Optional
+from persistence.selective_checkpointer import (
+    COMPACTED_HISTORY_KEY,
+    SelectiveCheckpointer,
+    _compact_messages,
+    _prune_messages,
+)
+
+BUCKET_NAME = "mybucket"
+REGION = "us-east-1"
+THREAD_ID = "thread1"
+PREFIX = f"checkpoints/{THREAD_ID}/__default__"
+
+
+@mock_aws
+@pytest.mark.filterwarnings("ignore::DeprecationWarning")
+class TestSelectiveCheckpointer(TestCase):
+    def setUp(self):
+        self.s3 = boto3.client("s3", region_name=REGION)
+        self.s3.create_bucket(Bucket=BUCKET_NAME)
+
+    def create_config(self, checkpoint_id: Optional[str] = None) -> RunnableConfig:
+        configurable = {"thread_id": THREAD_ID, "checkpoint_ns": ""}
+        if checkpoint_id:
+            configurable["checkpoint_id"] = checkpoint_id
+        return RunnableConfig({"configurable": configurable})
+
+    def put_checkpoints(self, checkpointer, count, start=0):
+        config = self.create_config()
+        for i in range(start, start + count):
+            checkpoint = Checkpoint(
+                id=f"checkpoint{i:02}",
+                channel_values={"messages": [], "step": i},
+                channel_versions={"step": i},
+            )
+            config = checkpointer.put(config, checkpoint, {"step": i}, {"step": i})
+            checkpointer.put_writes(config, [("channel1", i)], "task1")
+        checkpointer.flush()
+        return config
+
+    def stored_checkpoint_ids(self):
+        response = self.s3.list_objects_v2(Bucket=BUCKET_NAME, Prefix=f"{PREFIX}/")
+        return sorted(
+            {
+                obj["Key"].split("/")[3]
+                for obj in response.get("Contents", [])
+                if not obj["Key"].endswith("latest.json")
+            }
+        )
+
+    def test_prunes_tool_messages(self):
+        checkpointer = SelectiveCheckpointer(
+            bucket_name=BUCKET_NAME, region_name=REGION
+        )
+        messages = [
+            HumanMessage(content="First question"),
+            AIMessage(content="", response_metadata={"stop_reason": "tool_use"}),
+            ToolMessage(content="results", tool_call_id="1"),
+            AIMessage(content="First answer"),
+            HumanMessage(content="Second question"),
+            ToolMessage(content="results", tool_call_id="2"),
+        ]
+        config = checkpointer.put(
+            self.create_config(),
+            Checkpoint(id="checkpoint00", channel_values={"messages": messages}),
+            {},
+            {},
+        )
+
+        stored = checkpointer.get_tuple(config).checkpoint["channel_values"]
+        self.assertEqual(
+            [m.content for m in stored["messages"]],
+            ["First question", "First answer", "Second question", "results"],
+        )
+
+    def interaction(self, turn):
+        return [
+            HumanMessage(content=f"Question {turn}: {'q' * 40}"),
+            AIMessage(content="", response_metadata={"stop_reason": "tool_use"}),
+            ToolMessage(content=f"Results {turn}", tool_call_id=str(turn)),
+            AIMessage(content=f"Answer {turn}: {'a' * 40}"),
+        ]
+
+    def run_steps(self, checkpointer, messages, turns, first_turn=0):
+        """Puts a checkpoint after each message is added, like a graph run"""
+        config = checkpointer.get_tuple(self.create_config())
+        config = config.config if config else self.create_config()
+        for turn in range(first_turn, first_turn + turns):
+            for message in self.interaction(turn):
+                messages.append(message)
+                checkpoint = Checkpoint(
+                    id=f"checkpoint{len(messages):03}",
+                    channel_values={"messages": list(messages)},
+                )
+                config = checkpointer.put(config, checkpoint, {}, {})
+                stored = checkpointer.get_tuple(config)
+                self.assertEqual(
+                    stored.checkpoint["channel_values"]["messages"],
+                    _prune_messages(messages),
+                )
+        return stored
+
+    def test_prunes_incrementally(self):
+        checkpointer = SelectiveCheckpointer(
+            bucket_name=BUCKET_NAME, region_name=REGION
+        )
+        with patch(
+            "persistence.selective_checkpointer._prune_messages",
+            wraps=_prune_messages,
+        ) as prune_messages:
+            stored = self.run_steps(checkpointer, [], 3)
+
+        # Only the first put prunes every message
+        prune_messages.assert_called_once()
+        self.assertEqual(stored.metadata["interaction_start"], 4)
+
+    def test_prunes_incrementally_after_loading(self):
+        messages = []
+        self.run_steps(
+            SelectiveCheckpointer(bucket_name=BUCKET_NAME, region_name=REGION),
+            messages,
+            2,
+        )
+
+        # A new checkpointer picks up where the stored metadata left off
+        checkpointer = SelectiveCheckpointer(
+            bucket_name=BUCKET_NAME, region_name=REGION
+        )
+        stored = checkpointer.get_tuple(self.create_config())
+        messages = stored.checkpoint["channel_values"]["messages"]
+        with patch(
+            "persistence.selective_checkpointer._prune_messages",
+            wraps=_prune_messages,
+        ) as prune_messages:
+            self.run_steps(checkpointer, messages, 2, first_turn=2)
+        prune_messages.assert_not_called()
+
+    def test_prunes_all_messages_for_unknown_parent(self):
+        checkpointer = SelectiveCheckpointer(
+            bucket_name=BUCKET_NAME, region_name=REGION
+        )
+        self.run_steps(checkpointer, [], 2)
+
+        messages = self.interaction(0) + self.interaction(1)
+        config = checkpointer.put(
+            self.create_config("unknown"),
+            Checkpoint(id="checkpoint999", channel_values={"messages": messages}),
+            {},
+            {},
+        )
+        stored = checkpointer.get_tuple(config).checkpoint["channel_values"]
+        self.assertEqual(stored["messages"], _prune_messages(messages))
+
+    def content_size(self, messages):
+        return sum(len(m.content) for m in messages)
+
+    def test_compact_messages(self):
+        # Ten finished interactions of about 100 bytes each
+        messages = _prune_messages(
+            [m for turn in range(11) for m in self.interaction(turn)]
+        )[:-4]
+        self.assertIs(_compact_messages(messages, 1100), messages)
+
+        compacted = _compact_messages(messages, 700)
+        self.assertTrue(compacted[0].additional_kwargs[COMPACTED_HISTORY_KEY])
+        self.assertIsInstance(compacted[1], AIMessage)
+        self.assertLessEqual(self.content_size(compacted), 700)
+        # The newest interactions are kept as they were
+        self.assertEqual(compacted[-4:], messages[-4:])
+        kept = len(compacted) - 2
+        newest_compacted = 9 - kept // 2
+        self.assertIn(
+            f"Q: Question {newest_compacted}: {'q' * 40}\nA: Answer {newest_compacted}",
+            compacted[0].content,
+        )
+
+        # Compacting again folds more interactions into the same record
+        recompacted = _compact_messages(compacted, 500)
+        self.assertLessEqual(self.content_size(recompacted), 500)
+        self.assertLess(len(recompacted), len(compacted))
+        newest_compacted = 9 - (len(recompacted) - 2) // 2
+        self.assertIn(f"Q: Question {newest_compacted}:", recompacted[0].content)
+        self.assertEqual(recompacted[-2:], messages[-2:])
+
+    def test_compact_messages_below_record_overhead(self):
+        messages = _prune_messages(
+            [m for turn in range(4) for m in self.interaction(turn)]
+        )[:-4]
+
+        # Half of 300 bytes can't hold the record's text and an entry, so the
+        # oldest interactions are dropped without one
+        compacted = _compact_messages(messages, 300)
+        self.assertEqual(compacted, messages[-2:])
+        # Nor can half of 100 bytes hold the header, and no interaction fits
+        self.assertEqual(_compact_messages(messages, 100), [])
+
+    def test_compacts_history(self):
+        checkpointer = SelectiveCheckpointer(
+            bucket_name=BUCKET_NAME, region_name=REGION, max_history_bytes=600
+        )
+        config = self.create_config()
+        messages = []
+        for turn in range(20):
+            for message in self.interaction(turn):
+                messages.append(message)
+                checkpoint = Checkpoint(
+                    id=f"checkpoint{len(messages):03}",
+                    channel_values={"messages": list(messages)},
+                )
+                config = checkpointer.put(config, checkpoint, {}, {})
+
+        stored = checkpointer.get_tuple(config)
+        stored_messages = stored.checkpoint["channel_values"]["messages"]
+        self.assertTrue(stored_messages[0].additional_kwargs[COMPACTED_HISTORY_KEY])
+        self.assertEqual(stored_messages[-4:], messages[-4:])
+        start = stored.metadata["interaction_start"]
+        self.assertEqual(start, len(stored_messages) - 4)
+        self.assertLessEqual(self.content_size(stored_messages[:start]), 600)
+
+    def test_retain_history_keeps_all_checkpoints(self):
+        checkpointer = SelectiveCheckpointer(
+            bucket_name=BUCKET_NAME, region_name=REGION
+        )
+        self.put_checkpoints(checkpointer, 4)
+        self.assertEqual(len(self.stored_checkpoint_ids()), 4)
+
+    def test_keeps_newest_checkpoints(self):
+        checkpointer = SelectiveCheckpointer(
+            bucket_name=BUCKET_NAME, region_name=REGION, retain_history=False
+        )
+        config = self.put_checkpoints(checkpointer, 5)
+
+        self.assertEqual(self.stored_checkpoint_ids(), ["checkpoint03", "checkpoint04"])
+        checkpoint_tuple = checkpointer.get_tuple(self.create_config())
+        self.assertEqual(checkpoint_tuple.config, config)
+        self.assertEqual(checkpoint_tuple.pending_writes, [("task1", "channel1", 4)])
+        self.assertIsNotNone(checkpointer.get_tuple(checkpoint_tuple.parent_config))
+
+    def test_retained_checkpoints(self):
+        checkpointer = SelectiveCheckpointer(
+            bucket_name=BUCKET_NAME,
+            region_name=REGION,
+            retain_history=False,
+            retained_checkpoints=3,
+        )
+        self.put_checkpoints(checkpointer, 5)
+        self.assertEqual(
+            self.stored_checkpoint_ids(),
+            ["checkpoint02", "checkpoint03", "checkpoint04"],
+        )
+
+    def test_prunes_checkpoints_saved_by_other_checkpointers(self):
+        self.put_checkpoints(
+            SelectiveCheckpointer(bucket_name=BUCKET_NAME, region_name=REGION), 3
+        )
+
+        checkpointer = SelectiveCheckpointer(
+            bucket_name=BUCKET_NAME, region_name=REGION, retain_history=False
+        )
+        with patch.object(
+            checkpointer, "_list_history", wraps=checkpointer._list_history
+        ) as list_history:
+            self.put_checkpoints(checkpointer, 3, start=3)
+
+        # The namespace is listed once, not on every put
+        list_history.assert_called_once()
+        self.assertEqual(self.stored_checkpoint_ids(), ["checkpoint04", "checkpoint05"])
+
+    def test_keeps_delta_chain(self):
+        checkpointer = SelectiveCheckpointer(
+            bucket_name=BUCKET_NAME,
+            region_name=REGION,
+            retain_history=False,
+            snapshot_interval=3,
+        )
+        self.put_checkpoints(checkpointer, 5)
+
+        # checkpoint03 is the full snapshot that checkpoint04 is rebuilt from
+        self.assertEqual(self.stored_checkpoint_ids(), ["checkpoint03", "checkpoint04"])
+
+        self.put_checkpoints(checkpointer, 1, start=5)
+        self.assertEqual(
+            self.stored_checkpoint_ids(),
+            ["checkpoint03", "checkpoint04", "checkpoint05"],
+        )
+
+        checkpointer = SelectiveCheckpointer(
+            bucket_name=BUCKET_NAME, region_name=REGION
+        )
+        checkpoint = checkpointer.get_tuple(self.create_config()).checkpoint
+        self.assertEqual(checkpoint["channel_values"]["step"], 5)
+
+    def test_delete_checkpoints(self):
+        checkpointer = SelectiveCheckpointer(
+            bucket_name=BUCKET_NAME, region_name=REGION, retain_history=False
+        )
+        self.put_checkpoints(checkpointer, 3)
+        checkpointer.delete_checkpoints(THREAD_ID)
+        self.assertEqual(self.stored_checkpoint_ids(), [])
+
+        self.put_checkpoints(checkpointer, 3, start=3)
+        self.assertEqual(self.stored_checkpoint_ids(), ["checkpoint04", "checkpoint05"])
+
+    def content_keys(self):
+        response = self.s3.list_objects_v2(
+            Bucket=BUCKET_NAME, Prefix=f"checkpoints/{THREAD_ID}/content-"
+        )
+        return [obj["Key"] for obj in response.get("Contents", [])]
+
+    def put_turns(self, checkpointer, messages, turns, first_turn=0):
+        """Puts a checkpoint after each message is added, with its tool output offloaded"""
+        config = checkpointer.get_tuple(self.create_config())
+        config = config.config if config else self.create_config()
+        for turn in range(first_turn, first_turn + turns):
+            for i, message in enumerate(self.interaction(turn)):
+                messages.append(message)
+                checkpoint = Checkpoint(
+                    id=f"checkpoint{turn:02}{i}",
+                    channel_values={"messages": list(messages)},
+                )
+                config = checkpointer.put(config, checkpoint, {}, {})
+                checkpointer.put_writes(config, [("messages", [message])], "task1")
+        checkpointer.flush()
+
+    def test_deletes_unreferenced_content(self):
+        checkpointer = SelectiveCheckpointer(
+            bucket_name=BUCKET_NAME,
+            region_name=REGION,
+            retain_history=False,
+            offload_threshold=5,
+        )
+        messages = []
+        self.put_turns(checkpointer, messages, 3)
+
+        # Only the current interaction's tool output is still referenced
+        self.assertEqual(len(self.content_keys()), 1)
+        stored = checkpointer.get_tuple(self.create_config())
+        self.assertEqual(
+            checkpointer.load_offloaded(
+                stored.checkpoint["channel_values"]["messages"]
+            ),
+            _prune_messages(messages),
+        )
+
+        # A new checkpointer reads what the checkpoints it didn't save refer to
+        checkpointer = SelectiveCheckpointer(
+            bucket_name=BUCKET_NAME,
+            region_name=REGION,
+            retain_history=False,
+            offload_threshold=5,
+        )
+        messages = checkpointer.get_tuple(self.create_config()).checkpoint[
+            "channel_values"
+        ]["messages"]
+        self.put_turns(checkpointer, messages, 1, first_turn=3)
+        self.assertEqual(len(self.content_keys()), 1)
+        stored = checkpointer.get_tuple(self.create_config())
+        self.assertEqual(
+            checkpointer.load_offloaded(
+                stored.checkpoint["channel_values"]["messages"]
+            )[-2].content,
+            "Results 3",
+        )
+
+    def test_keeps_content_referenced_again(self):
+        checkpointer = SelectiveCheckpointer(
+            bucket_name=BUCKET_NAME,
+            region_name=REGION,
+            retain_history=False,
+            offload_threshold=5,
+        )
+        messages = []
+        self.put_turns(checkpointer, messages, 1)
+        with patch.object(
+            self,
+            "interaction",
+            side_effect=lambda turn: [
+                HumanMessage(content=f"Question {turn}"),
+                ToolMessage(content="Results 0", tool_call_id=str(turn)),
+                AIMessage(content=f"Answer {turn}"),
+            ],
+        ):
+            self.put_turns(checkpointer, messages, 2, first_turn=1)
+
+        # The first turn's tool output is the same as the newest one's
+        self.assertEqual(len(self.content_keys()), 1)
+        stored = checkpointer.get_tuple(self.create_config())
+        self.assertEqual(
+            checkpointer.load_offloaded(
+                stored.checkpoint["channel_values"]["messages"]
+            ),
+            _prune_messages(messages),
+        )
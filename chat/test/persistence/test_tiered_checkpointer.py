@@ -0,0 +1,240 @@
+# ruff: noqa: E402
+import sys
+
+sys.path.append("./src")
+
+import os
+import pytest
+import tempfile
+from unittest import TestCase
+from unittest.mock import patch
+
+import boto3
+from moto import mock_aws
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import Checkpoint
+from persistence.local_checkpoint_store import LocalCheckpointStore
+from persistence.s3_checkpointer import CheckpointConflictError
+from persistence.selective_checkpointer import SelectiveCheckpointer
+from persistence.tiered_checkpointer import TieredCheckpointer
+
+BUCKET_NAME = "mybucket"
+REGION = "us-east-1"
+THREAD_ID = "thread1"
+PREFIX = f"checkpoints/{THREAD_ID}/__default__"
+
+
+@mock_aws
+@pytest.mark.filterwarnings("ignore::DeprecationWarning")
+class TestTieredCheckpointer(TestCase):
+    def setUp(self):
+        self.s3 = boto3.client("s3", region_name=REGION)
+        self.s3.create_bucket(Bucket=BUCKET_NAME)
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = self.create_store()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def create_store(self, name="checkpoints.sqlite3"):
+        return LocalCheckpointStore(path=os.path.join(self.tmp.name, name))
+
+    def create_checkpointer(self, store=None, **kwargs):
+        return TieredCheckpointer(
+            bucket_name=BUCKET_NAME,
+            local_store=store or self.store,
+            region_name=REGION,
+            **kwargs,
+        )
+
+    def create_config(self) -> RunnableConfig:
+        return RunnableConfig(
+            {"configurable": {"thread_id": THREAD_ID, "checkpoint_ns": ""}}
+        )
+
+    def put_checkpoints(self, checkpointer, count, start=0):
+        config = self.create_config()
+        tuple_ = checkpointer.get_tuple(config)
+        if tuple_:
+            config = tuple_.config
+        for i in range(start, start + count):
+            checkpoint = Checkpoint(
+                id=f"checkpoint{i:02}",
+                channel_values={"step": i},
+                channel_versions={"step": i},
+            )
+            config = checkpointer.put(config, checkpoint, {"step": i}, {"step": i})
+            checkpointer.put_writes(config, [("channel1", i)], "task1")
+        return config
+
+    def s3_keys(self):
+        response = self.s3.list_objects_v2(Bucket=BUCKET_NAME, Prefix=f"{PREFIX}/")
+        return sorted(obj["Key"] for obj in response.get("Contents", []))
+
+    def test_uploads_in_background(self):
+        checkpointer = self.create_checkpointer()
+        with patch.object(checkpointer, "_upload") as upload:
+            self.put_checkpoints(checkpointer, 2)
+        self.assertEqual(self.s3_keys(), [])
+        self.assertEqual(upload.call_count, 6)
+
+        # The checkpoints are read back from the local store
+        checkpoint_tuple = checkpointer.get_tuple(self.create_config())
+        self.assertEqual(checkpoint_tuple.checkpoint["id"], "checkpoint01")
+        self.assertEqual(checkpoint_tuple.pending_writes, [("task1", "channel1", 1)])
+
+    def test_flush(self):
+        checkpointer = self.create_checkpointer()
+        self.put_checkpoints(checkpointer, 2)
+        checkpointer.flush()
+
+        self.assertEqual(self.store.unflushed(), [])
+        self.assertEqual(self.s3_keys(), self.store.keys(f"{PREFIX}/"))
+
+        # Checkpoints uploaded by the tiered checkpointer read the same from S3
+        checkpoint_tuple = SelectiveCheckpointer(
+            bucket_name=BUCKET_NAME, region_name=REGION
+        ).get_tuple(self.create_config())
+        self.assertEqual(checkpoint_tuple.checkpoint["id"], "checkpoint01")
+        self.assertEqual(checkpoint_tuple.metadata["step"], 1)
+        self.assertEqual(checkpoint_tuple.pending_writes, [("task1", "channel1", 1)])
+
+    def test_reads_current_local_copy(self):
+        checkpointer = self.create_checkpointer()
+        self.put_checkpoints(checkpointer, 2)
+        checkpointer.flush()
+
+        # A later invocation in the same container
+        checkpointer = self.create_checkpointer()
+        with patch.object(
+            checkpointer.s3, "get_object", wraps=checkpointer.s3.get_object
+        ) as get_object, patch.object(
+            checkpointer.s3, "list_objects_v2", wraps=checkpointer.s3.list_objects_v2
+        ) as list_objects:
+            checkpoint_tuple = checkpointer.get_tuple(self.create_config())
+
+        # Only the latest pointer is read from S3, to check the local copy
+        get_object.assert_called_once()
+        self.assertEqual(get_object.call_args.kwargs["Key"], f"{PREFIX}/latest.json")
+        list_objects.assert_not_called()
+        self.assertEqual(checkpoint_tuple.checkpoint["id"], "checkpoint01")
+        self.assertEqual(checkpoint_tuple.pending_writes, [("task1", "channel1", 1)])
+
+    def test_cold_container_reads_s3(self):
+        checkpointer = self.create_checkpointer()
+        self.put_checkpoints(checkpointer, 2)
+        checkpointer.flush()
+
+        checkpointer = self.create_checkpointer(self.create_store("cold.sqlite3"))
+        checkpoint_tuple = checkpointer.get_tuple(self.create_config())
+        self.assertEqual(checkpoint_tuple.checkpoint["id"], "checkpoint01")
+        self.assertEqual(checkpoint_tuple.pending_writes, [("task1", "channel1", 1)])
+
+        # New checkpoints continue the thread read from S3
+        config = self.put_checkpoints(checkpointer, 1, start=2)
+        checkpointer.flush()
+        checkpoint_tuple = checkpointer.get_tuple(config)
+        self.assertEqual(
+            checkpoint_tuple.parent_config["configurable"]["checkpoint_id"],
+            "checkpoint01",
+        )
+
+    def test_stale_local_copy_reads_s3(self):
+        checkpointer = self.create_checkpointer()
+        self.put_checkpoints(checkpointer, 2)
+        checkpointer.flush()
+
+        # Another container continues the thread
+        self.put_checkpoints(
+            SelectiveCheckpointer(bucket_name=BUCKET_NAME, region_name=REGION),
+            1,
+            start=2,
+        )
+
+        checkpoint_tuple = self.create_checkpointer().get_tuple(self.create_config())
+        self.assertEqual(checkpoint_tuple.checkpoint["id"], "checkpoint02")
+        self.assertEqual(checkpoint_tuple.pending_writes, [("task1", "channel1", 2)])
+
+    def test_prunes_local_copy(self):
+        checkpointer = self.create_checkpointer(retain_history=False)
+        self.put_checkpoints(checkpointer, 4)
+        checkpointer.flush()
+
+        expected = [
+            f"{PREFIX}/checkpoint02/checkpoint.json",
+            f"{PREFIX}/checkpoint02/writes/task1.json",
+            f"{PREFIX}/checkpoint03/checkpoint.json",
+            f"{PREFIX}/checkpoint03/writes/task1.json",
+            f"{PREFIX}/latest.json",
+        ]
+        self.assertEqual(self.s3_keys(), expected)
+        self.assertEqual(self.store.keys(f"{PREFIX}/"), expected)
+
+    def test_delete_checkpoints(self):
+        checkpointer = self.create_checkpointer()
+        self.put_checkpoints(checkpointer, 2)
+        checkpointer.delete_checkpoints(THREAD_ID)
+
+        self.assertEqual(self.s3_keys(), [])
+        self.assertEqual(self.store.keys(f"{PREFIX}/"), [])
+        self.assertIsNone(checkpointer.get_tuple(self.create_config()))
+
+    def test_upload_conflict(self):
+        checkpointer = self.create_checkpointer()
+        self.put_checkpoints(checkpointer, 1)
+        checkpointer.flush()
+
+        # Another container saves a checkpoint while this one answers a turn
+        self.put_checkpoints(
+            SelectiveCheckpointer(bucket_name=BUCKET_NAME, region_name=REGION),
+            1,
+            start=1,
+        )
+        with self.assertRaises(CheckpointConflictError):
+            self.put_checkpoints(checkpointer, 1, start=2)
+            checkpointer.flush()
+
+        # The losing checkpoint is dropped locally and the winner is read
+        self.assertEqual(self.store.keys(f"{PREFIX}/"), [])
+        checkpoint_tuple = checkpointer.get_tuple(self.create_config())
+        self.assertEqual(checkpoint_tuple.checkpoint["id"], "checkpoint01")
+
+    def test_saves_after_upload_conflict(self):
+        checkpointer = self.create_checkpointer(
+            retain_history=False, retained_checkpoints=1
+        )
+        self.put_checkpoints(checkpointer, 1)
+        checkpointer.flush()
+        self.put_checkpoints(
+            SelectiveCheckpointer(bucket_name=BUCKET_NAME, region_name=REGION),
+            1,
+            start=1,
+        )
+
+        # The graph keeps running while the conflicting upload fails
+        config = self.put_checkpoints(checkpointer, 1, start=2)
+        checkpointer._background.submit(lambda: None).result()
+        with self.assertRaises(CheckpointConflictError):
+            checkpointer.put(
+                config,
+                Checkpoint(id="checkpoint03", channel_values={}),
+                {},
+                {},
+            )
+        with self.assertRaises(CheckpointConflictError):
+            checkpointer.flush()
+
+        # The winner's pointer and checkpoints are left alone
+        pointer = self.s3.get_object(Bucket=BUCKET_NAME, Key=f"{PREFIX}/latest.json")
+        self.assertIn(b'"checkpoint01"', pointer["Body"].read())
+        self.assertIn(f"{PREFIX}/checkpoint01/checkpoint.json", self.s3_keys())
+
+        # Reading the thread again lets a retry save on top of the winner
+        self.put_checkpoints(checkpointer, 1, start=3)
+        checkpointer.flush()
+        checkpoint_tuple = checkpointer.get_tuple(self.create_config())
+        self.assertEqual(checkpoint_tuple.checkpoint["id"], "checkpoint03")
+        self.assertEqual(
+            checkpoint_tuple.parent_config["configurable"]["checkpoint_id"],
+            "checkpoint01",
+        )
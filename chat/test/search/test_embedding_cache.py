@@ -0,0 +1,39 @@
+import os
+import tempfile
+from unittest import TestCase
+from search.embedding_cache import EmbeddingCache
+
+
+class TestEmbeddingCache(TestCase):
+    def test_get_and_put(self):
+        cache = EmbeddingCache()
+        self.assertIsNone(cache.get("model", "text"))
+        cache.put("model", "text", [0.5, 0.25])
+        self.assertEqual(cache.get("model", "text"), [0.5, 0.25])
+        self.assertIsNone(cache.get("other-model", "text"))
+        self.assertEqual((cache.hits, cache.misses), (1, 2))
+
+    def test_evicts_least_recently_used(self):
+        cache = EmbeddingCache(max_size=2)
+        cache.put("model", "a", [1.0])
+        cache.put("model", "b", [2.0])
+        cache.get("model", "a")
+        cache.put("model", "c", [3.0])
+        self.assertIsNone(cache.get("model", "b"))
+        self.assertEqual(cache.get("model", "a"), [1.0])
+        self.assertEqual(len(cache), 2)
+
+    def test_disk_tier(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "embeddings.sqlite3")
+            cache = EmbeddingCache(max_size=1, path=path, max_disk_size=2)
+            cache.put("model", "a", [1.0, 0.5])
+            cache.put("model", "b", [2.0])
+            # Evicted from memory, but read back from disk
+            self.assertEqual(cache.get("model", "a"), [1.0, 0.5])
+
+            # A later process reads the same file
+            cache = EmbeddingCache(path=path, max_disk_size=2)
+            self.assertEqual(cache.get("model", "b"), [2.0])
+            cache.put("model", "c", [3.0])
+            self.assertIsNone(EmbeddingCache(path=path).get("model", "a"))
@@ -18,6 +18,24 @@ class TestFunction:
         assert {"terms": {"visibility": ["Public", "Institution"]}} in queries_second
         assert {"term": {"published": True}} in queries_second
 
+    def test_hybrid_query_with_vector(self):
+        dsl = hybrid_query(
+            "Question?",
+            "MODEL_ID",
+            k=10,
+            facets=[{"work_type": "Image"}],
+            query_vector=[0.1, 0.2],
+        )
+        subject = dsl["query"]["hybrid"]["queries"]
+
+        assert subject[0]["bool"]["must"][0]["query_string"]["query"] == "Question?"
+        queries_second = subject[1]["bool"]["must"]
+        assert queries_second[0] == {
+            "knn": {"embedding": {"k": 10, "vector": [0.1, 0.2]}}
+        }
+        assert {"term": {"work_type": "Image"}} in queries_second
+        assert "query_vector" not in dsl
+
     def test_filter(self):
         dummy_query = {"match": {"title": "Hello World"}}
         result = filter(dummy_query)
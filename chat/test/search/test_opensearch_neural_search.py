@@ -1,8 +1,15 @@
 # ruff: noqa: E402
 from unittest import TestCase
 from unittest.mock import Mock, patch
-from opensearchpy import ConnectionError, AuthenticationException, NotFoundError
+from opensearchpy import (
+    ConnectionError,
+    AuthenticationException,
+    NotFoundError,
+    TransportError,
+)
+from search.embedding_cache import EmbeddingCache
 from search.opensearch_neural_search import OpenSearchNeuralSearch
+from search.search_result_cache import SearchResultCache
 from langchain_core.documents import Document
 
 
@@ -11,11 +18,32 @@ class MockClient:
         return {"hits": {"hits": [{"_source": {"id": "test"}, "_score": 0.12345}]}}
 
 
+class MockBatchClient:
+    def msearch(self, index, body, params):
+        # Each search finds a document identified by its query text
+        queries = [
+            dsl["query"]["hybrid"]["queries"][0]["bool"]["must"][0]["query_string"][
+                "query"
+            ]
+            for dsl in body[1::2]
+        ]
+        return {
+            "responses": [
+                {"hits": {"hits": [{"_source": {"id": query}, "_score": 0.5}]}}
+                for query in queries
+            ]
+        }
+
+
 class MockErrorClient:
     def search(self, index, body, params):
         raise ConnectionError("Failed to connect to OpenSearch")
 
 
+def vector_clause_of(dsl):
+    return dsl["query"]["hybrid"]["queries"][1]["bool"]["must"][0]
+
+
 class TestOpenSearchNeuralSearch(TestCase):
     def setUp(self):
         self.search = OpenSearchNeuralSearch(
@@ -60,6 +88,193 @@ class TestOpenSearchNeuralSearch(TestCase):
         with self.assertRaises(ConnectionError):
             self.error_search.similarity_search_with_score(query="test")
 
+    def test_similarity_search_cached(self):
+        client = Mock(wraps=MockClient())
+        cache = SearchResultCache()
+        search = OpenSearchNeuralSearch(
+            client=client,
+            endpoint="test",
+            index="test",
+            model_id="test",
+            result_cache=cache,
+        )
+        facets = [{"subject.label": ["Nigeria"]}]
+        docs = search.similarity_search(query="Test query", facets=facets, size=20)
+        docs[0].metadata["id"] = "changed"
+        cached = search.similarity_search(query=" Test  query", facets=facets, size=20)
+
+        self.assertEqual(client.search.call_count, 1)
+        self.assertEqual(
+            cached, [Document(page_content="test", metadata={"id": "test"})]
+        )
+        self.assertEqual(cache.stats(), {"hits": 1, "misses": 1, "size": 1})
+
+        # Different options or an opt-out run the search
+        search.similarity_search(query="test query", facets=facets, size=10)
+        search.similarity_search(query="test query", size=20)
+        search.similarity_search(
+            query="test query", facets=facets, size=20, use_cache=False
+        )
+        self.assertEqual(client.search.call_count, 4)
+
+    def test_similarity_search_with_cached_embedding(self):
+        client = Mock(wraps=MockClient())
+        client.transport = Mock()
+        client.transport.perform_request.return_value = {
+            "inference_results": [{"output": [{"data": [0.25, 0.5]}]}]
+        }
+        search = OpenSearchNeuralSearch(
+            client=client,
+            endpoint="test",
+            index="test",
+            model_id="test-model",
+            embedding_cache=EmbeddingCache(),
+        )
+
+        # A first search only has OpenSearch embed the query
+        search.similarity_search(query="test")
+        vector_clause = vector_clause_of(client.search.call_args.kwargs["body"])
+        self.assertIn("neural", vector_clause)
+        search.wait_for_embeddings()
+        client.transport.perform_request.assert_not_called()
+
+        # A repeated miss is also embedded in the background, for the next search
+        search.similarity_search(query="test")
+        self.assertIn(
+            "neural", vector_clause_of(client.search.call_args.kwargs["body"])
+        )
+        search.wait_for_embeddings()
+
+        search.similarity_search(query="test")
+        client.transport.perform_request.assert_called_once_with(
+            "POST",
+            "/_plugins/_ml/_predict/text_embedding/test-model",
+            body={"text_docs": ["test"], "target_response": ["sentence_embedding"]},
+        )
+        self.assertEqual(
+            vector_clause_of(client.search.call_args.kwargs["body"]),
+            {"knn": {"embedding": {"k": 10, "vector": [0.25, 0.5]}}},
+        )
+
+    def test_similarity_search_embedding_error(self):
+        client = Mock(wraps=MockClient())
+        client.transport = Mock()
+        client.transport.perform_request.side_effect = ConnectionError("Failed")
+        search = OpenSearchNeuralSearch(
+            client=client,
+            endpoint="test",
+            index="test",
+            model_id="test-model",
+            embedding_cache=EmbeddingCache(),
+        )
+        docs = search.similarity_search(query="test")
+        for _ in range(2):
+            search.similarity_search(query="test")
+            search.wait_for_embeddings()
+
+        self.assertEqual(docs, [Document(page_content="test", metadata={"id": "test"})])
+        # Failed embeddings aren't cached, so they are tried again
+        self.assertEqual(client.transport.perform_request.call_count, 2)
+        self.assertIn(
+            "neural", vector_clause_of(client.search.call_args.kwargs["body"])
+        )
+
+    def test_batch_similarity_search(self):
+        client = Mock(wraps=MockBatchClient())
+        cache = SearchResultCache()
+        search = OpenSearchNeuralSearch(
+            client=client,
+            endpoint="test",
+            index="test",
+            model_id="test",
+            search_pipeline="test-pipeline",
+            result_cache=cache,
+        )
+        results = search.batch_similarity_search_with_score(
+            ["Nigeria", "posters", " Nigeria "], k=5, size=3
+        )
+
+        nigeria = (Document(page_content="Nigeria", metadata={"id": "Nigeria"}), 0.5)
+        posters = (Document(page_content="posters", metadata={"id": "posters"}), 0.5)
+        self.assertEqual(results, [[nigeria], [posters], [nigeria]])
+        client.msearch.assert_called_once()
+        kwargs = client.msearch.call_args.kwargs
+        self.assertEqual(kwargs["index"], "test")
+        self.assertEqual(kwargs["params"], {"search_pipeline": "test-pipeline"})
+        # Queries that normalize to the same search are only sent once
+        body = kwargs["body"]
+        self.assertEqual(len(body), 4)
+        self.assertEqual(body[0], {"index": "test"})
+        self.assertEqual(body[1]["size"], 3)
+
+        # Cached queries are answered without a request
+        results[0][0][0].metadata["id"] = "changed"
+        self.assertEqual(
+            search.batch_similarity_search(["posters", "Nigeria"], k=5, size=3),
+            [[posters[0]], [nigeria[0]]],
+        )
+        self.assertEqual(client.msearch.call_count, 1)
+
+    def test_batch_similarity_search_with_cached_embeddings(self):
+        client = Mock(wraps=MockBatchClient())
+        client.transport = Mock()
+        client.transport.perform_request.return_value = {
+            "inference_results": [
+                {"output": [{"data": [0.25]}]},
+                {"output": [{"data": [0.5]}]},
+            ]
+        }
+        embedding_cache = EmbeddingCache()
+        embedding_cache.put("test-model", "cached", [0.75])
+        search = OpenSearchNeuralSearch(
+            client=client,
+            endpoint="test",
+            index="test",
+            model_id="test-model",
+            embedding_cache=embedding_cache,
+        )
+        search.batch_similarity_search(["masks", "cached", "festivals"])
+        search.wait_for_embeddings()
+        client.transport.perform_request.assert_not_called()
+        search.batch_similarity_search(["masks", "cached", "festivals"])
+        search.wait_for_embeddings()
+
+        # Repeated misses are searched with neural clauses and embedded in one
+        # request
+        body = client.msearch.call_args.kwargs["body"]
+        self.assertIn("neural", vector_clause_of(body[1]))
+        self.assertEqual(
+            vector_clause_of(body[3]),
+            {"knn": {"embedding": {"k": 10, "vector": [0.75]}}},
+        )
+        self.assertIn("neural", vector_clause_of(body[5]))
+        client.transport.perform_request.assert_called_once_with(
+            "POST",
+            "/_plugins/_ml/_predict/text_embedding/test-model",
+            body={
+                "text_docs": ["masks", "festivals"],
+                "target_response": ["sentence_embedding"],
+            },
+        )
+        self.assertEqual(embedding_cache.get("test-model", "masks"), [0.25])
+        self.assertEqual(embedding_cache.get("test-model", "festivals"), [0.5])
+
+    def test_batch_similarity_search_error(self):
+        client = Mock()
+        client.msearch.return_value = {
+            "responses": [
+                {"hits": {"hits": []}},
+                {"error": {"type": "parsing_exception"}, "status": 400},
+            ]
+        }
+        search = OpenSearchNeuralSearch(
+            client=client, endpoint="test", index="test", model_id="test"
+        )
+        with self.assertRaises(TransportError) as context:
+            search.batch_similarity_search(["first", "second"])
+        self.assertEqual(context.exception.status_code, 400)
+        self.assertEqual(context.exception.error, "parsing_exception")
+
     @patch("opensearchpy.OpenSearch")
     def test_aggregations_search_index_not_found(self, mock_opensearch):
         mock_opensearch.return_value.search.side_effect = NotFoundError(
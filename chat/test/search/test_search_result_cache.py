@@ -0,0 +1,93 @@
+from unittest import TestCase
+from unittest.mock import patch
+from langchain_core.documents import Document
+from search.search_result_cache import (
+    SearchResultCache,
+    normalize_query,
+    search_cache_key,
+)
+
+
+def results(id):
+    return [(Document(page_content=id, metadata={"id": id}), 0.5)]
+
+
+class TestSearchCacheKey(TestCase):
+    def test_normalize_query(self):
+        self.assertEqual(normalize_query("  Nigerian\tPosters \n"), "Nigerian Posters")
+        # Operators and keyword fields are case-sensitive, so case is kept
+        self.assertEqual(normalize_query("Posters  AND Nigeria"), "Posters AND Nigeria")
+        self.assertNotEqual(
+            normalize_query("inu-dil-123"), normalize_query("INU-DIL-123")
+        )
+
+    def test_equivalent_searches(self):
+        self.assertEqual(
+            search_cache_key(
+                "Posters",
+                40,
+                [{"subject.label": ["Nigeria", "Ghana"]}, {"work_type": "Image"}],
+                size=20,
+            ),
+            search_cache_key(
+                " Posters",
+                40,
+                [{"work_type": "Image"}, {"subject.label": ["Ghana", "Nigeria"]}],
+                size=20,
+            ),
+        )
+        self.assertEqual(
+            search_cache_key("posters", 40), search_cache_key("posters", 40, [])
+        )
+
+    def test_different_searches(self):
+        key = search_cache_key("posters", 40, size=20)
+        self.assertNotEqual(key, search_cache_key("posters", 10, size=20))
+        self.assertNotEqual(key, search_cache_key("posters", 40, size=10))
+        self.assertNotEqual(key, search_cache_key("maps", 40, size=20))
+        self.assertNotEqual(
+            key, search_cache_key("posters", 40, [{"work_type": "Image"}], size=20)
+        )
+
+
+class TestSearchResultCache(TestCase):
+    def test_get_and_put(self):
+        cache = SearchResultCache()
+        self.assertIsNone(cache.get("a"))
+        cache.put("a", results("a"))
+        self.assertEqual(cache.get("a"), results("a"))
+        self.assertEqual(cache.stats(), {"hits": 1, "misses": 1, "size": 1})
+
+    def test_returns_copies(self):
+        cache = SearchResultCache()
+        stored = results("a")
+        cache.put("a", stored)
+        stored[0][0].metadata["id"] = "changed"
+        cache.get("a")[0][0].metadata["id"] = "changed"
+        self.assertEqual(cache.get("a"), results("a"))
+
+    def test_evicts_least_recently_used(self):
+        cache = SearchResultCache(max_size=2)
+        cache.put("a", results("a"))
+        cache.put("b", results("b"))
+        cache.get("a")
+        cache.put("c", results("c"))
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNotNone(cache.get("a"))
+        self.assertIsNotNone(cache.get("c"))
+
+    @patch("search.search_result_cache.time.monotonic", return_value=1000.0)
+    def test_expires_entries(self, mock_monotonic):
+        cache = SearchResultCache(ttl=60)
+        cache.put("a", results("a"))
+        mock_monotonic.return_value += 59
+        self.assertIsNotNone(cache.get("a"))
+        mock_monotonic.return_value += 1
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(len(cache), 0)
+
+    def test_clear(self):
+        cache = SearchResultCache()
+        cache.put("a", results("a"))
+        cache.clear()
+        self.assertIsNone(cache.get("a"))